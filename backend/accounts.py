@@ -0,0 +1,41 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+
+from backend.models import CustomUser
+
+
+def normalize_email_lookup(email):
+    # Must agree with LOWER(email) in user_email_lower_idx; SQLite's lower()
+    # folds ASCII only, so str.casefold() would miss rows there
+    return (email or '').strip().lower()
+
+
+def _cache_key(email):
+    # Hashed: emails may be longer than or contain characters memcached refuses
+    return f'email-taken:{hashlib.sha1(email.encode()).hexdigest()}'
+
+
+def email_taken(email):
+    """Whether an account uses ``email`` (normalized), cached for EMAIL_CHECK_CACHE_TTL seconds."""
+    key = _cache_key(email)
+    taken = cache.get(key)
+    if taken is None:
+        taken = CustomUser.objects.email_exists(email)
+        cache.set(key, taken, settings.EMAIL_CHECK_CACHE_TTL)
+    return taken
+
+
+def forget_email(email):
+    cache.delete(_cache_key(normalize_email_lookup(email)))
+
+
+def is_valid_email(email):
+    try:
+        validate_email(email)
+    except ValidationError:
+        return False
+    return True
@@ -1,14 +1,28 @@
-from django.contrib import admin
+import io
 
+from django.contrib import admin, messages
+
+from django.contrib.admin.views.main import ORDER_VAR
 from django.contrib.auth.admin import UserAdmin
+from django.db.models import Case, Value, When
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
 
-from backend.forms import CustomUserCreationForm, CustomUserChangeForm
-from backend.models import CustomUser, AuthorUser, MemberUser, AdminUser, Loan, Fine, FinePayment, Reservation
+from backend.forms import CustomUserCreationForm, CustomUserChangeForm, CatalogImportForm
+from backend.models import CustomUser, AuthorUser, MemberUser, AdminUser, Loan, Fine, FinePayment, FinePaymentAllocation, PaymentEvent, Reservation, Role
 from django.utils.html import format_html
 
 from .models import Category, Book, BookAuthor
 
-from django.db.models import Q
+from unfold.contrib.filters.admin import AutocompleteSelectFilter
+
+from backend.exports import REPORTS, streaming_export
+from backend.importers import CATALOG_FIELDS, CatalogImporter, catalog_rows, read_rows
+from backend.paginators import EstimatedCountPaginator
+from backend.routers import pinned, replica_reads
+from backend.search import get_search_backend
+from backend.thumbnails import thumbnail_url
 
 
 # Register your models here.
@@ -39,7 +53,7 @@ class BaseCustomUserAdmin(UserAdmin):
 
     def image_tag(self, obj):
         if obj.image:
-            return format_html('<img src="{}" width="50" height="50" />', obj.image.url)
+            return format_html('<img src="{}" width="50" height="50" loading="lazy" />', thumbnail_url(obj, 50))
         return "-"
     image_tag.short_description = 'Image'
 
@@ -47,21 +61,20 @@ class BaseCustomUserAdmin(UserAdmin):
 @admin.register(AuthorUser)
 class AuthorAdmin(BaseCustomUserAdmin):
     def get_queryset(self, request):
-        return super().get_queryset(request).filter(groups__name='Author')
+        return super().get_queryset(request).filter(role=Role.AUTHOR)
 
 
 @admin.register(MemberUser)
 class MemberAdmin(BaseCustomUserAdmin):
     def get_queryset(self, request):
-        return super().get_queryset(request).filter(groups__name='Member')
+        return super().get_queryset(request).filter(role=Role.MEMBER)
 
 
 @admin.register(AdminUser)
 class AdminUserAdmin(BaseCustomUserAdmin):
     def get_queryset(self, request):
-        return super().get_queryset(request).filter(
-            Q(groups__name='Admin') | Q(groups=None)
-        )
+        # Admins, plus users without any role group (e.g. bootstrap superusers)
+        return super().get_queryset(request).filter(role__in=[Role.ADMIN, ''])
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -75,7 +88,7 @@ class BookAuthorInline(admin.TabularInline):
     def formfield_for_foreignkey(self, db_field, request=None, **kwargs):
         if db_field.name == 'author':
             # Filter only users in the "Author" group
-            kwargs["queryset"] = CustomUser.objects.filter(groups__name='Author')
+            kwargs["queryset"] = CustomUser.objects.filter(role=Role.AUTHOR)
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
 @admin.register(Book)
@@ -83,21 +96,111 @@ class BookAdmin(admin.ModelAdmin):
 
     inlines = [BookAuthorInline]
 
-    list_display = ('title', 'category', 'publication_date', 'copies_owned', 'image_tag',)
+    list_display = ('title', 'category', 'publication_date', 'copies_owned', 'copies_available', 'image_tag',)
+
+    list_select_related = ('category',)
+
+    ordering = ('-id',)  # the changelist default, made explicit for autocomplete paging
 
     search_fields = ('title',)
 
     list_filter = ('category', 'publication_date')
 
+    actions = ['export_selected']
+
+    # Ranked lookup through the catalog search index instead of LIKE scans
+    search_result_limit = 1000
+
+    search_help_text = f'Best matches first, up to {search_result_limit} books.'
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        ids = get_search_backend().search(search_term, limit=self.search_result_limit)
+        queryset = queryset.filter(pk__in=ids)
+        if not ids or ORDER_VAR in request.GET:
+            return queryset, False  # nothing to rank, or a column the user sorted on
+        # The index's order, best match first
+        rank = Case(*[When(pk=pk, then=Value(position)) for position, pk in enumerate(ids)])
+        return queryset.annotate(search_rank=rank).order_by('search_rank', '-pk'), False
+
     def image_tag(self, obj):
-        return format_html('<img src = "{}" width = "150" height="150" />'.format(obj.cover_image.url))
+        if obj.cover_image:
+            return format_html('<img src="{}" width="150" height="150" loading="lazy" />', thumbnail_url(obj, 150))
+        return "-"
 
     image_tag.short_description = 'Image'
 
+    # Bulk catalog import/export
+    def get_urls(self):
+        urls = [
+            path('import/', self.admin_site.admin_view(self.import_view), name='backend_book_import'),
+            path('export/', self.admin_site.admin_view(self.export_view), name='backend_book_export'),
+        ]
+        return urls + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            return redirect('admin:backend_book_changelist')
+        form = CatalogImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = io.TextIOWrapper(form.cleaned_data['file'].file, encoding='utf-8-sig', newline='')
+            report = CatalogImporter().run(read_rows(upload, form.cleaned_data['format']))
+            messages.success(request, f'Imported {report.imported} books, skipped {report.skipped} rows.')
+            for line, message in report.errors[:20]:
+                messages.warning(request, f'Line {line}: {message}')
+            if len(report.errors) > 20:
+                messages.warning(request, f'... and {len(report.errors) - 20} more errors.')
+            return redirect('admin:backend_book_changelist')
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Import books',
+            'form': form,
+        }
+        return TemplateResponse(request, 'admin/backend/book/import.html', context)
+
+    @replica_reads()
+    def export_view(self, request):
+        if not self.has_view_permission(request):
+            return redirect('admin:index')
+        fmt = request.GET.get('format', 'csv')
+        return streaming_export(CATALOG_FIELDS, catalog_rows(pinned(Book.objects.all())), fmt, 'catalog')
+
+    @admin.action(description='Export selected books')
+    @replica_reads()
+    def export_selected(self, request, queryset):
+        return streaming_export(CATALOG_FIELDS, catalog_rows(pinned(queryset)), 'csv', 'catalog')
+
 
 # Utility function to filter only members
 def get_member_queryset():
-    return CustomUser.objects.filter(groups__name='Member')
+    return CustomUser.objects.filter(role=Role.MEMBER)
+
+# Changelists over tables that grow without bound: estimated counts, no
+# per-row FK lookups and no filter or dropdown that lists every book/member.
+class LargeTableAdminMixin:
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_filter_submit = True  # needed by the autocomplete filters
+
+
+# Streams the selected rows, or every row matching the changelist filters
+# when "select all" is used, without loading them into memory.
+class ReportExportMixin:
+    export_report = None
+    actions = ['export_csv', 'export_jsonl']
+
+    @admin.action(description='Export selected as CSV')
+    @replica_reads()
+    def export_csv(self, request, queryset):
+        return REPORTS[self.export_report].response(queryset, 'csv')
+
+    @admin.action(description='Export selected as JSON Lines')
+    @replica_reads()
+    def export_jsonl(self, request, queryset):
+        return REPORTS[self.export_report].response(queryset, 'jsonl')
+
 
 # ---------- Inline for Loans in BookAdmin (Optional) ----------
 class LoanInline(admin.TabularInline):
@@ -106,9 +209,13 @@ class LoanInline(admin.TabularInline):
 
 # ---------- Loan Admin ----------
 @admin.register(Loan)
-class LoanAdmin(admin.ModelAdmin):
+class LoanAdmin(ReportExportMixin, LargeTableAdminMixin, admin.ModelAdmin):
+    export_report = 'loans'
     list_display = ('book', 'member', 'loan_date', 'returned_date')
-    list_filter = ('loan_date', 'returned_date', 'book')
+    list_filter = ('loan_date', 'returned_date', ('book', AutocompleteSelectFilter))
+    list_select_related = ('book', 'member')
+    autocomplete_fields = ('book',)
+    raw_id_fields = ('member',)
 
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         if db_field.name == "member":
@@ -118,9 +225,12 @@ class LoanAdmin(admin.ModelAdmin):
 
 # ---------- Fine Admin ----------
 @admin.register(Fine)
-class FineAdmin(admin.ModelAdmin):
-    list_display = ('member', 'loan', 'fine_date', 'fine_amount')
-    list_filter = ('fine_date',)
+class FineAdmin(ReportExportMixin, LargeTableAdminMixin, admin.ModelAdmin):
+    export_report = 'fines'
+    list_display = ('member', 'loan', 'fine_date', 'fine_amount', 'status')
+    list_filter = ('fine_date', 'status')
+    list_select_related = ('member', 'loan__member', 'loan__book')
+    raw_id_fields = ('member', 'loan')
 
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         if db_field.name == "member":
@@ -129,21 +239,59 @@ class FineAdmin(admin.ModelAdmin):
 
 
 # ---------- Fine Payment Admin ----------
+class FinePaymentAllocationInline(admin.TabularInline):
+    model = FinePaymentAllocation
+    fields = ('fine', 'amount')
+    readonly_fields = ('fine', 'amount')
+    extra = 0
+    can_delete = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('fine__member', 'fine__loan__book')
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(FinePayment)
-class FinePaymentAdmin(admin.ModelAdmin):
-    list_display = ('member', 'payment_date', 'payment_amount')
+class FinePaymentAdmin(ReportExportMixin, LargeTableAdminMixin, admin.ModelAdmin):
+    export_report = 'payments'
+    list_display = ('member', 'payment_date', 'payment_amount', 'refund_due', 'razorpay_payment_id')
     list_filter = ('payment_date',)
+    list_select_related = ('member',)
+    raw_id_fields = ('member',)
+    search_fields = ('razorpay_payment_id',)
+    inlines = (FinePaymentAllocationInline,)
+    readonly_fields = ('razorpay_payment_id', 'razorpay_order_id', 'refund_due')
 
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         if db_field.name == "member":
             kwargs["queryset"] = get_member_queryset()
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
+# ---------- Payment Event Admin ----------
+# Webhook deliveries as received; settled by the process_payment_events command
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('event', 'payment_id', 'received_at', 'processed_at', 'attempts', 'last_error')
+    list_filter = ('event', 'received_at')
+    search_fields = ('payment_id', 'order_id', 'event_id')
+    readonly_fields = [field.name for field in PaymentEvent._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 # ---------- Reservation Admin ----------
 @admin.register(Reservation)
-class ReservationAdmin(admin.ModelAdmin):
+class ReservationAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('book', 'member', 'reservation_date', 'reservation_status')
-    list_filter = ('reservation_date', 'reservation_status', 'book')
+    list_filter = ('reservation_date', 'reservation_status', ('book', AutocompleteSelectFilter))
+    list_select_related = ('book', 'member')
+    autocomplete_fields = ('book',)
+    raw_id_fields = ('member',)
 
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         if db_field.name == "member":
@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class BackendConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'backend'
+
+    def ready(self):
+        from backend import checks, signals  # noqa: F401  checks register on import
+
+        post_migrate.connect(signals.setup_search_index, sender=self)
@@ -0,0 +1,182 @@
+import statistics
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import AnonymousUser
+from django.db import connections
+from django.db.models import Count
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, reverse
+
+from backend.models import Book, CustomUser, Loan
+from backend.stats import member_summary
+from backend.utils import percentile
+from config.templates import LOADERS, template_settings
+from frontend.forms import RegisterForm
+from frontend.pagination import keyset_paginate
+from frontend.views import member_dashboard
+
+# Served while benchmarking: '' reaches home before member_dashboard in
+# frontend.urls, so the dashboard gets a path of its own here
+urlpatterns = [
+    path('benchmark/member-dashboard/', member_dashboard, name='member_dashboard'),
+    path('', include('config.urls')),
+]
+
+
+@dataclass
+class Case:
+    name: str
+    paths: list  # one per iteration, cycled
+    user: CustomUser
+    method: str = 'get'
+
+
+@dataclass
+class Result:
+    queries: int
+    p50_ms: float
+    p95_ms: float
+
+    def as_dict(self):
+        return {'queries': self.queries, 'p50_ms': round(self.p50_ms, 3), 'p95_ms': round(self.p95_ms, 3)}
+
+
+def benchmark_member():
+    """The member with the most loans, so the member pages show the most rows."""
+    busiest = Loan.objects.values('member').annotate(n=Count('id')).order_by('-n', 'member').first()
+    if busiest is None:
+        return None
+    return CustomUser.objects.get(pk=busiest['member'])
+
+
+def benchmark_cases(member, staff, reserve_count):
+    cases = [
+        Case('books_list', [reverse('books_list')], member),
+        Case('member_dashboard', [reverse('member_dashboard')], member),
+        Case('loaned_books', [reverse('loaned_books')], member),
+        Case('fines_view', [reverse('fines')], member),
+        # A different book on every call, so each one creates a reservation
+        Case('reserve_book', [
+            reverse('reserve_book', args=[book_id])
+            for book_id in Book.objects.order_by('pk').values_list('pk', flat=True)[:reserve_count]
+        ], member),
+        # Rendered on the admin index by unfold's DASHBOARD_CALLBACK
+        Case('dashboard_callback', [reverse('admin:index')], staff),
+    ]
+    for model in admin.site._registry:
+        name = f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist'
+        cases.append(Case(name, [reverse(name)], staff))
+    return cases
+
+
+def run_case(client, case, iterations, warmup):
+    """
+    Time ``case`` through the test client. The query count is the most any
+    measured request ran, so a cache miss after the warm-up still shows.
+    """
+    client.force_login(case.user)
+    request = getattr(client, case.method)
+    timings, queries = [], 0
+    for n in range(warmup + iterations):
+        url = case.paths[n % len(case.paths)]
+        with ExitStack() as stack:
+            captured = [stack.enter_context(CaptureQueriesContext(connection)) for connection in connections.all()]
+            started = time.perf_counter()
+            response = request(url)
+            elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code >= 400:
+            raise RuntimeError(f'{case.name}: {url} answered {response.status_code}')
+        if n >= warmup:
+            timings.append(elapsed)
+            queries = max(queries, sum(len(capture) for capture in captured))
+    timings.sort()
+    return Result(queries, statistics.median(timings), percentile(timings, 0.95))
+
+
+def regressions(results, baseline, threshold, min_delta_ms):
+    """
+    Compare against a saved baseline: any extra query is a regression, and so
+    is a p95 more than ``threshold`` (a fraction) and ``min_delta_ms`` slower.
+    """
+    found = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result['queries'] > before['queries']:
+            found.append(f'{name}: {before["queries"]} -> {result["queries"]} queries')
+        slower = result['p95_ms'] - before['p95_ms']
+        if slower > min_delta_ms and result['p95_ms'] > before['p95_ms'] * (1 + threshold):
+            found.append(f'{name}: p95 {before["p95_ms"]:.2f} -> {result["p95_ms"]:.2f} ms')
+    return found
+
+
+# ---------- Template rendering ----------
+# uncached compiles the template on every render, as Django did with DEBUG
+# on before 4.1; the others are the settings.TEMPLATE_PROFILE choices
+TEMPLATE_PROFILES = ('uncached', 'development', 'production')
+
+
+@dataclass
+class TemplateCase:
+    name: str
+    user: CustomUser
+    context: object  # called once per render, so building it (e.g. a form) is timed too
+
+
+def template_engine(profile):
+    """A fresh engine, with empty caches, configured as ``profile``."""
+    params = template_settings(settings.BASE_DIR, 'development' if profile == 'uncached' else profile,
+                               settings.TEMPLATES[0]['OPTIONS']['context_processors'])
+    del params['BACKEND']
+    if profile == 'uncached':
+        params['APP_DIRS'] = False
+        params['OPTIONS'].update(loaders=LOADERS, debug=True)
+    return DjangoTemplates({**params, 'NAME': f'benchmark-{profile}'})
+
+
+def template_cases(member):
+    """The pages as their views render them; the data is fetched once, up front."""
+    page = keyset_paginate(Book.objects.all())
+    books = {
+        'books': page.items,
+        'page': page,
+        'in_stock': False,
+        'card_cache_ttl': settings.CATALOG_FRAGMENT_CACHE_TTL,
+    }
+    summary = member_summary(member.pk)
+    return [
+        TemplateCase('frontend/books.html', member, lambda: books),
+        TemplateCase('frontend/dashboard.html', member, lambda: summary),
+        TemplateCase('frontend/register.html', AnonymousUser(), lambda: {'form': RegisterForm()}),
+    ]
+
+
+def run_template_case(engine, case, iterations, warmup):
+    """
+    Render ``case`` with ``engine``: the first render, which includes loading
+    and compiling the template, is returned in milliseconds next to the timings
+    of the ``iterations`` after the warm-up.
+    """
+    request = RequestFactory().get('/')
+    request.user = case.user
+    timings, queries, first_ms = [], 0, None
+    for n in range(1 + warmup + iterations):
+        with ExitStack() as stack:
+            captured = [stack.enter_context(CaptureQueriesContext(connection)) for connection in connections.all()]
+            started = time.perf_counter()
+            engine.get_template(case.name).render(case.context(), request)
+            elapsed = (time.perf_counter() - started) * 1000
+        if n == 0:
+            first_ms = elapsed
+        elif n > warmup:
+            timings.append(elapsed)
+            queries = max(queries, sum(len(capture) for capture in captured))
+    timings.sort()
+    return Result(queries, statistics.median(timings), percentile(timings, 0.95)), first_ms
@@ -0,0 +1,79 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+CATALOG_VERSION_KEY = 'catalog-version'
+CATALOG_PAGE_KEY = 'catalog-page:{}:{}'
+# {% cache %} fragment name of the cover on a book card, varied on id and thumbnail hash
+BOOK_CARD_FRAGMENT = 'book-card'
+
+
+def catalog_version():
+    """
+    Changes whenever anything shown on the catalog pages does. A timestamp in
+    nanoseconds, so it also serves as Last-Modified and never repeats after
+    the cache is cleared.
+    """
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # The first process to get here sets it
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(CATALOG_VERSION_KEY, 0)
+    return version
+
+
+def invalidate_catalog():
+    cache.set(CATALOG_VERSION_KEY, time.time_ns(), None)
+
+
+def invalidate_book_card(book):
+    cache.delete(make_template_fragment_key(BOOK_CARD_FRAGMENT, [book.pk, book.thumbnail_hash]))
+
+
+def page_variant(request):
+    # GET and HEAD share an entry; Accept picks between HTML and JSON
+    query = sorted((key, value) for key in request.GET for value in request.GET.getlist(key))
+    raw = repr((request.path, query, request.headers.get('Accept', '')))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def cache_anonymous_page(view):
+    """
+    Serve anonymous GETs of a catalog page from the cache, one entry per
+    path, query string and Accept header and catalog version, and answer
+    If-None-Match / If-Modified-Since with a 304. Signed-in members, whose
+    pages carry their name and CSRF tokens, always get a fresh render.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+
+        version = catalog_version()
+        variant = page_variant(request)
+        etag = quote_etag(f'{version:x}-{variant[:16]}')
+        last_modified = version // 1_000_000_000
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            key = CATALOG_PAGE_KEY.format(version, variant)
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                # Never share a response that sets a cookie
+                if response.status_code == 200 and not response.streaming and not response.cookies:
+                    cache.set(key, response, settings.CATALOG_PAGE_CACHE_TTL)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            # Shared caches may keep it but must check back, which costs a 304
+            patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+            patch_vary_headers(response, ('Cookie', 'Accept'))
+        return response
+    return wrapper
@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.templates, deploy=True)
+def check_template_profile(app_configs, **kwargs):
+    if settings.DEBUG or settings.TEMPLATE_PROFILE == 'production':
+        return []
+    return [Warning(
+        'Templates use the development profile with DEBUG off.',
+        hint='Set TEMPLATE_PROFILE=production for cached loaders, no template debug info and warm-up.',
+        id='backend.W001',
+    )]
@@ -0,0 +1,91 @@
+from datetime import date
+
+from django.db import transaction
+
+from backend.models import Book, Loan, Reservation, ReservationStatus
+
+ACTIVE_RESERVATION_STATUSES = (ReservationStatus.PENDING, ReservationStatus.APPROVED)
+
+
+class CirculationError(Exception):
+    pass
+
+
+class BookUnavailable(CirculationError):
+    pass
+
+
+def lock_book(book_id):
+    """
+    Lock the book row for the rest of the transaction. On PostgreSQL this is a
+    row lock; SQLite ignores FOR UPDATE, which is why the database runs with
+    transaction_mode IMMEDIATE and takes the write lock when the transaction opens.
+    """
+    return Book.objects.select_for_update().get(pk=book_id)
+
+
+def reserve_book(member, book_id):
+    """
+    Reserve a copy for ``member``. Approved straight away while a copy is
+    free, otherwise queued on the waitlist. Repeating the request returns the
+    member's existing active reservation instead of creating another one.
+
+    Returns ``(reservation, created)``.
+    """
+    with transaction.atomic():
+        book = lock_book(book_id)
+        existing = Reservation.objects.filter(
+            book=book, member=member, reservation_status__in=ACTIVE_RESERVATION_STATUSES
+        ).first()
+        if existing is not None:
+            return existing, False
+
+        status = ReservationStatus.APPROVED if book.copies_available > 0 else ReservationStatus.PENDING
+        reservation = Reservation.objects.create(
+            book=book,
+            member=member,
+            reservation_date=date.today(),
+            reservation_status=status,
+        )
+        return reservation, True
+
+
+def cancel_reservation(reservation):
+    with transaction.atomic():
+        lock_book(reservation.book_id)
+        reservation.refresh_from_db()
+        if reservation.reservation_status in ACTIVE_RESERVATION_STATUSES:
+            reservation.reservation_status = ReservationStatus.CANCELLED
+            reservation.save(update_fields=['reservation_status'])
+        return reservation
+
+
+def checkout(member, book_id, loan_date=None):
+    """
+    Lend a copy to ``member``, consuming their approved reservation if they
+    hold one. Raises ``BookUnavailable`` when no copy is free for them.
+    """
+    with transaction.atomic():
+        book = lock_book(book_id)
+        reservation = Reservation.objects.filter(
+            book=book, member=member, reservation_status=ReservationStatus.APPROVED
+        ).first()
+        if reservation is None and book.copies_available <= 0:
+            raise BookUnavailable(f'No copies of "{book.title}" are available')
+
+        loan = Loan.objects.create(book=book, member=member, loan_date=loan_date or date.today())
+        if reservation is not None:
+            reservation.reservation_status = ReservationStatus.FULFILLED
+            reservation.save(update_fields=['reservation_status'])
+        return loan
+
+
+def return_loan(loan, returned_date=None):
+    """Close ``loan``; the freed copy goes to the head of the book's waitlist."""
+    with transaction.atomic():
+        lock_book(loan.book_id)
+        loan.refresh_from_db()
+        if loan.returned_date is None:
+            loan.returned_date = returned_date or date.today()
+            loan.save(update_fields=['returned_date'])
+        return loan
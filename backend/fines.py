@@ -0,0 +1,117 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DateField, ExpressionWrapper, F, Q
+
+from backend.models import Fine, FineStatus, JobCheckpoint, Loan
+from backend.stats import invalidate_admin_stats, invalidate_member_summary
+
+BATCH_SIZE = 500
+
+
+@dataclass(frozen=True)
+class FinePolicy:
+    loan_period_days: int
+    rate_per_day: Decimal
+    grace_days: int = 0
+    max_amount: Decimal = None
+
+    @classmethod
+    def from_settings(cls, **overrides):
+        max_amount = overrides.get('max_amount', settings.LIBRARY_FINE_MAX_AMOUNT)
+        return cls(
+            loan_period_days=overrides.get('loan_period_days', settings.LIBRARY_LOAN_PERIOD_DAYS),
+            rate_per_day=Decimal(str(overrides.get('rate_per_day', settings.LIBRARY_FINE_RATE_PER_DAY))),
+            grace_days=overrides.get('grace_days', settings.LIBRARY_FINE_GRACE_DAYS),
+            max_amount=Decimal(str(max_amount)) if max_amount is not None else None,
+        )
+
+    def overdue_days(self, loan_date, returned_date, as_of):
+        end = min(returned_date, as_of) if returned_date else as_of
+        days = (end - loan_date).days - self.loan_period_days - self.grace_days
+        return max(days, 0)
+
+    def amount(self, days):
+        amount = self.rate_per_day * days
+        if self.max_amount is not None:
+            amount = min(amount, self.max_amount)
+        return amount.quantize(Decimal('0.01'))
+
+
+def overdue_loans(as_of, policy):
+    """Loans that were open past their due date as of ``as_of``."""
+    period = timedelta(days=policy.loan_period_days + policy.grace_days)
+    due = ExpressionWrapper(F('loan_date') + period, output_field=DateField())
+    return Loan.objects.filter(loan_date__lt=as_of - period).filter(
+        Q(returned_date__isnull=True) | Q(returned_date__gt=due)
+    )
+
+
+def accrue_range(start_id, end_id, as_of, policy):
+    """
+    Create or refresh the accrued fine of every overdue loan with
+    ``start_id < id <= end_id``. The chunk commits as one transaction and
+    rerunning it for the same ``as_of`` changes nothing; fines that were
+    already paid are left alone.
+
+    Returns ``(loans_scanned, fines_created, fines_updated)``.
+    """
+    loans = list(
+        overdue_loans(as_of, policy)
+        .filter(id__gt=start_id, id__lte=end_id)
+        .values_list('id', 'member_id', 'loan_date', 'returned_date')
+    )
+    if not loans:
+        return 0, 0, 0
+
+    with transaction.atomic():
+        # Locked so that a fine settled meanwhile is not repriced after it was paid
+        existing = {
+            fine.loan_id: fine
+            for fine in Fine.objects.select_for_update().filter(loan_id__in=[loan[0] for loan in loans], accrued=True)
+        }
+        to_create, to_update, members = [], defaultdict(list), set()
+        for loan_id, member_id, loan_date, returned_date in loans:
+            amount = policy.amount(policy.overdue_days(loan_date, returned_date, as_of))
+            if not amount:
+                continue
+            fine = existing.get(loan_id)
+            if fine is None:
+                to_create.append(Fine(
+                    member_id=member_id, loan_id=loan_id, fine_date=as_of, fine_amount=amount, accrued=True,
+                ))
+            elif fine.status == FineStatus.PENDING and fine.fine_amount != amount:
+                to_update[amount].append(fine.pk)
+            else:
+                continue
+            members.add(member_id)
+
+        Fine.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+        # Amounts are rate x days, so a chunk has few distinct values: one
+        # UPDATE ... WHERE id IN (...) per amount beats a CASE-per-row bulk_update.
+        updated = 0
+        for amount, fine_ids in to_update.items():
+            for start in range(0, len(fine_ids), BATCH_SIZE):
+                updated += Fine.objects.filter(
+                    pk__in=fine_ids[start:start + BATCH_SIZE], status=FineStatus.PENDING,
+                ).update(fine_amount=amount, fine_date=as_of)
+        # bulk writes skip the signals that expire cached figures
+        if members:
+            transaction.on_commit(lambda: invalidate_member_summary(*members))
+            transaction.on_commit(invalidate_admin_stats)
+
+    return len(loans), len(to_create), updated
+
+
+def load_checkpoint(name):
+    checkpoint, _ = JobCheckpoint.objects.get_or_create(name=name)
+    return checkpoint
+
+
+def save_checkpoint(checkpoint, position):
+    checkpoint.position = position
+    checkpoint.save(update_fields=['position', 'updated_at'])
@@ -1,3 +1,4 @@
+from django import forms
 from backend.models import CustomUser
 from django.contrib.auth.forms import UserCreationForm,UserChangeForm
 
@@ -11,3 +12,8 @@ class CustomUserChangeForm(UserChangeForm):
         model = CustomUser
         fields = ('email',)
 
+
+
+class CatalogImportForm(forms.Form):
+    file = forms.FileField(help_text='CSV or JSON Lines with title, category, publication_date, copies_owned, authors')
+    format = forms.ChoiceField(choices=[('csv', 'CSV'), ('jsonl', 'JSON Lines')])
@@ -0,0 +1,191 @@
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import requests
+
+
+def sign(message, secret):
+    return hmac.new(secret.encode(), message.encode(), hashlib.sha256).hexdigest()
+
+
+class StubGateway(ThreadingHTTPServer):
+    """
+    A local stand-in for the parts of the Razorpay API the library uses, for
+    load tests and development without network access or keys. Every call
+    sleeps ``latency`` (plus up to ``jitter``) seconds and fails with a 500
+    at ``failure_rate``, so slow and flaky gateways can be reproduced.
+
+    capture() plays the part of a member completing checkout: it records a
+    captured payment for an order, returns the checkout signature and, when
+    ``webhook_url`` is set, delivers a signed payment.captured webhook.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address=('127.0.0.1', 0), latency=0.0, jitter=0.0, failure_rate=0.0, verbose=False,
+                 key_secret='stub-secret', webhook_url=None, webhook_secret=None):
+        super().__init__(address, StubHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.verbose = verbose
+        self.key_secret = key_secret
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+        self.orders = {}
+        self.payments = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, name='payment-gateway-stub', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def capture(self, order_id, webhook=True):
+        """Pay ``order_id`` in full; returns the payment and its checkout signature."""
+        with self.lock:
+            order = self.orders[order_id]
+            payment = {
+                'id': f'pay_{uuid.uuid4().hex[:14]}',
+                'entity': 'payment',
+                'amount': order['amount'],
+                'currency': order['currency'],
+                'status': 'captured',
+                'order_id': order_id,
+                'method': 'card',
+                'captured': True,
+                'notes': {},
+                'created_at': int(time.time()),
+            }
+            self.payments[payment['id']] = payment
+            order.update(status='paid', amount_paid=order['amount'], amount_due=0, attempts=order['attempts'] + 1)
+        if webhook and self.webhook_url:
+            self.deliver('payment.captured', payment)
+        return payment, sign(f'{order_id}|{payment["id"]}', self.key_secret)
+
+    def deliver(self, event, payment, event_id=None):
+        body = json.dumps({
+            'entity': 'event',
+            'account_id': 'acc_stub',
+            'event': event,
+            'contains': ['payment'],
+            'payload': {'payment': {'entity': payment}},
+            'created_at': int(time.time()),
+        })
+        headers = {
+            'Content-Type': 'application/json',
+            'X-Razorpay-Event-Id': event_id or f'evt_{uuid.uuid4().hex[:14]}',
+            'X-Razorpay-Signature': sign(body, self.webhook_secret or ''),
+        }
+        return requests.post(self.webhook_url, data=body.encode(), headers=headers, timeout=10)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+    def do_GET(self):
+        path, _, query = self.path.partition('?')
+        parts = path.strip('/').split('/')
+        if parts[:1] != ['v1'] or len(parts) not in (2, 3) or parts[1] not in ('orders', 'payments'):
+            return self.not_found()
+        objects = getattr(self.server, parts[1])
+        if len(parts) == 3:
+            found = objects.get(parts[2])
+            if found is None:
+                return self.error(400, 'BAD_REQUEST_ERROR', 'The id provided does not exist')
+            return self.delayed(200, found)
+
+        params = {key: values[0] for key, values in parse_qs(query).items()}
+        try:
+            since, until = int(params.get('from', 0)), int(params.get('to', 2 ** 40))
+            count, skip = min(int(params.get('count', 10)), 100), int(params.get('skip', 0))
+        except ValueError:
+            return self.error(400, 'BAD_REQUEST_ERROR', 'from, to, count and skip must be integers')
+        with self.server.lock:
+            matching = [item for item in objects.values() if since <= item['created_at'] <= until]
+        matching.sort(key=lambda item: item['created_at'], reverse=True)
+        items = matching[skip:skip + count]
+        self.delayed(200, {'entity': 'collection', 'count': len(items), 'items': items})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        parts = self.path.split('?')[0].strip('/').split('/')
+        if parts[:3] == ['v1', 'stub', 'orders'] and len(parts) == 5 and parts[4] == 'pay':
+            if parts[3] not in self.server.orders:
+                return self.error(400, 'BAD_REQUEST_ERROR', 'The id provided does not exist')
+            payment, signature = self.server.capture(parts[3])
+            return self.respond(200, {'payment': payment, 'razorpay_signature': signature})
+        if parts != ['v1', 'orders']:
+            return self.not_found()
+        try:
+            data = json.loads(body or b'{}')
+            amount = int(data['amount'])
+        except (ValueError, KeyError, TypeError):
+            return self.error(400, 'BAD_REQUEST_ERROR', 'The amount field is required.')
+        if amount < 100:
+            return self.error(400, 'BAD_REQUEST_ERROR', 'Order amount less than minimum amount allowed')
+
+        order = {
+            'id': f'order_{uuid.uuid4().hex[:14]}',
+            'entity': 'order',
+            'amount': amount,
+            'amount_paid': 0,
+            'amount_due': amount,
+            'currency': data.get('currency', 'INR'),
+            'receipt': data.get('receipt'),
+            'status': 'created',
+            'attempts': 0,
+            'notes': data.get('notes') or {},
+            'created_at': int(time.time()),
+        }
+        # Stored before the answer goes out, so it can be paid straight away
+        with self.server.lock:
+            self.server.orders[order['id']] = order
+        if not self.delayed(200, order):
+            with self.server.lock:
+                del self.server.orders[order['id']]
+
+    def delayed(self, status, payload):
+        """Answer after the configured latency; returns False if a failure was injected instead."""
+        server = self.server
+        time.sleep(server.latency + random.uniform(0, server.jitter))
+        if server.failure_rate and random.random() < server.failure_rate:
+            self.error(500, 'SERVER_ERROR', 'The server encountered an error. The incident has been reported to admins.')
+            return False
+        self.respond(status, payload)
+        return True
+
+    def not_found(self):
+        self.error(404, 'BAD_REQUEST_ERROR', 'The requested URL was not found on the server.')
+
+    def error(self, status, code, description):
+        self.respond(status, {'error': {'code': code, 'description': description}})
+
+    def respond(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
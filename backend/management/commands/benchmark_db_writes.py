@@ -0,0 +1,169 @@
+import random
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+
+from backend import circulation
+from backend.utils import percentile
+from backend.models import Book, Category, CustomUser, Fine, Loan
+from backend.settlement import settle_payment
+from config.database import sqlite_options
+
+# Every third write settles a payment, the rest reserve a book
+SETTLE_EVERY = 3
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure write throughput under concurrency: threads run reserve_book and '
+        'payment settlements while readers query the catalog. On SQLite it runs '
+        'once with the stock journal (before) and once with the tuned PRAGMAs from '
+        'config/database.py (after). Creates its own fixtures and removes them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--readers', type=int, default=4, help='Threads reading while the writes run.')
+        parser.add_argument('--ops', type=int, default=1000, help='Writes per profile.')
+        parser.add_argument('--members', type=int, default=200)
+        parser.add_argument('--books', type=int, default=100)
+        parser.add_argument('--profiles', default='stock,tuned',
+                            help='SQLite only: comma separated profiles to compare.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            if connection.is_in_memory_db():
+                raise CommandError('Run the benchmark against a file-backed database.')
+            profiles = {
+                'stock': sqlite_options(tuned=False),
+                'tuned': sqlite_options(tuned=True),
+            }
+            try:
+                profiles = {name: profiles[name] for name in options['profiles'].split(',')}
+            except KeyError as exc:
+                raise CommandError(f'Unknown profile {exc}; use stock and/or tuned')
+        else:
+            # The configured CONN_MAX_AGE / pool is what gets measured
+            profiles = {'configured': None}
+
+        settings_dict = connections.settings['default']
+        configured = settings_dict['OPTIONS']
+        self.stdout.write(
+            f'{"profile":<12} {"journal":<8} {"sync":>4} {"writes/s":>9} {"p50 ms":>8} {"p95 ms":>8} '
+            f'{"locked":>7} {"reads/s":>9}'
+        )
+        try:
+            for name, profile_options in profiles.items():
+                if profile_options is not None:
+                    # Connections opened from here on, in any thread, use these options
+                    connections.close_all()
+                    settings_dict['OPTIONS'] = profile_options
+                self.run_profile(name, options)
+        finally:
+            connections.close_all()
+            settings_dict['OPTIONS'] = configured
+
+    def run_profile(self, name, options):
+        run_id = uuid.uuid4().hex[:8]
+        rng = random.Random(options['seed'])
+        members, books, fines = self.fixtures(run_id, options)
+        writes = [
+            ('settle', fines.pop()) if n % SETTLE_EVERY == 0 else ('reserve', (rng.choice(members), rng.choice(books)))
+            for n in range(options['ops'])
+        ]
+
+        def write(op):
+            kind, args = op
+            started = time.perf_counter()
+            try:
+                if kind == 'settle':
+                    settle_payment(f'pay_{run_id}_{args.pk}', args.razorpay_order_id, args.razorpay_order_amount)
+                else:
+                    circulation.reserve_book(*args)
+                return time.perf_counter() - started, None
+            except OperationalError as exc:
+                return time.perf_counter() - started, str(exc)
+
+        def writer(ops):
+            try:
+                return [write(op) for op in ops]
+            finally:
+                connection.close()
+
+        done = threading.Event()
+        reads = []
+
+        def reader():
+            count = 0
+            try:
+                while not done.is_set():
+                    Book.objects.in_stock().filter(category__name=f'Write benchmark {run_id}').count()
+                    count += 1
+            except OperationalError:
+                pass
+            finally:
+                connection.close()
+                reads.append(count)
+
+        try:
+            journal = sync = '-'
+            if connection.vendor == 'sqlite':
+                with connection.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    journal = cursor.fetchone()[0]
+                    cursor.execute('PRAGMA synchronous')
+                    sync = cursor.fetchone()[0]
+            readers = [threading.Thread(target=reader) for _ in range(options['readers'])]
+            for thread in readers:
+                thread.start()
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                shares = [writes[n::options['threads']] for n in range(options['threads'])]
+                results = [result for share in pool.map(writer, shares) for result in share]
+            elapsed = time.perf_counter() - started
+            done.set()
+            for thread in readers:
+                thread.join()
+        finally:
+            done.set()
+            CustomUser.objects.filter(email__startswith=f'writebench-{run_id}-').delete()
+            Category.objects.filter(name=f'Write benchmark {run_id}').delete()
+
+        timings = sorted(duration * 1000 for duration, _ in results)
+        locked = sum(1 for _, error in results if error)
+        self.stdout.write(
+            f'{name:<12} {journal:<8} {sync:>4} {len(results) / elapsed:>9.1f} {statistics.median(timings):>8.2f} '
+            f'{percentile(timings, 0.95):>8.2f} {locked:>7} {sum(reads) / elapsed:>9.1f}'
+        )
+
+    def fixtures(self, run_id, options):
+        category = Category.objects.create(name=f'Write benchmark {run_id}')
+        books = Book.objects.bulk_create(
+            Book(title=f'Write benchmark {n}', category=category, publication_date=date.today(), copies_owned=3,
+                 copies_available=3)
+            for n in range(options['books'])
+        )
+        members = CustomUser.objects.bulk_create(
+            CustomUser(email=f'writebench-{run_id}-{n}@example.com', first_name='Write', last_name=str(n), password='!')
+            for n in range(options['members'])
+        )
+        # One fine with its own order per settlement
+        settlements = options['ops'] // SETTLE_EVERY + 1
+        loans = Loan.objects.bulk_create(
+            Loan(book=books[n % len(books)], member=members[n % len(members)], loan_date=date.today(),
+                 returned_date=date.today())
+            for n in range(settlements)
+        )
+        fines = Fine.objects.bulk_create(
+            Fine(member_id=loan.member_id, loan=loan, fine_date=date.today(), fine_amount='10.00',
+                 razorpay_order_id=f'order_{run_id}_{n}', razorpay_order_amount=1000)
+            for n, loan in enumerate(loans)
+        )
+        return members, [book.id for book in books], fines
@@ -0,0 +1,67 @@
+import random
+import statistics
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from backend.models import Book, Category
+from backend.search import get_search_backend
+from backend.utils import percentile
+
+WORDS = (
+    'river', 'shadow', 'garden', 'empire', 'silent', 'winter', 'glass', 'ocean', 'history', 'machine',
+    'crown', 'forest', 'letters', 'memory', 'stone', 'north', 'city', 'music', 'signal', 'harvest',
+)
+# Compound words give a vocabulary of a few hundred terms, so matches stay selective
+VOCABULARY = [first + second for first in WORDS for second in WORDS if first != second]
+
+
+class Command(BaseCommand):
+    help = (
+        'Time catalog search queries while the catalog grows. Synthetic books are '
+        'inserted inside a transaction that is rolled back at the end.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000',
+                            help='Comma separated catalog sizes to measure at.')
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        backend = get_search_backend()
+        backend.setup()
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        queries = [rng.choice(VOCABULARY) for _ in range(options['queries'])]
+
+        self.stdout.write(f'{"books":>10} {"p50 ms":>10} {"p95 ms":>10}')
+        with transaction.atomic():
+            category = Category.objects.create(name='Benchmark')
+            inserted = 0
+            for size in sizes:
+                books = Book.objects.bulk_create(
+                    Book(
+                        title=' '.join(rng.sample(VOCABULARY, 4)),
+                        category=category,
+                        publication_date=date.today(),
+                        copies_owned=1,
+                    )
+                    for _ in range(size - inserted)
+                )
+                backend.index_books(book.id for book in books)
+                inserted = size
+
+                timings = []
+                for query in queries:
+                    started = time.perf_counter()
+                    backend.search(query, limit=25)
+                    timings.append((time.perf_counter() - started) * 1000)
+                timings.sort()
+                self.stdout.write(
+                    f'{size:>10} {statistics.median(timings):>10.2f} {percentile(timings, 0.95):>10.2f}'
+                )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,83 @@
+import fnmatch
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.benchmarks import (
+    TEMPLATE_PROFILES, benchmark_member, regressions, run_template_case, template_cases, template_engine,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Time how long the catalog, dashboard and registration templates take to '
+        'render under each template profile, slowest first. The first render, '
+        'which includes compiling the template, is shown separately; warm-up '
+        'removes it in production. Compares against a JSON baseline like '
+        'run_benchmarks; --save writes the baseline instead.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--baseline', default=str(settings.BASE_DIR / 'template_baseline.json'))
+        parser.add_argument('--save', action='store_true', help='Write the results as the new baseline.')
+        parser.add_argument('--profiles', default=','.join(TEMPLATE_PROFILES),
+                            help=f'Comma separated, out of {", ".join(TEMPLATE_PROFILES)}.')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Fail when a p95 is this fraction slower than the baseline.')
+        parser.add_argument('--min-delta-ms', type=float, default=0.5,
+                            help='Ignore p95 changes smaller than this many milliseconds.')
+        parser.add_argument('--only', action='append', default=[],
+                            help='Template names to render (shell-style patterns); repeatable.')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1 or options['warmup'] < 0:
+            raise CommandError('--iterations must be positive and --warmup not negative')
+        profiles = [profile.strip() for profile in options['profiles'].split(',') if profile.strip()]
+        unknown = set(profiles) - set(TEMPLATE_PROFILES)
+        if unknown:
+            raise CommandError(f'Unknown profiles: {", ".join(sorted(unknown))}')
+        member = benchmark_member()
+        if member is None:
+            raise CommandError('No loans to benchmark with; run generate_library_data first')
+
+        cases = template_cases(member)
+        if options['only']:
+            cases = [case for case in cases if any(fnmatch.fnmatch(case.name, p) for p in options['only'])]
+        results, rows = {}, []
+        for profile in profiles:
+            engine = template_engine(profile)
+            for case in cases:
+                result, first_ms = run_template_case(engine, case, options['iterations'], options['warmup'])
+                name = f'{profile}:{case.name}'
+                results[name] = result.as_dict()
+                rows.append((name, result, first_ms))
+
+        self.stdout.write(f'{"template":<40} {"queries":>8} {"first ms":>10} {"p50 ms":>10} {"p95 ms":>10}')
+        for name, result, first_ms in sorted(rows, key=lambda row: row[1].p95_ms, reverse=True):
+            self.stdout.write(
+                f'{name:<40} {result.queries:>8} {first_ms:>10.2f} {result.p50_ms:>10.2f} {result.p95_ms:>10.2f}'
+            )
+
+        baseline_path = Path(options['baseline'])
+        environment = {'iterations': options['iterations'], 'warmup': options['warmup']}
+        if options['save']:
+            baseline_path.write_text(json.dumps({'environment': environment, 'results': results}, indent=2) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {baseline_path}'))
+            return
+        if not baseline_path.exists():
+            self.stdout.write(f'No baseline at {baseline_path}; run with --save to create one')
+            return
+
+        baseline = json.loads(baseline_path.read_text())
+        if baseline['environment'] != environment:
+            self.stderr.write(f'Baseline was taken on {baseline["environment"]}, this run on {environment}')
+        found = regressions(results, baseline['results'], options['threshold'], options['min_delta_ms'])
+        for regression in found:
+            self.stderr.write(f'  {regression}')
+        if found:
+            raise CommandError(f'{len(found)} regressions against {baseline_path}')
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
@@ -0,0 +1,137 @@
+import hashlib
+import multiprocessing
+import os
+import shutil
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from backend.models import DEFAULT_AVATARS, Book, CustomUser, MediaBlob
+from backend.utils import chunked
+from backend.storage import blob_digest, blob_name, media_storage
+
+IMAGE_FIELDS = ((Book, 'cover_image'), (CustomUser, 'image'))
+
+# Shared files the models point at by name
+SHARED_FILES = {Book._meta.get_field('cover_image').default, *DEFAULT_AVATARS}
+
+
+def _close_connections():
+    # Forked workers must not share the parent's database connections
+    connections.close_all()
+
+
+def _store_blob(args):
+    """Hash one file and hard-link it into its blob path; runs in a worker."""
+    location, name, dry_run = args
+    digest = hashlib.sha256()
+    with open(os.path.join(location, name), 'rb') as source:
+        for chunk in iter(lambda: source.read(1024 * 1024), b''):
+            digest.update(chunk)
+    target = blob_name(name, digest.hexdigest())
+    source_path, target_path = os.path.join(location, name), os.path.join(location, target)
+    if not dry_run and not os.path.exists(target_path):
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        try:
+            os.link(source_path, target_path)
+        except FileExistsError:
+            pass  # another worker stored the same content first
+        except OSError:
+            shutil.copy2(source_path, target_path)
+    return name, target, os.path.getsize(source_path)
+
+
+class Command(BaseCommand):
+    help = (
+        'Move the existing cover and profile images into content-addressed storage: '
+        'hash every file in a process pool, keep one blob per distinct content, '
+        'repoint the rows at the blobs, rebuild the reference counts and remove the '
+        'old per-upload copies.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+        parser.add_argument('--dry-run', action='store_true', help='Report the savings without changing anything.')
+        parser.add_argument('--keep-originals', action='store_true', help='Leave the old files in place.')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers must be positive')
+        storage = media_storage()
+        location = storage.location
+        dry_run = options['dry_run']
+
+        names = list(self.legacy_files(location))
+        started = time.perf_counter()
+        tasks = [(location, name, dry_run) for name in names]
+        if options['workers'] > 1:
+            _close_connections()
+            with multiprocessing.get_context('fork').Pool(options['workers'], initializer=_close_connections) as pool:
+                results = list(pool.imap_unordered(_store_blob, tasks, chunksize=16))
+        else:
+            results = list(map(_store_blob, tasks))
+
+        moves = {name: target for name, target, _ in results}
+        total = sum(size for _, _, size in results)
+        unique = {target: size for _, target, size in results}
+        self.stdout.write(
+            f'{len(results)} files, {len(unique)} distinct, '
+            f'{total / 1e6:.1f}MB -> {sum(unique.values()) / 1e6:.1f}MB '
+            f'(hashed in {time.perf_counter() - started:.1f}s)'
+        )
+        if dry_run:
+            return
+
+        repointed = self.repoint_rows(moves)
+        with transaction.atomic():
+            blobs = MediaBlob.objects.recount()
+        self.stdout.write(f'{repointed} rows repointed, {blobs} referenced blobs counted')
+
+        if not options['keep_originals']:
+            # A row saved during the run may still hold an old name
+            still_used = set()
+            for model, field in IMAGE_FIELDS:
+                still_used.update(model._base_manager.values_list(field, flat=True).distinct())
+            for name in moves.keys() - still_used:
+                try:
+                    os.remove(os.path.join(location, name))
+                except FileNotFoundError:
+                    pass
+        self.stdout.write(self.style.SUCCESS('Media deduplicated'))
+
+    def legacy_files(self, location):
+        """Files under the image upload directories that are not blobs yet."""
+        for model, field in IMAGE_FIELDS:
+            upload_to = model._meta.get_field(field).upload_to.strip('/')
+            root = os.path.join(location, upload_to)
+            for directory, _, files in os.walk(root):
+                for filename in files:
+                    name = os.path.relpath(os.path.join(directory, filename), location).replace(os.sep, '/')
+                    if filename.startswith('.') or blob_digest(name) or name in SHARED_FILES:
+                        continue
+                    yield name
+
+    def repoint_rows(self, moves, batch_size=2000):
+        # Walk by primary key and group the UPDATEs by target blob, so no
+        # unindexed WHERE <image> = ... scans are needed
+        repointed = 0
+        for model, field in IMAGE_FIELDS:
+            rows = model._base_manager.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+            last_pk = 0
+            while True:
+                batch = list(rows.filter(pk__gt=last_pk).order_by('pk').values_list('pk', field)[:batch_size])
+                if not batch:
+                    break
+                last_pk = batch[-1][0]
+                by_target = defaultdict(list)
+                for pk, name in batch:
+                    if name in moves:
+                        by_target[moves[name]].append(pk)
+                with transaction.atomic():
+                    for target, pks in by_target.items():
+                        for chunk in chunked(pks, 500):
+                            model._base_manager.filter(pk__in=chunk).update(**{field: target})
+                repointed += sum(len(pks) for pks in by_target.values())
+        return repointed
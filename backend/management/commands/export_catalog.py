@@ -0,0 +1,25 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from backend.exports import csv_lines, jsonl_lines
+from backend.importers import CATALOG_FIELDS, catalog_rows
+
+
+class Command(BaseCommand):
+    help = 'Write the catalog as CSV or JSON Lines in the format import_catalog reads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Defaults to stdout.')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        lines = jsonl_lines if options['format'] == 'jsonl' else csv_lines
+        rows = catalog_rows(chunk_size=options['chunk_size'])
+        stream = open(options['output'], 'w', encoding='utf-8', newline='') if options['output'] else sys.stdout
+        try:
+            stream.writelines(lines(CATALOG_FIELDS, rows))
+        finally:
+            if options['output']:
+                stream.close()
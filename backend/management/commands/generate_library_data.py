@@ -0,0 +1,47 @@
+from datetime import date
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.models import Category, CustomUser
+from backend.stats import invalidate_admin_stats
+from backend.synthetic import LibraryScale, generate_library
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the database with a deterministic synthetic library (categories, '
+        'books, authors, members, loans, fines, payments and reservations) for '
+        'benchmarks. --rows sets the rough total across all tables.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Approximate rows to create, e.g. 10000 to 10000000.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--as-of', type=date.fromisoformat, default=date.today(),
+                            help='Date the generated history ends on (YYYY-MM-DD); with --seed it fixes the data.')
+        parser.add_argument('--prefix', default='synthetic', help='Prefix for generated emails and category names.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert and transaction.')
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--rows and --batch-size must be positive')
+        prefix = options['prefix']
+        if CustomUser.objects.filter(email__startswith=f'{prefix}-').exists() or \
+                Category.objects.filter(name__startswith=f'{prefix} ').exists():
+            raise CommandError(f'Data with prefix "{prefix}" already exists; pick another --prefix')
+
+        scale = LibraryScale.for_rows(options['rows'])
+        verbose = options['verbosity'] > 1
+
+        def progress(model, count):
+            if verbose:
+                self.stdout.write(f'  {model:<12} {count}')
+
+        counts = generate_library(scale, options['seed'], options['as_of'], prefix, options['batch_size'], progress)
+        call_command('rebuild_availability', stdout=self.stdout if verbose else None)
+        invalidate_admin_stats()
+
+        for model, count in counts.items():
+            self.stdout.write(f'{model:<12} {count:>10}')
+        self.stdout.write(self.style.SUCCESS(f'Generated {sum(counts.values())} rows'))
@@ -0,0 +1,112 @@
+import multiprocessing
+import time
+from collections import defaultdict
+from functools import lru_cache
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from backend.models import Book, CustomUser
+from backend.storage import blob_digest
+from backend.utils import chunked
+from backend.thumbnails import ThumbnailError, generate_thumbnails, spec_for
+
+MODELS = {'books': Book, 'users': CustomUser}
+
+
+def _close_connections():
+    # Forked workers must not share the parent's database connections
+    connections.close_all()
+
+
+@lru_cache(maxsize=4096)
+def _digest(label, name, force):
+    # Rows sharing an upload are hashed once per worker
+    return generate_thumbnails(name, spec_for(MODELS[label]), force=force)
+
+
+def _generate_chunk(args):
+    label, rows, force = args
+    digests, errors = [], []
+    for pk, name in rows:
+        # Only uploads, as in refresh_thumbnails; dedupe_media moves older uploads into blobs
+        if not blob_digest(name):
+            continue
+        try:
+            digests.append((pk, _digest(label, name, force)))
+        except ThumbnailError as exc:
+            errors.append(str(exc))
+    return digests, errors
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate the cover and avatar thumbnails for rows that have none yet. '
+        'Images are decoded and resized in a process pool; the parent process '
+        'records each content hash with one UPDATE per hash and chunk.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=[*MODELS, 'all'], default='all')
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+        parser.add_argument('--chunk-size', type=int, default=100, help='Rows handed to a worker at a time.')
+        parser.add_argument('--force', action='store_true',
+                            help='Re-encode every row, including those that already have thumbnails.')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--chunk-size and --workers must be positive')
+        labels = list(MODELS) if options['model'] == 'all' else [options['model']]
+
+        pool = None
+        if options['workers'] > 1:
+            _close_connections()
+            context = multiprocessing.get_context('fork')
+            pool = context.Pool(options['workers'], initializer=_close_connections)
+        try:
+            for label in labels:
+                self.backfill(label, pool, options)
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+
+    def backfill(self, label, pool, options):
+        model = MODELS[label]
+        field = spec_for(model).field
+        rows = model._base_manager.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+        if not options['force']:
+            rows = rows.filter(thumbnail_hash='')
+
+        # Walk by primary key so the updates below never disturb an open cursor
+        done = failed = 0
+        last_pk = 0
+        window = options['chunk_size'] * max(options['workers'], 1) * 4
+        started = time.perf_counter()
+        while True:
+            batch = list(rows.filter(pk__gt=last_pk).order_by('pk').values_list('pk', field)[:window])
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            tasks = [(label, chunk, options['force']) for chunk in chunked(batch, options['chunk_size'])]
+            results = pool.imap_unordered(_generate_chunk, tasks) if pool else map(_generate_chunk, tasks)
+
+            by_digest = defaultdict(list)
+            for digests, errors in results:
+                for pk, digest in digests:
+                    by_digest[digest].append(pk)
+                for error in errors:
+                    self.stderr.write(f'  {error}')
+                failed += len(errors)
+            with transaction.atomic():
+                for digest, pks in by_digest.items():
+                    model._base_manager.filter(pk__in=pks).update(thumbnail_hash=digest)
+            done += sum(len(pks) for pks in by_digest.values())
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  {label} up to id {last_pk}: {done} done')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{label}: thumbnails for {done} rows, {failed} failed, in {elapsed:.1f}s '
+            f'({done / elapsed if elapsed else 0:.0f} rows/sec)'
+        ))
@@ -0,0 +1,162 @@
+import asyncio
+import time
+import uuid
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, override_settings
+from django.urls import reverse
+
+from backend.gateway_stub import StubGateway
+from backend.models import Book, Category, CustomUser, Fine, Loan
+from backend.payments import get_gateway
+from backend.utils import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        'Start the local payment gateway stub with a given latency, send Pay clicks '
+        'for many fines through the ASGI handler on one event loop, and compare the '
+        'throughput of ordinary page requests with and without the payments in '
+        'flight. Creates its own fixtures and removes them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fines', type=int, default=50)
+        parser.add_argument('--latency', type=float, default=1.0, help='Seconds the stub takes per call.')
+        parser.add_argument('--probes', type=int, default=200, help='Page requests for the idle baseline.')
+        parser.add_argument('--concurrency', type=int, default=4, help='Concurrent page requests.')
+        parser.add_argument('--pool-size', type=int, default=settings.RAZORPAY_POOL_SIZE)
+        parser.add_argument('--keep', action='store_true', help='Keep the generated rows.')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            raise CommandError('Run the load test against a file-backed database.')
+
+        stub = StubGateway(latency=options['latency'])
+        stub.start()
+        run_id = uuid.uuid4().hex[:8]
+        member, category = self.create_fixtures(run_id, options['fines'])
+        gateway_settings = override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            RAZORPAY_API_URL=stub.url,
+            RAZORPAY_KEY_ID='rzp_test_stub',
+            RAZORPAY_KEY_SECRET='stub-secret',
+            RAZORPAY_POOL_SIZE=options['pool_size'],
+        )
+        try:
+            with gateway_settings:
+                get_gateway.cache_clear()
+                results = asyncio.run(self.run_load(member, stub, options))
+            self.report(member, stub, results, options)
+        finally:
+            get_gateway.cache_clear()
+            stub.stop()
+            if not options['keep']:
+                member.delete()
+                Book.objects.filter(category=category).delete()
+                category.delete()
+
+    def create_fixtures(self, run_id, count):
+        member = CustomUser.objects.create(
+            email=f'loadtest-{run_id}@example.com', first_name='Load', last_name='Test', password='!',
+        )
+        category = Category.objects.create(name=f'Load test {run_id}')
+        book = Book.objects.create(
+            title=f'Load test {run_id}', category=category, publication_date=date.today(), copies_owned=1,
+        )
+        loan_date = date.today() - timedelta(days=30)
+        loans = Loan.objects.bulk_create(
+            Loan(book=book, member=member, loan_date=loan_date, returned_date=date.today()) for _ in range(count)
+        )
+        Fine.objects.bulk_create(
+            Fine(member=member, loan=loan, fine_date=date.today(), fine_amount='80.00') for loan in loans
+        )
+        return member, category
+
+    async def run_load(self, member, stub, options):
+        client = AsyncClient()
+        await client.aforce_login(member)
+        probe_url = reverse('fines')
+        pay_urls = [
+            reverse('pay_fine', args=[pk]) async for pk in Fine.objects.filter(member=member).values_list('pk', flat=True)
+        ]
+
+        async def probe(stop):
+            latencies = []
+            while not stop():
+                started = time.perf_counter()
+                response = await client.get(probe_url)
+                if response.status_code != 200:
+                    raise CommandError(f'{probe_url} answered {response.status_code}')
+                latencies.append(time.perf_counter() - started)
+            return latencies
+
+        async def probes(stop):
+            started = time.perf_counter()
+            latencies = sum(await asyncio.gather(*(probe(stop) for _ in range(options['concurrency']))), [])
+            return latencies, time.perf_counter() - started
+
+        async def pay_all():
+            started = time.perf_counter()
+            responses = await asyncio.gather(*(client.post(url) for url in pay_urls))
+            failed = [response.status_code for response in responses if response.status_code != 200]
+            return failed, time.perf_counter() - started
+
+        # Idle baseline
+        sent = 0
+
+        def baseline_done():
+            nonlocal sent
+            sent += 1
+            return sent > options['probes']
+
+        idle = await probes(baseline_done)
+
+        # Same page requests while every fine is being paid
+        payments = asyncio.create_task(pay_all())
+        loaded = await probes(payments.done)
+        failed, paid_in = await payments
+
+        # Clicking Pay again must reuse the stored orders
+        orders_before = len(stub.orders)
+        repeat_failed, repeat_in = await pay_all()
+        return {
+            'idle': idle,
+            'loaded': loaded,
+            'failed': failed + repeat_failed,
+            'paid_in': paid_in,
+            'repeat_in': repeat_in,
+            'orders_before_repeat': orders_before,
+        }
+
+    def report(self, member, stub, results, options):
+        fines = Fine.objects.filter(member=member)
+        with_order = fines.exclude(razorpay_order_id='').count()
+        new_orders = len(stub.orders) - results['orders_before_repeat']
+
+        def rate(latencies, elapsed):
+            return len(latencies) / elapsed, percentile(sorted(latencies), 0.95) * 1000
+
+        idle_rate, idle_p95 = rate(*results['idle'])
+        loaded_rate, loaded_p95 = rate(*results['loaded'])
+        serial = options['fines'] * options['latency']
+        self.stdout.write(f'gateway latency    {options["latency"]:.2f}s per call, pool of {options["pool_size"]}')
+        self.stdout.write(f'page requests      idle {idle_rate:.1f}/sec (p95 {idle_p95:.0f}ms), '
+                          f'while paying {loaded_rate:.1f}/sec (p95 {loaded_p95:.0f}ms)')
+        self.stdout.write(f'payments           {options["fines"]} orders in {results["paid_in"]:.2f}s '
+                          f'(one blocking worker would need {serial:.0f}s)')
+        self.stdout.write(f'repeat clicks      {options["fines"]} in {results["repeat_in"]:.2f}s, {new_orders} new orders')
+
+        if results['failed']:
+            raise CommandError(f'{len(results["failed"])} Pay requests failed: {sorted(set(results["failed"]))}')
+        if with_order != options['fines'] or len(stub.orders) != options['fines']:
+            raise CommandError(f'{len(stub.orders)} orders created for {options["fines"]} fines, {with_order} stored')
+        if loaded_rate < idle_rate / 2:
+            raise CommandError(
+                f'Page throughput dropped from {idle_rate:.1f}/sec to {loaded_rate:.1f}/sec, '
+                'more than half, while payments were in flight'
+            )
+        self.stdout.write(self.style.SUCCESS('Gateway latency did not hold up the worker'))
@@ -0,0 +1,87 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, OperationalError
+
+from backend import circulation
+from backend.models import Book, Category, CustomUser, Reservation, ReservationStatus
+
+
+class Command(BaseCommand):
+    help = (
+        'Hammer reserve_book from many threads against the configured database and '
+        'verify that no book is overbooked. Creates its own fixtures and removes them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--members', type=int, default=200)
+        parser.add_argument('--copies', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=2,
+                            help='Requests sent per member, to exercise idempotency.')
+        parser.add_argument('--keep', action='store_true', help='Keep the generated rows.')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            raise CommandError('Run the load test against a file-backed database.')
+
+        run_id = uuid.uuid4().hex[:8]
+        category = Category.objects.create(name=f'Load test {run_id}')
+        book = Book.objects.create(
+            title=f'Load test {run_id}',
+            category=category,
+            publication_date=date.today(),
+            copies_owned=options['copies'],
+        )
+        members = CustomUser.objects.bulk_create(
+            CustomUser(email=f'loadtest-{run_id}-{n}@example.com', first_name='Load', last_name=str(n), password='!')
+            for n in range(options['members'])
+        )
+        requests = [member for member in members for _ in range(options['repeat'])]
+
+        def reserve(member):
+            try:
+                circulation.reserve_book(member, book.id)
+                return None
+            except OperationalError as exc:
+                return str(exc)
+            finally:
+                connection.close()
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                errors = [error for error in pool.map(reserve, requests) if error]
+            elapsed = time.perf_counter() - started
+
+            self.report(book, len(requests), errors, elapsed, options)
+        finally:
+            if not options['keep']:
+                Reservation.objects.filter(book=book).delete()
+                CustomUser.objects.filter(email__startswith=f'loadtest-{run_id}-').delete()
+                category.delete()
+
+    def report(self, book, sent, errors, elapsed, options):
+        book.refresh_from_db()
+        reservations = Reservation.objects.filter(book=book)
+        approved = reservations.filter(reservation_status=ReservationStatus.APPROVED).count()
+        pending = reservations.filter(reservation_status=ReservationStatus.PENDING).count()
+        reserved_members = reservations.values('member').distinct().count()
+        duplicates = reservations.count() - reserved_members
+
+        self.stdout.write(f'requests sent      {sent} from {options["threads"]} threads')
+        self.stdout.write(f'throughput         {sent / elapsed:.1f} reservations/sec')
+        self.stdout.write(f'approved / pending {approved} / {pending}')
+        self.stdout.write(f'copies available   {book.copies_available} of {book.copies_owned}')
+        self.stdout.write(f'lock errors        {len(errors)}')
+
+        if approved > book.copies_owned or book.copies_available < 0:
+            raise CommandError('Overbooked: more approved reservations than copies owned')
+        if duplicates:
+            raise CommandError(f'{duplicates} duplicate reservations were created')
+        if approved != min(book.copies_owned, reserved_members) or approved + book.copies_available != book.copies_owned:
+            raise CommandError('Availability counters do not match the reservations')
+        self.stdout.write(self.style.SUCCESS('No overbooking detected'))
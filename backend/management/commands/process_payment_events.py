@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.settlement import process_pending_events
+
+
+class Command(BaseCommand):
+    help = (
+        'Settle the queued Razorpay webhook events: record each captured payment '
+        'and mark its fine paid. Events that fail are retried on later runs until '
+        '--max-attempts is reached. Run it from cron, or with --loop as a worker.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--max-attempts', type=int, default=10)
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new events.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between polls with --loop.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['max_attempts'] < 1:
+            raise CommandError('--batch-size and --max-attempts must be positive')
+        while True:
+            processed, failed = self.drain(options)
+            if processed or failed or options['verbosity'] > 1:
+                self.stdout.write(f'{processed} events settled, {failed} failed')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
+
+    def drain(self, options):
+        # One pass over the queue; failed events wait for the next run
+        processed = failed = 0
+        last_id = 0
+        while True:
+            done, errors, last_id = process_pending_events(options['batch_size'], options['max_attempts'], last_id)
+            processed += done
+            failed += errors
+            if done + errors < options['batch_size']:
+                return processed, failed
@@ -0,0 +1,70 @@
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from backend.models import MediaBlob
+from backend.storage import blob_digest, media_storage
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete content-addressed media blobs that no row references any more. '
+        'Blobs younger than MEDIA_PRUNE_GRACE_HOURS are kept.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recount', action='store_true',
+                            help='Rebuild the reference counts from the image columns first.')
+        parser.add_argument('--scan', action='store_true',
+                            help='Also walk the media tree for blobs with no MediaBlob row '
+                                 '(e.g. uploads whose transaction rolled back).')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        storage = media_storage()
+        cutoff = timezone.now() - timedelta(hours=settings.MEDIA_PRUNE_GRACE_HOURS)
+        if options['recount']:
+            with transaction.atomic():
+                MediaBlob.objects.recount()
+
+        orphans = MediaBlob.objects.filter(refcount=0, created_at__lt=cutoff)
+        removed = 0
+        for blob in orphans.iterator(chunk_size=500):
+            if not options['dry_run']:
+                # Re-check under the row lock; a save may have picked the blob up again
+                with transaction.atomic():
+                    if MediaBlob.objects.select_for_update().filter(pk=blob.pk, refcount=0).delete()[0]:
+                        storage.delete(blob.name)
+            removed += 1
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  {blob.name}')
+
+        if options['scan']:
+            removed += self.prune_untracked(storage, cutoff.timestamp(), options)
+
+        verb = 'Would remove' if options['dry_run'] else 'Removed'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {removed} unreferenced blobs'))
+
+    def prune_untracked(self, storage, cutoff, options):
+        removed = 0
+        tracked = set(MediaBlob.objects.values_list('name', flat=True))
+        for directory, _, files in os.walk(storage.location):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, storage.location).replace(os.sep, '/')
+                leftover_upload = filename.startswith('.upload-')
+                if not (leftover_upload or blob_digest(name)) or name in tracked:
+                    continue
+                if os.path.getmtime(path) >= cutoff:
+                    continue
+                if not options['dry_run']:
+                    os.remove(path)
+                removed += 1
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'  {name}')
+        return removed
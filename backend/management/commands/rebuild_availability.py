@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Subquery, Max
+from django.db.models.functions import Coalesce
+
+from backend.models import Book, Loan, Reservation, ReservationStatus
+
+
+def count_per_book(queryset):
+    return Coalesce(
+        Subquery(
+            queryset.filter(book=OuterRef('pk')).order_by().values('book').annotate(n=Count('pk')).values('n')
+        ),
+        0,
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Recount open loans and approved reservations into the per-book availability counters, '
+        'then approve waiting reservations for books that have free copies.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='Number of book ids rebuilt per transaction.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = Book.objects.aggregate(last=Max('id'))['last'] or 0
+        on_loan = count_per_book(Loan.objects.filter(returned_date__isnull=True))
+        reserved = count_per_book(Reservation.objects.filter(reservation_status=ReservationStatus.APPROVED))
+
+        waiting = Reservation.objects.filter(book=OuterRef('pk'), reservation_status=ReservationStatus.PENDING)
+
+        updated = promoted = 0
+        for start in range(0, last_id, batch_size):
+            books = Book.objects.filter(id__gt=start, id__lte=start + batch_size)
+            with transaction.atomic():
+                updated += books.update(copies_on_loan=on_loan, copies_reserved=reserved)
+                books.recompute_availability()
+                # Copies the old counters hid may now go to the waitlist
+                for book_id in books.filter(Exists(waiting), copies_available__gt=0).values_list('id', flat=True):
+                    promoted += len(Reservation.objects.promote_waitlist(book_id))
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt availability for {updated} books, approved {promoted} waiting reservations'
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from backend.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the catalog search index from the book, category and author tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt search index with {type(backend).__name__}'))
@@ -0,0 +1,86 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from backend.models import FinePayment
+from backend.payments import GatewayError, get_gateway
+from backend.utils import chunked
+from backend.settlement import SettlementError, from_paise, paid_on, settle_payment
+
+
+class Command(BaseCommand):
+    help = (
+        "Cross-check the gateway's captured payments for a time window against "
+        'FinePayment: payments captured but never recorded (a lost callback and '
+        'webhook), recorded payments the gateway does not know and amounts that '
+        'differ. With --fix, missing payments are settled.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=2, help='Look back this many days.')
+        parser.add_argument('--fix', action='store_true', help='Settle captured payments that were not recorded.')
+        parser.add_argument('--page-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days must be positive')
+        until = timezone.now()
+        since = until - timedelta(days=options['days'])
+        gateway = get_gateway()
+
+        seen = set()
+        missing, mismatched, unmatched = [], [], []
+        fixed = 0
+        try:
+            captured = (
+                payment for payment in gateway.payments(since, until, options['page_size'])
+                if payment.get('status') == 'captured'
+            )
+            for page in chunked(captured, 500):
+                recorded = FinePayment.objects.in_bulk([p['id'] for p in page], field_name='razorpay_payment_id')
+                for payment in page:
+                    seen.add(payment['id'])
+                    local = recorded.get(payment['id'])
+                    if local is None:
+                        missing.append(payment)
+                    elif local.payment_amount != from_paise(payment['amount']):
+                        mismatched.append((payment, local))
+        except GatewayError as exc:
+            raise CommandError(f'Could not list payments: {exc}')
+
+        if options['fix']:
+            for payment in missing:
+                try:
+                    settle_payment(payment['id'], payment.get('order_id'), payment['amount'], paid_on(payment.get('created_at')))
+                    fixed += 1
+                except SettlementError as exc:
+                    unmatched.append((payment, str(exc)))
+
+        unknown = self.unknown_to_gateway(since, seen)
+
+        self.stdout.write(f'captured at gateway  {len(seen)}')
+        self.stdout.write(f'not recorded         {len(missing)}' + (f' ({fixed} settled)' if options['fix'] else ''))
+        for payment in missing:
+            self.stdout.write(f'  {payment["id"]} order {payment.get("order_id")} ₹{from_paise(payment["amount"])}')
+        for payment, error in unmatched:
+            self.stderr.write(f'  {payment["id"]}: {error}')
+        self.stdout.write(f'amount differs       {len(mismatched)}')
+        for payment, local in mismatched:
+            self.stdout.write(f'  {payment["id"]} gateway ₹{from_paise(payment["amount"])}, recorded ₹{local.payment_amount}')
+        self.stdout.write(f'unknown to gateway   {len(unknown)}')
+        for payment_id in unknown:
+            self.stdout.write(f'  {payment_id}')
+
+        unresolved = len(missing) - fixed + len(mismatched) + len(unknown)
+        if unresolved:
+            raise CommandError(f'{unresolved} discrepancies need attention')
+        self.stdout.write(self.style.SUCCESS('Payments reconciled'))
+
+    def unknown_to_gateway(self, since, seen):
+        # Recorded in the window but not listed by the gateway; the first,
+        # partial day is skipped since payment_date carries no time
+        recorded = FinePayment.objects.filter(
+            payment_date__gt=timezone.localdate(since), razorpay_payment_id__isnull=False,
+        ).values_list('razorpay_payment_id', flat=True)
+        return [payment_id for payment_id in recorded.iterator() if payment_id not in seen]
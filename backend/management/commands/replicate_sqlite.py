@@ -0,0 +1,47 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Stand-in for replication when trying the read replicas locally: copy the '
+        'primary SQLite database into every replica file (DATABASE_REPLICAS) with '
+        "SQLite's online backup API. With --loop it copies every --interval "
+        'seconds, which also gives the replicas a realistic lag.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true')
+        parser.add_argument('--interval', type=float, default=2.0)
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite' or primary.is_in_memory_db():
+            raise CommandError('The primary must be a file-backed SQLite database')
+        if not settings.DATABASE_REPLICA_ALIASES:
+            raise CommandError('No replicas configured; list their files in DATABASE_REPLICAS')
+        replicas = [connections[alias].settings_dict['NAME'] for alias in settings.DATABASE_REPLICA_ALIASES]
+
+        while True:
+            started = time.perf_counter()
+            for replica in replicas:
+                copy_database(primary.settings_dict['NAME'], replica)
+            if options['verbosity'] > 1 or not options['loop']:
+                self.stdout.write(f'Copied to {len(replicas)} replicas in {time.perf_counter() - started:.2f}s')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
+
+
+def copy_database(source, target):
+    # A consistent snapshot, even while the primary is being written to
+    src, dst = sqlite3.connect(source), sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
@@ -0,0 +1,90 @@
+import fnmatch
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+
+from backend.benchmarks import benchmark_cases, benchmark_member, regressions, run_case
+from backend.models import Book, CustomUser, Loan
+from backend.stats import invalidate_admin_stats, invalidate_member_summary
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the hot member and admin views through the test client and record '
+        'query counts and p50/p95 latency. Compares against a JSON baseline and '
+        'fails on regressions; --save writes the baseline instead. Run it on data '
+        'from generate_library_data; everything the requests write is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--baseline', default=str(settings.BASE_DIR / 'benchmark_baseline.json'))
+        parser.add_argument('--save', action='store_true', help='Write the results as the new baseline.')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Fail when a p95 is this fraction slower than the baseline.')
+        parser.add_argument('--min-delta-ms', type=float, default=2.0,
+                            help='Ignore p95 changes smaller than this many milliseconds.')
+        parser.add_argument('--only', action='append', default=[],
+                            help='Benchmark names to run (shell-style patterns); repeatable.')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1 or options['warmup'] < 0:
+            raise CommandError('--iterations must be positive and --warmup not negative')
+        member = benchmark_member()
+        if member is None:
+            raise CommandError('No loans to benchmark with; run generate_library_data first')
+
+        environment = {
+            'vendor': connection.vendor,
+            'books': Book.objects.count(),
+            'loans': Loan.objects.count(),
+            'iterations': options['iterations'],
+        }
+        results = {}
+        with transaction.atomic(), override_settings(
+            ROOT_URLCONF='backend.benchmarks', ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+        ):
+            staff = CustomUser.objects.create_superuser(
+                email='benchmark-admin@example.com', password=None, first_name='Benchmark', last_name='Admin',
+            )
+            cases = benchmark_cases(member, staff, options['warmup'] + options['iterations'])
+            if options['only']:
+                cases = [case for case in cases if any(fnmatch.fnmatch(case.name, p) for p in options['only'])]
+            client = Client()
+
+            self.stdout.write(f'{"view":<50} {"queries":>8} {"p50 ms":>10} {"p95 ms":>10}')
+            for case in cases:
+                try:
+                    result = run_case(client, case, options['iterations'], options['warmup'])
+                except RuntimeError as exc:
+                    raise CommandError(str(exc))
+                results[case.name] = result.as_dict()
+                self.stdout.write(f'{case.name:<50} {result.queries:>8} {result.p50_ms:>10.2f} {result.p95_ms:>10.2f}')
+            transaction.set_rollback(True)
+        # Cached figures may describe the rolled back rows
+        invalidate_member_summary(member.pk)
+        invalidate_admin_stats()
+
+        baseline_path = Path(options['baseline'])
+        if options['save']:
+            baseline_path.write_text(json.dumps({'environment': environment, 'results': results}, indent=2) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {baseline_path}'))
+            return
+        if not baseline_path.exists():
+            self.stdout.write(f'No baseline at {baseline_path}; run with --save to create one')
+            return
+
+        baseline = json.loads(baseline_path.read_text())
+        if baseline['environment'] != environment:
+            self.stderr.write(f'Baseline was taken on {baseline["environment"]}, this run on {environment}')
+        found = regressions(results, baseline['results'], options['threshold'], options['min_delta_ms'])
+        for regression in found:
+            self.stderr.write(f'  {regression}')
+        if found:
+            raise CommandError(f'{len(found)} regressions against {baseline_path}')
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
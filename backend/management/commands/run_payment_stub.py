@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.gateway_stub import StubGateway
+
+
+class Command(BaseCommand):
+    help = (
+        'Serve a local stand-in for the Razorpay API with configurable latency and '
+        'failure rate. Point RAZORPAY_API_URL at the printed address; '
+        'POST /v1/stub/orders/<order id>/pay completes a checkout.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=0.5, help='Seconds added to every call.')
+        parser.add_argument('--jitter', type=float, default=0.0, help='Up to this many extra seconds per call.')
+        parser.add_argument('--failure-rate', type=float, default=0.0, help='Fraction of calls answered with a 500.')
+        parser.add_argument('--webhook-url', help='Deliver payment.captured webhooks here, e.g. '
+                                                  'http://127.0.0.1:8000/payments/razorpay/webhook/')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['failure_rate'] <= 1:
+            raise CommandError('--failure-rate must be between 0 and 1')
+        if options['webhook_url'] and not settings.RAZORPAY_WEBHOOK_SECRET:
+            raise CommandError('Set RAZORPAY_WEBHOOK_SECRET to sign the webhooks')
+        server = StubGateway(
+            (options['host'], options['port']),
+            latency=options['latency'],
+            jitter=options['jitter'],
+            failure_rate=options['failure_rate'],
+            verbose=options['verbosity'] > 1,
+            key_secret=settings.RAZORPAY_KEY_SECRET or 'stub-secret',
+            webhook_url=options['webhook_url'],
+            webhook_secret=settings.RAZORPAY_WEBHOOK_SECRET,
+        )
+        self.stdout.write(f'Payment gateway stub listening; set RAZORPAY_API_URL={server.url}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from backend.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = 'Backfill CustomUser.role from group membership (Admin, Author, Member).'
+
+    def handle(self, *args, **options):
+        updated = CustomUser.objects.sync_roles()
+        self.stdout.write(self.style.SUCCESS(f'Synced roles for {updated} users'))
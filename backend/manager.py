@@ -1,3 +1,8 @@
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Case, Count, Exists, F, OuterRef, Sum, Value, When
+from django.db.models.functions import Lower
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.models import BaseUserManager
 
@@ -29,4 +34,162 @@ class CustomerUserManager(BaseUserManager):
         if extra_fields.get('is_superuser')is not True:
             raise ValueError(_('Superuser must have is_superuser=True.'))
 
-        return self.create_user(email,password, **extra_fields)
\ No newline at end of file
+        return self.create_user(email,password, **extra_fields)
+
+    def email_exists(self, email):
+        """Exact, case-insensitive match served by the LOWER(email) index; ``email`` must be lowercased."""
+        return self.alias(email_lower=Lower('email')).filter(email_lower=email).exists()
+
+    def sync_roles(self, user_ids=None):
+        """
+        Recompute the denormalized ``role`` column from group membership in a
+        single UPDATE. A user in several role groups gets the first of
+        Admin, Author, Member.
+        """
+        from backend.models import Role
+
+        memberships = self.model.groups.through.objects.filter(customuser=OuterRef('pk'))
+        role = Case(
+            *[
+                When(Exists(memberships.filter(group__name=name)), then=Value(name))
+                for name in (Role.ADMIN, Role.AUTHOR, Role.MEMBER)
+            ],
+            default=Value(''),
+        )
+        users = self.get_queryset()
+        if user_ids is not None:
+            users = users.filter(pk__in=user_ids)
+        return users.update(role=role)
+
+class BookQuerySet(models.QuerySet):
+
+    def in_stock(self):
+        return self.filter(copies_available__gt=0)
+
+    def adjust_availability(self, book_id, on_loan=0, reserved=0):
+        """Apply loan/reservation deltas to the denormalized counters in one UPDATE."""
+        from backend.catalog_cache import invalidate_catalog
+
+        if not on_loan and not reserved:
+            return 0
+        # The catalog pages show copies_available
+        transaction.on_commit(invalidate_catalog)
+        return self.filter(pk=book_id).update(
+            copies_on_loan=F('copies_on_loan') + on_loan,
+            copies_reserved=F('copies_reserved') + reserved,
+            copies_available=F('copies_available') - on_loan - reserved,
+        )
+
+    def recompute_availability(self):
+        from backend.catalog_cache import invalidate_catalog
+
+        transaction.on_commit(invalidate_catalog)
+        return self.update(copies_available=F('copies_owned') - F('copies_on_loan') - F('copies_reserved'))
+
+
+class LoanQuerySet(models.QuerySet):
+
+    def with_related(self):
+        # Loan.__str__ and the templates read member.email and book.title
+        return self.select_related('book', 'member')
+
+
+class FineQuerySet(models.QuerySet):
+
+    def with_related(self):
+        return self.select_related('member', 'loan__book')
+
+    def outstanding(self, member_id):
+        """``{'total': Decimal, 'count': int}`` of a member's pending fines, read from fine_pending_member_idx alone."""
+        from backend.models import FineStatus
+
+        totals = self.filter(member_id=member_id, status=FineStatus.PENDING).aggregate(
+            total=Sum('fine_amount'), count=Count('pk'),
+        )
+        return {'total': Decimal(totals['total'] or 0).quantize(Decimal('0.01')), 'count': totals['count']}
+
+
+class FinePaymentQuerySet(models.QuerySet):
+
+    def with_related(self):
+        return self.select_related('member')
+
+
+class PaymentEventQuerySet(models.QuerySet):
+
+    def pending(self, max_attempts=None):
+        queue = self.filter(processed_at__isnull=True).order_by('id')
+        if max_attempts is not None:
+            queue = queue.filter(attempts__lt=max_attempts)
+        return queue
+
+
+class ReservationQuerySet(models.QuerySet):
+
+    def with_related(self):
+        return self.select_related('book', 'member')
+
+    def promote_waitlist(self, book_id):
+        """
+        Approve pending reservations for ``book_id`` in FIFO order while the
+        book has free copies. Must run inside a transaction; the book row is
+        locked so concurrent returns cannot promote the same copy twice.
+        """
+        from backend.models import ReservationStatus
+
+        book_model = self.model._meta.get_field('book').related_model
+        free = book_model.objects.select_for_update().filter(pk=book_id).values_list('copies_available', flat=True).first()
+        if not free or free <= 0:
+            return []
+
+        waiting = list(
+            self.filter(book_id=book_id, reservation_status=ReservationStatus.PENDING)
+            .order_by('reservation_date', 'id')[:free]
+        )
+        for reservation in waiting:
+            reservation.reservation_status = ReservationStatus.APPROVED
+            reservation.save(update_fields=['reservation_status'])
+        return waiting
+
+
+class MediaBlobQuerySet(models.QuerySet):
+
+    def retain(self, name):
+        """Count one more row pointing at blob ``name``; other files (default avatars) are not tracked."""
+        from backend.storage import blob_digest
+
+        if not blob_digest(name):
+            return
+        self.bulk_create([self.model(name=name, refcount=0)], ignore_conflicts=True)
+        self.filter(name=name).update(refcount=F('refcount') + 1)
+
+    def release(self, name):
+        from backend.storage import blob_digest
+
+        if blob_digest(name):
+            self.filter(name=name, refcount__gt=0).update(refcount=F('refcount') - 1)
+
+    def recount(self):
+        """
+        Reset every refcount from the image columns that point at blobs, one
+        GROUP BY per model. Run it inside a transaction.
+        """
+        from backend.models import Book, CustomUser
+        from backend.storage import blob_digest
+
+        references = {}
+        for model, field in ((Book, 'cover_image'), (CustomUser, 'image')):
+            counts = model._base_manager.values_list(field).annotate(rows=Count('pk')).order_by()
+            references.update((name, rows) for name, rows in counts if blob_digest(name))
+
+        self.bulk_create(
+            [self.model(name=name, refcount=0) for name in references], ignore_conflicts=True, batch_size=500
+        )
+        self.update(refcount=0)
+        by_count = {}
+        for name, rows in references.items():
+            by_count.setdefault(rows, []).append(name)
+        for rows, names in by_count.items():
+            for start in range(0, len(names), 500):
+                self.filter(name__in=names[start:start + 500]).update(refcount=rows)
+        return len(references)
@@ -0,0 +1,187 @@
+import bisect
+import logging
+import threading
+import time
+from collections import Counter as SQLCounter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+
+class Histogram:
+    """Cumulative buckets plus sum and count per label set, as Prometheus expects."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                # One slot per bucket plus +Inf, then the sum
+                series = self.series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self.lock:
+            series = {labels: list(values) for labels, values in self.series.items()}
+        for label_values, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), values):
+                cumulative += count
+                yield '_bucket', (*zip(self.labels, label_values), ('le', format_value(bound))), cumulative
+            yield '_sum', tuple(zip(self.labels, label_values)), values[-1]
+            yield '_count', tuple(zip(self.labels, label_values)), cumulative
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.series[label_values] = self.series.get(label_values, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            series = dict(self.series)
+        for label_values, value in sorted(series.items()):
+            yield '', tuple(zip(self.labels, label_values)), value
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value, *label_values):
+        with self.lock:
+            self.series[label_values] = value
+
+
+REQUEST_LATENCY = Histogram(
+    'library_request_duration_seconds', 'Time to produce the response, per URL name.', ('view', 'method'),
+    LATENCY_BUCKETS,
+)
+REQUESTS = Counter('library_requests_total', 'Responses per URL name and status code.', ('view', 'method', 'status'))
+REQUEST_QUERIES = Histogram(
+    'library_request_queries', 'SQL queries executed per request.', ('view',), QUERY_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    'library_request_db_seconds', 'Time spent executing SQL per request.', ('view',), LATENCY_BUCKETS,
+)
+REQUEST_TEMPLATE_TIME = Histogram(
+    'library_request_template_seconds', 'Time spent rendering templates per request.', ('view',), LATENCY_BUCKETS,
+)
+TEMPLATE_RENDER_TIME = Histogram(
+    'library_template_render_seconds', 'Time to render a page template, per template name.', ('template',),
+    LATENCY_BUCKETS,
+)
+N_PLUS_ONE = Counter(
+    'library_n_plus_one_requests_total', 'Requests that ran the same SQL several times (N+1 candidates).', ('view',),
+)
+N_PLUS_ONE_REPEATS = Gauge(
+    'library_n_plus_one_max_repeats', 'Most repetitions of one SQL statement in the last flagged request.', ('view',),
+)
+METRICS = (REQUEST_LATENCY, REQUESTS, REQUEST_QUERIES, REQUEST_DB_TIME, REQUEST_TEMPLATE_TIME, TEMPLATE_RENDER_TIME,
+           N_PLUS_ONE, N_PLUS_ONE_REPEATS)
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_time: float = 0.0
+    template_time: float = 0.0
+    template_depth: int = 0
+    statements: SQLCounter = field(default_factory=SQLCounter)
+
+
+# Set by the middleware for the duration of a request; sync_to_async copies
+# the context into its thread, so queries run from async views count too
+current_request = ContextVar('current_request', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper installed on every database connection (see signals)."""
+    stats = current_request.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_time += time.perf_counter() - started
+        stats.queries += 1
+        # Parameters are passed separately, so the SQL is already the statement's shape
+        stats.statements[sql] += 1
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def start_request():
+    stats = RequestStats()
+    return stats, current_request.set(stats)
+
+
+def finish_request(request, response, stats, token, duration):
+    current_request.reset(token)
+    match = getattr(request, 'resolver_match', None)
+    view = match.view_name if match else 'unresolved'
+    REQUEST_LATENCY.observe(duration, view, request.method)
+    REQUESTS.inc(view, request.method, str(response.status_code))
+    REQUEST_QUERIES.observe(stats.queries, view)
+    REQUEST_DB_TIME.observe(stats.db_time, view)
+    REQUEST_TEMPLATE_TIME.observe(stats.template_time, view)
+
+    if stats.statements:
+        sql, repeats = stats.statements.most_common(1)[0]
+        if repeats >= settings.METRICS_DUPLICATE_QUERY_THRESHOLD:
+            N_PLUS_ONE.inc(view)
+            N_PLUS_ONE_REPEATS.set(repeats, view)
+            logger.warning('N+1 candidate in %s: %d x %s', view, repeats, sql[:300])
+
+
+def format_value(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return f'{value:.1f}'
+    return repr(value)
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(metrics=METRICS):
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in metrics:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for suffix, labels, value in metric.samples():
+            label_text = ','.join(f'{name}="{escape(label)}"' for name, label in labels)
+            lines.append(f'{metric.name}{suffix}{{{label_text}}} {format_value(value)}')
+    return '\n'.join(lines) + '\n'
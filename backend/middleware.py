@@ -0,0 +1,61 @@
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+from backend.metrics import finish_request, start_request
+from backend.routers import STICKY_COOKIE, RoutingState, current_routing
+
+
+# Records latency, SQL and template time per URL name (see backend/metrics.py).
+# It runs natively in both modes, so the async payment views keep their event
+# loop instead of being pushed onto a thread.
+@sync_and_async_middleware
+def request_metrics(get_response):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            stats, token = start_request()
+            started = time.perf_counter()
+            response = await get_response(request)
+            finish_request(request, response, stats, token, time.perf_counter() - started)
+            return response
+    else:
+        def middleware(request):
+            stats, token = start_request()
+            started = time.perf_counter()
+            response = get_response(request)
+            finish_request(request, response, stats, token, time.perf_counter() - started)
+            return response
+    return middleware
+
+
+# Tracks the request's writes for backend.routers.ReplicaRouter and, after
+# a write, keeps the client's reads on the primary for a few seconds. It sits
+# above the session middleware, so session saves count as writes too.
+@sync_and_async_middleware
+def database_routing(get_response):
+    def start(request):
+        state = RoutingState(request=request, sticky=STICKY_COOKIE in request.COOKIES)
+        return state, current_routing.set(state)
+
+    def finish(response, state, token):
+        current_routing.reset(token)
+        if state.wrote and settings.DATABASE_REPLICA_ALIASES:
+            response.set_cookie(
+                STICKY_COOKIE, '1', max_age=settings.DATABASE_REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax',
+            )
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            state, token = start(request)
+            response = await get_response(request)
+            finish(response, state, token)
+            return response
+    else:
+        def middleware(request):
+            state, token = start(request)
+            response = get_response(request)
+            finish(response, state, token)
+            return response
+    return middleware
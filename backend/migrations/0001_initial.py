@@ -0,0 +1,170 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:15
+
+import backend.models
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Book',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=255)),
+                ('publication_date', models.DateField()),
+                ('copies_owned', models.IntegerField()),
+                ('cover_image', models.ImageField(blank=True, default='no_image_available.jpg', null=True, upload_to='cover_image')),
+            ],
+            options={
+                'db_table': 'book',
+            },
+        ),
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255)),
+            ],
+            options={
+                'db_table': 'category',
+            },
+        ),
+        migrations.CreateModel(
+            name='CustomUser',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('is_superuser', models.BooleanField(default=False, help_text='Designates that this user has all permissions without explicitly assigning them.', verbose_name='superuser status')),
+                ('is_staff', models.BooleanField(default=False, help_text='Designates whether the user can log into this admin site.', verbose_name='staff status')),
+                ('is_active', models.BooleanField(default=True, help_text='Designates whether this user should be treated as active. Unselect this instead of deleting accounts.', verbose_name='active')),
+                ('date_joined', models.DateTimeField(default=django.utils.timezone.now, verbose_name='date joined')),
+                ('first_name', models.CharField(max_length=255)),
+                ('last_name', models.CharField(max_length=255)),
+                ('email', models.EmailField(max_length=254, unique=True, verbose_name='email address')),
+                ('gender', models.CharField(choices=[('M', 'Male'), ('F', 'Female')], default='M', max_length=1)),
+                ('image', backend.models.GenderedImageField(blank=True, upload_to='profile/')),
+                ('groups', models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.group', verbose_name='groups')),
+                ('user_permissions', models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.permission', verbose_name='user permissions')),
+            ],
+            options={
+                'verbose_name': 'user',
+                'verbose_name_plural': 'users',
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='AdminUser',
+            fields=[
+            ],
+            options={
+                'verbose_name': 'Admin',
+                'verbose_name_plural': 'Admins',
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('backend.customuser',),
+        ),
+        migrations.CreateModel(
+            name='AuthorUser',
+            fields=[
+            ],
+            options={
+                'verbose_name': 'Author',
+                'verbose_name_plural': 'Authors',
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('backend.customuser',),
+        ),
+        migrations.CreateModel(
+            name='MemberUser',
+            fields=[
+            ],
+            options={
+                'verbose_name': 'Member',
+                'verbose_name_plural': 'Members',
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('backend.customuser',),
+        ),
+        migrations.CreateModel(
+            name='BookAuthor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='backend.book')),
+            ],
+            options={
+                'db_table': 'book_author',
+                'unique_together': {('book', 'author')},
+            },
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='authors',
+            field=models.ManyToManyField(through='backend.BookAuthor', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='backend.category'),
+        ),
+        migrations.CreateModel(
+            name='FinePayment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payment_date', models.DateField()),
+                ('payment_amount', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Loan',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('loan_date', models.DateField()),
+                ('returned_date', models.DateField(blank=True, null=True)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='backend.book')),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'loan',
+            },
+        ),
+        migrations.CreateModel(
+            name='Fine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fine_date', models.DateField()),
+                ('fine_amount', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Paid', 'Paid')], default='Pending', max_length=255)),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('loan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='backend.loan')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Reservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reservation_date', models.DateField()),
+                ('reservation_status', models.CharField(choices=[('P', 'Pending'), ('A', 'Approved'), ('R', 'Rejected'), ('CANCELLED', 'Cancelled')], default='P', max_length=255)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='backend.book')),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,60 @@
+from django.db import migrations
+from django.db.models import Count, Exists, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# ReservationStatus values when this migration was written
+PENDING, APPROVED = 'P', 'A'
+
+
+def count_per_book(queryset):
+    return Coalesce(
+        Subquery(
+            queryset.filter(book=OuterRef('pk')).order_by().values('book').annotate(n=Count('pk')).values('n')
+        ),
+        0,
+    )
+
+
+def recount(books, Loan, Reservation):
+    books.update(
+        copies_on_loan=count_per_book(Loan.objects.filter(returned_date__isnull=True)),
+        copies_reserved=count_per_book(Reservation.objects.filter(reservation_status=APPROVED)),
+    )
+    books.update(copies_available=F('copies_owned') - F('copies_on_loan') - F('copies_reserved'))
+
+
+def recount_availability(apps, schema_editor):
+    """
+    Fill the availability counters of books that existed before them (they
+    default to 0, so every book looked unavailable), then approve the
+    waitlists of books that turn out to have free copies, as
+    rebuild_availability does.
+    """
+    Book = apps.get_model('backend', 'Book')
+    Loan = apps.get_model('backend', 'Loan')
+    Reservation = apps.get_model('backend', 'Reservation')
+
+    recount(Book.objects.all(), Loan, Reservation)
+    waiting = Reservation.objects.filter(book=OuterRef('pk'), reservation_status=PENDING)
+    promoted = []
+    with_free_copies = Book.objects.filter(Exists(waiting), copies_available__gt=0)
+    for book_id, free in with_free_copies.values_list('id', 'copies_available'):
+        ids = list(
+            Reservation.objects.filter(book_id=book_id, reservation_status=PENDING)
+            .order_by('reservation_date', 'id').values_list('id', flat=True)[:free]
+        )
+        Reservation.objects.filter(id__in=ids).update(reservation_status=APPROVED)
+        promoted.append(book_id)
+    if promoted:
+        recount(Book.objects.filter(id__in=promoted), Loan, Reservation)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0002_book_availability_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(recount_availability, migrations.RunPython.noop),
+    ]
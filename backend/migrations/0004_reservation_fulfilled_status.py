@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0003_recount_availability'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reservation',
+            name='reservation_status',
+            field=models.CharField(choices=[('P', 'Pending'), ('A', 'Approved'), ('R', 'Rejected'), ('CANCELLED', 'Cancelled'), ('F', 'Fulfilled')], default='P', max_length=255),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0004_reservation_fulfilled_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('position', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'job_checkpoint',
+            },
+        ),
+        migrations.AddField(
+            model_name='fine',
+            name='accrued',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddConstraint(
+            model_name='fine',
+            constraint=models.UniqueConstraint(condition=models.Q(('accrued', True)), fields=('loan',), name='fine_one_accrued_per_loan'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0005_fine_accrual_checkpoints'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fine',
+            index=models.Index(condition=models.Q(('status', 'Pending')), fields=['member', 'fine_amount'], name='fine_pending_member_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fine',
+            index=models.Index(fields=['member', '-fine_date'], name='fine_member_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fine',
+            index=models.Index(fields=['fine_date'], name='fine_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='finepayment',
+            index=models.Index(fields=['member', '-payment_date'], name='finepayment_member_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='finepayment',
+            index=models.Index(fields=['payment_date'], name='finepayment_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['member', '-loan_date'], name='loan_member_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['loan_date'], name='loan_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['returned_date'], name='loan_returned_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(condition=models.Q(('returned_date__isnull', True)), fields=['book'], name='loan_open_book_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(condition=models.Q(('returned_date__isnull', True)), fields=['loan_date'], name='loan_open_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(condition=models.Q(('reservation_status', 'P')), fields=['book', 'reservation_date', 'id'], name='reservation_waitlist_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['member', '-reservation_date'], name='reservation_member_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['reservation_date'], name='reservation_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['reservation_status'], name='reservation_status_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='reservation',
+            constraint=models.UniqueConstraint(condition=models.Q(('reservation_status', 'P')), fields=('member', 'book'), name='reservation_one_pending'),
+        ),
+    ]
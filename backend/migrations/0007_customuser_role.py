@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0006_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='role',
+            field=models.CharField(blank=True, choices=[('Admin', 'Admin'), ('Author', 'Author'), ('Member', 'Member')], db_index=True, editable=False, max_length=16),
+        ),
+    ]
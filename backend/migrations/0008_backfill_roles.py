@@ -0,0 +1,26 @@
+from django.db import migrations
+from django.db.models import Case, Exists, OuterRef, Value, When
+
+# Role values, which are also the group names, when this migration was written
+ROLES = ('Admin', 'Author', 'Member')
+
+
+def backfill_roles(apps, schema_editor):
+    """Fill CustomUser.role from group membership, as CustomUser.objects.sync_roles() does."""
+    CustomUser = apps.get_model('backend', 'CustomUser')
+    memberships = CustomUser.groups.through.objects.filter(customuser=OuterRef('pk'))
+    CustomUser.objects.update(role=Case(
+        *[When(Exists(memberships.filter(group__name=name)), then=Value(name)) for name in ROLES],
+        default=Value(''),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0007_customuser_role'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_roles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0008_backfill_roles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='thumbnail_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='thumbnail_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:16
+
+import backend.models
+import backend.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0009_thumbnail_hashes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='book',
+            name='cover_image',
+            field=models.ImageField(blank=True, default='no_image_available.jpg', null=True, storage=backend.storage.media_storage, upload_to='cover_image'),
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='image',
+            field=backend.models.GenderedImageField(blank=True, storage=backend.storage.media_storage, upload_to='profile/'),
+        ),
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('refcount', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'media_blob',
+                'indexes': [models.Index(condition=models.Q(('refcount', 0)), fields=['created_at'], name='media_blob_orphan_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0011_customuser_email_lower'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fine',
+            name='razorpay_order_amount',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='fine',
+            name='razorpay_order_id',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
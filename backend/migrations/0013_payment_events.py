@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0012_fine_razorpay_order'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='finepayment',
+            name='fine',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payments', to='backend.fine'),
+        ),
+        migrations.AddField(
+            model_name='finepayment',
+            name='razorpay_order_id',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='finepayment',
+            name='razorpay_payment_id',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='fine',
+            name='razorpay_order_id',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64),
+        ),
+        migrations.CreateModel(
+            name='PaymentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=64, unique=True)),
+                ('event', models.CharField(max_length=64)),
+                ('payment_id', models.CharField(blank=True, db_index=True, max_length=64)),
+                ('order_id', models.CharField(blank=True, max_length=64)),
+                ('payload', models.JSONField()),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+            options={
+                'db_table': 'payment_event',
+                'indexes': [models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['id'], name='payment_event_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0013_payment_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FinePaymentAllocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('fine', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='backend.fine')),
+                ('payment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='backend.finepayment')),
+            ],
+            options={
+                'db_table': 'fine_payment_allocation',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def allocate_recorded_payments(apps, schema_editor):
+    """Payments recorded against a single fine pay all of it."""
+    FinePayment = apps.get_model('backend', 'FinePayment')
+    FinePaymentAllocation = apps.get_model('backend', 'FinePaymentAllocation')
+    FinePaymentAllocation.objects.bulk_create(
+        FinePaymentAllocation(payment_id=pk, fine_id=fine_id, amount=amount)
+        for pk, fine_id, amount in FinePayment.objects.filter(fine__isnull=False)
+        .values_list('pk', 'fine_id', 'payment_amount').iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0014_fine_payment_allocations'),
+    ]
+
+    operations = [
+        migrations.RunPython(allocate_recorded_payments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0015_allocate_recorded_payments'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='finepayment',
+            name='fine',
+        ),
+        migrations.AddField(
+            model_name='finepayment',
+            name='fines',
+            field=models.ManyToManyField(blank=True, related_name='payments', through='backend.FinePaymentAllocation', to='backend.fine'),
+        ),
+        migrations.AddConstraint(
+            model_name='finepaymentallocation',
+            constraint=models.UniqueConstraint(fields=('fine', 'payment'), name='allocation_one_per_fine_payment'),
+        ),
+    ]
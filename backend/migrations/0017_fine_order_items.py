@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0016_finepayment_fines'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='finepayment',
+            name='refund_due',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=8),
+        ),
+        migrations.CreateModel(
+            name='FineOrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('razorpay_order_id', models.CharField(max_length=64)),
+                ('amount', models.PositiveIntegerField()),
+                ('fine', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='order_items', to='backend.fine')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fine'], name='orderitem_fine_idx')],
+                'constraints': [models.UniqueConstraint(fields=('razorpay_order_id', 'fine'), name='orderitem_one_per_order_fine')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def backfill_order_items(apps, schema_editor):
+    """Record the order each fine points at; orders already replaced on a fine are not known."""
+    Fine = apps.get_model('backend', 'Fine')
+    FineOrderItem = apps.get_model('backend', 'FineOrderItem')
+    fines = (Fine.objects.exclude(razorpay_order_id='').filter(razorpay_order_amount__isnull=False)
+             .values_list('pk', 'razorpay_order_id', 'razorpay_order_amount'))
+    FineOrderItem.objects.bulk_create(
+        (FineOrderItem(fine_id=pk, razorpay_order_id=order_id, amount=amount) for pk, order_id, amount in fines.iterator()),
+        batch_size=BATCH_SIZE, ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0017_fine_order_items'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_order_items, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,16 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models.functions import Lower
 
 from django.contrib.auth.models import AbstractUser
 from django.utils.translation import gettext_lazy as _
 
-from backend.manager import CustomerUserManager
+from backend.manager import (
+    CustomerUserManager, BookQuerySet, LoanQuerySet, FineQuerySet, FinePaymentQuerySet, ReservationQuerySet,
+    MediaBlobQuerySet, PaymentEventQuerySet,
+)
+from backend.storage import media_storage
 
 # Create your models here.
 
@@ -11,6 +18,15 @@ class Gender(models.TextChoices):
     MALE = 'M', _('Male')
     FEMALE = 'F', _('Female')
 
+# Mirrors the auth group names the roles are granted through
+class Role(models.TextChoices):
+    ADMIN = 'Admin', _('Admin')
+    AUTHOR = 'Author', _('Author')
+    MEMBER = 'Member', _('Member')
+
+# Shared avatars GenderedImageField points users at by name
+DEFAULT_AVATARS = ('profile/male_avatar.png', 'profile/female_avatar.png', 'profile/default_image.jpg')
+
 class GenderedImageField(models.ImageField):
 
     def pre_save(self, model_instance, add):
@@ -27,8 +43,9 @@ class GenderedImageField(models.ImageField):
                 # fallback default image
                 value = 'profile/default_image.jpg'
 
-        elif model_instance.gender != getattr(model_instance, f"{self.attname}_gender_cache", None):
-            # If gender has changed
+        elif model_instance.gender != getattr(model_instance, f"{self.attname}_gender_cache", None) \
+                and value.name in DEFAULT_AVATARS:
+            # If gender has changed (uploaded images are kept)
             gender = model_instance.gender
             if gender == Gender.MALE:
                 value = 'profile/male_avatar.png'
@@ -38,7 +55,9 @@ class GenderedImageField(models.ImageField):
                 # fallback default image
                 value = 'profile/default_image.jpg'
         setattr(model_instance, f"{self.attname}_gender_cache", model_instance.gender)
-        return value
+        # Keep the instance in step with the row (post_save handlers read it)
+        setattr(model_instance, self.attname, value)
+        return getattr(model_instance, self.attname)
 
 class CustomUser(AbstractUser):
     username = None
@@ -46,7 +65,12 @@ class CustomUser(AbstractUser):
     last_name = models.CharField(max_length=255)
     email = models.EmailField(_('email address'),unique=True)
     gender = models.CharField(max_length=1,choices=Gender.choices,default=Gender.MALE)
-    image = GenderedImageField(upload_to='profile/',blank=True)
+    image = GenderedImageField(upload_to='profile/',blank=True,storage=media_storage)
+    # Derived from group membership (see CustomerUserManager.sync_roles) so
+    # role filters hit one indexed column instead of joining auth_group
+    role = models.CharField(max_length=16, choices=Role.choices, blank=True, db_index=True, editable=False)
+    # Content hash of image; names the generated thumbnails (see backend.thumbnails)
+    thumbnail_hash = models.CharField(max_length=64, blank=True, editable=False)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['first_name', 'last_name', 'gender']
@@ -55,6 +79,12 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return self.email
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Case-insensitive email lookups (registration availability check)
+            models.Index(Lower('email'), name='user_email_lower_idx'),
+        ]
+
 class AuthorUser(CustomUser):
     class Meta:
         proxy = True
@@ -100,11 +130,40 @@ class Book(models.Model):
 
     authors = models.ManyToManyField('CustomUser', through='BookAuthor')
 
-    cover_image = models.ImageField(upload_to='cover_image', blank=True, null=True, default='no_image_available.jpg')
+    cover_image = models.ImageField(
+        upload_to='cover_image', blank=True, null=True, default='no_image_available.jpg', storage=media_storage,
+    )
+    thumbnail_hash = models.CharField(max_length=64, blank=True, editable=False)
+
+    # Denormalized availability, maintained by Loan/Reservation saves and
+    # rebuilt in bulk by the rebuild_availability command.
+    copies_on_loan = models.IntegerField(default=0, editable=False)
+    copies_reserved = models.IntegerField(default=0, editable=False)
+    copies_available = models.IntegerField(default=0, editable=False, db_index=True)
+
+    objects = BookQuerySet.as_manager()
+
+    AVAILABILITY_FIELDS = ('copies_on_loan', 'copies_reserved', 'copies_available')
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.copies_available = self.copies_owned - self.copies_on_loan - self.copies_reserved
+            return super().save(*args, **kwargs)
+
+        # Never write back counters held in memory; they may be stale.
+        if kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.AVAILABILITY_FIELDS
+            ]
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            Book.objects.filter(pk=self.pk).recompute_availability()
+            Reservation.objects.promote_waitlist(self.pk)
+
     class Meta:
         db_table = "book"
 
@@ -127,11 +186,35 @@ class Loan(models.Model):
     loan_date = models.DateField()
     returned_date = models.DateField(null=True, blank=True)
 
+    objects = LoanQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.member.email} - {self.book.title}"
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = Loan.objects.filter(pk=self.pk).values('book_id', 'returned_date').first()
+            super().save(*args, **kwargs)
+            if previous and previous['returned_date'] is None:
+                if previous['book_id'] == self.book_id and self.returned_date is None:
+                    return
+                Book.objects.adjust_availability(previous['book_id'], on_loan=-1)
+                Reservation.objects.promote_waitlist(previous['book_id'])
+            if self.returned_date is None:
+                Book.objects.adjust_availability(self.book_id, on_loan=1)
+
     class Meta:
         db_table = 'loan'
+        indexes = [
+            models.Index(fields=['member', '-loan_date'], name='loan_member_date_idx'),
+            models.Index(fields=['loan_date'], name='loan_date_idx'),
+            models.Index(fields=['returned_date'], name='loan_returned_date_idx'),
+            # Open loans: availability per book and overdue scans
+            models.Index(fields=['book'], condition=models.Q(returned_date__isnull=True), name='loan_open_book_idx'),
+            models.Index(fields=['loan_date'], condition=models.Q(returned_date__isnull=True), name='loan_open_date_idx'),
+        ]
 
 class FineStatus(models.TextChoices):
     PENDING = 'Pending', _('Pending')
@@ -148,19 +231,130 @@ class Fine(models.Model):
         choices=FineStatus.choices,
         default=FineStatus.PENDING
     )
+    # Overdue fines created by the accrue_fines command, one per loan
+    accrued = models.BooleanField(default=False, editable=False)
+    # The Razorpay order covering this fine, alone or with the member's other
+    # pending fines, and this fine's share of it in paise. The order is reused
+    # while the shares match the current amounts.
+    razorpay_order_id = models.CharField(max_length=64, blank=True, editable=False, db_index=True)
+    razorpay_order_amount = models.PositiveIntegerField(null=True, blank=True, editable=False)
+
+    objects = FineQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.member.email} - ₹{self.fine_amount} on {self.fine_date}"
 
+    @property
+    def amount_in_paise(self):
+        # Razorpay works with paise
+        return int(Decimal(self.fine_amount) * 100)
+
+    class Meta:
+        indexes = [
+            # Covers the outstanding balance per member without touching paid fines
+            models.Index(
+                fields=['member', 'fine_amount'], condition=models.Q(status=FineStatus.PENDING),
+                name='fine_pending_member_idx',
+            ),
+            models.Index(fields=['member', '-fine_date'], name='fine_member_date_idx'),
+            models.Index(fields=['fine_date'], name='fine_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['loan'], condition=models.Q(accrued=True), name='fine_one_accrued_per_loan'
+            ),
+        ]
+
+
+class FineOrderItem(models.Model):
+    """
+    One fine covered by a Razorpay order, with its share in paise. Kept for
+    every order created, so a payment captured on an order the fine has since
+    moved away from still settles.
+    """
+    razorpay_order_id = models.CharField(max_length=64)
+    fine = models.ForeignKey(Fine, on_delete=models.CASCADE, related_name='order_items', db_index=False)
+    amount = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"Fine {self.fine_id} in order {self.razorpay_order_id}"
+
+    class Meta:
+        constraints = [
+            # Also the index for looking up the fines of an order
+            models.UniqueConstraint(fields=['razorpay_order_id', 'fine'], name='orderitem_one_per_order_fine'),
+        ]
+        indexes = [
+            models.Index(fields=['fine'], name='orderitem_fine_idx'),
+        ]
+
 
 class FinePayment(models.Model):
     member = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    fines = models.ManyToManyField(Fine, through='FinePaymentAllocation', related_name='payments', blank=True)
     payment_date = models.DateField()
     payment_amount = models.DecimalField(max_digits=8, decimal_places=2)
+    # Set for payments settled through Razorpay; unique so that a callback or
+    # webhook delivered twice cannot record the same payment twice
+    razorpay_payment_id = models.CharField(max_length=64, null=True, blank=True, unique=True, editable=False)
+    razorpay_order_id = models.CharField(max_length=64, blank=True, editable=False)
+    # The part of the payment no pending fine was left to take, because the
+    # fines were paid on another order first; it is owed back to the member
+    refund_due = models.DecimalField(max_digits=8, decimal_places=2, default=0, editable=False)
+
+    objects = FinePaymentQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.member.email} - ₹{self.payment_amount} on {self.payment_date}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['member', '-payment_date'], name='finepayment_member_date_idx'),
+            models.Index(fields=['payment_date'], name='finepayment_date_idx'),
+        ]
+
+
+class FinePaymentAllocation(models.Model):
+    """The part of a payment that settled one fine."""
+    payment = models.ForeignKey(FinePayment, on_delete=models.CASCADE, related_name='allocations')
+    fine = models.ForeignKey(Fine, on_delete=models.CASCADE, related_name='allocations', db_index=False)
+    amount = models.DecimalField(max_digits=8, decimal_places=2)
+
+    def __str__(self):
+        return f"₹{self.amount} of payment {self.payment_id} to fine {self.fine_id}"
+
+    class Meta:
+        db_table = 'fine_payment_allocation'
+        constraints = [
+            # Also the index for looking up the payments of a fine
+            models.UniqueConstraint(fields=['fine', 'payment'], name='allocation_one_per_fine_payment'),
+        ]
+
+
+class PaymentEvent(models.Model):
+    """A Razorpay webhook delivery, stored as received and settled by the process_payment_events command."""
+    event_id = models.CharField(max_length=64, unique=True)  # X-Razorpay-Event-Id, the same on redelivery
+    event = models.CharField(max_length=64)
+    payment_id = models.CharField(max_length=64, blank=True, db_index=True)
+    order_id = models.CharField(max_length=64, blank=True)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    objects = PaymentEventQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.event} {self.payment_id or self.event_id}"
+
+    class Meta:
+        db_table = 'payment_event'
+        indexes = [
+            # The queue: events not settled yet, oldest first
+            models.Index(fields=['id'], condition=models.Q(processed_at__isnull=True), name='payment_event_pending_idx'),
+        ]
+
 
 
 class ReservationStatus(models.TextChoices):
@@ -168,6 +362,7 @@ class ReservationStatus(models.TextChoices):
     APPROVED = 'A', _('Approved')
     REJECTED = 'R', _('Rejected')
     CANCELLED = 'CANCELLED', _('Cancelled')
+    FULFILLED = 'F', _('Fulfilled')
 
 class Reservation(models.Model):
     book = models.ForeignKey(Book, on_delete=models.CASCADE)
@@ -179,5 +374,79 @@ class Reservation(models.Model):
         default=ReservationStatus.PENDING
     )
 
+    objects = ReservationQuerySet.as_manager()
+
     def __str__(self):
-        return f"{self.member.email} - {self.book.title} ({self.reservation_status})"
\ No newline at end of file
+        return f"{self.member.email} - {self.book.title} ({self.reservation_status})"
+
+    # An approved reservation holds a copy until it is cancelled or rejected
+    def holds_copy(self, status=None):
+        return (status or self.reservation_status) == ReservationStatus.APPROVED
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = Reservation.objects.filter(pk=self.pk).values('book_id', 'reservation_status').first()
+            super().save(*args, **kwargs)
+            if previous and self.holds_copy(previous['reservation_status']):
+                if previous['book_id'] == self.book_id and self.holds_copy():
+                    return
+                Book.objects.adjust_availability(previous['book_id'], reserved=-1)
+                # A fulfilled reservation hands its copy to the new loan
+                if self.reservation_status != ReservationStatus.FULFILLED:
+                    Reservation.objects.promote_waitlist(previous['book_id'])
+            if self.holds_copy():
+                Book.objects.adjust_availability(self.book_id, reserved=1)
+
+    class Meta:
+        indexes = [
+            # FIFO waitlist per book
+            models.Index(
+                fields=['book', 'reservation_date', 'id'],
+                condition=models.Q(reservation_status=ReservationStatus.PENDING),
+                name='reservation_waitlist_idx',
+            ),
+            models.Index(fields=['member', '-reservation_date'], name='reservation_member_date_idx'),
+            models.Index(fields=['reservation_date'], name='reservation_date_idx'),
+            models.Index(fields=['reservation_status'], name='reservation_status_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['member', 'book'],
+                condition=models.Q(reservation_status=ReservationStatus.PENDING),
+                name='reservation_one_pending',
+            ),
+        ]
+
+
+class JobCheckpoint(models.Model):
+    """Resume point for long-running batch jobs, e.g. the last loan id processed."""
+    name = models.CharField(max_length=255, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+    class Meta:
+        db_table = 'job_checkpoint'
+
+
+class MediaBlob(models.Model):
+    """Reference count of a file in content-addressed media storage (see backend.storage)."""
+    name = models.CharField(max_length=255, unique=True)
+    refcount = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = MediaBlobQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.name} x{self.refcount}"
+
+    class Meta:
+        db_table = 'media_blob'
+        indexes = [
+            # Unreferenced blobs, scanned by prune_media
+            models.Index(fields=['created_at'], condition=models.Q(refcount=0), name='media_blob_orphan_idx'),
+        ]
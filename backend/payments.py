@@ -0,0 +1,252 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property, lru_cache, partial
+
+import razorpay
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from requests.adapters import HTTPAdapter
+
+from backend.models import Fine, FineOrderItem
+
+logger = logging.getLogger(__name__)
+
+
+class GatewayError(Exception):
+    """The payment gateway could not be reached, timed out or failed."""
+
+
+class CircuitOpenError(GatewayError):
+    pass
+
+
+class PaymentRejected(GatewayError):
+    """The gateway answered but refused the request (a 4xx)."""
+
+
+class CircuitBreaker:
+    """
+    Fails fast after ``threshold`` failed calls in a row instead of letting
+    every request wait out the timeouts. Once ``reset_after`` seconds have
+    passed a single trial call is let through: success closes the circuit,
+    failure keeps it open for another period.
+    """
+
+    def __init__(self, threshold=5, reset_after=30, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if self.clock() - self.opened_at >= self.reset_after else 'open'
+
+    def before_call(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if self.trial_running or self.clock() - self.opened_at < self.reset_after:
+                raise CircuitOpenError('Payment gateway circuit is open')
+            self.trial_running = True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.opened_at is not None or self.failures >= self.threshold:
+                if self.opened_at is None:
+                    logger.warning('Payment gateway circuit opened after %d failures', self.failures)
+                self.opened_at = self.clock()
+
+
+class PaymentGateway:
+    """
+    Razorpay client with a pooled keep-alive session, timeouts, retries and a
+    circuit breaker. The SDK is blocking, so the async methods run the calls
+    on a small thread pool sized like the connection pool; an async view
+    awaiting them leaves the event loop free to serve other requests while
+    the gateway is slow.
+    """
+
+    def __init__(self, key_id, key_secret, base_url=None, connect_timeout=3.05, read_timeout=10,
+                 retries=2, backoff=0.25, pool_size=10, breaker=None, webhook_secret=None):
+        self.key_id = key_id
+        self.key_secret = key_secret
+        self.webhook_secret = webhook_secret
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.breaker = breaker or CircuitBreaker()
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='payment-gateway')
+
+    @cached_property
+    def client(self):
+        # Created on first use rather than at import time
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        options = {'base_url': self.base_url} if self.base_url else {}
+        return razorpay.Client(session=session, auth=(self.key_id, self.key_secret), **options)
+
+    def call(self, operation, *args, **kwargs):
+        self.breaker.before_call()
+        for attempt in range(self.retries + 1):
+            try:
+                result = operation(*args, timeout=self.timeout, **kwargs)
+            except razorpay.errors.BadRequestError as exc:
+                self.breaker.record_success()  # the gateway is up, the request is wrong
+                raise PaymentRejected(str(exc)) from exc
+            except (requests.RequestException, razorpay.errors.ServerError, razorpay.errors.GatewayError) as exc:
+                if attempt == self.retries:
+                    self.breaker.record_failure()
+                    raise GatewayError(f'{type(exc).__name__}: {exc}') from exc
+                delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+                logger.info('Payment gateway call failed (%s), retrying in %.2fs', exc, delay)
+                time.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return result
+
+    def create_order(self, amount_in_paise, receipt, notes=None):
+        # Retrying after a read timeout can leave an extra unpaid order at
+        # Razorpay; those are never captured and cost nothing
+        return self.call(self.client.order.create, data={
+            'amount': amount_in_paise,
+            'currency': 'INR',
+            'receipt': receipt,
+            'notes': notes or {},
+        })
+
+    def payments(self, since, until, page_size=100):
+        """Yield every payment created between two datetimes, newest first, a page at a time."""
+        skip = 0
+        while True:
+            page = self.call(self.client.payment.all, data={
+                'from': int(since.timestamp()), 'to': int(until.timestamp()), 'count': page_size, 'skip': skip,
+            })
+            items = page.get('items', [])
+            yield from items
+            if len(items) < page_size:
+                return
+            skip += page_size
+
+    def verify_payment_signature(self, params):
+        # Local HMAC checks, no HTTP call
+        return self.client.utility.verify_payment_signature(params)
+
+    def verify_webhook_signature(self, body, signature):
+        if not self.webhook_secret:
+            raise razorpay.errors.SignatureVerificationError('RAZORPAY_WEBHOOK_SECRET is not set')
+        if isinstance(body, bytes):
+            body = body.decode('utf-8', 'replace')
+        return self.client.utility.verify_webhook_signature(body, signature, self.webhook_secret)
+
+    async def run(self, function, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(function, *args, **kwargs))
+
+    async def acreate_order(self, amount_in_paise, receipt, notes=None):
+        return await self.run(self.create_order, amount_in_paise, receipt, notes)
+
+
+@lru_cache(maxsize=None)
+def get_gateway():
+    return PaymentGateway(
+        settings.RAZORPAY_KEY_ID,
+        settings.RAZORPAY_KEY_SECRET,
+        base_url=settings.RAZORPAY_API_URL,
+        connect_timeout=settings.RAZORPAY_CONNECT_TIMEOUT,
+        read_timeout=settings.RAZORPAY_READ_TIMEOUT,
+        retries=settings.RAZORPAY_RETRIES,
+        backoff=settings.RAZORPAY_RETRY_BACKOFF,
+        pool_size=settings.RAZORPAY_POOL_SIZE,
+        breaker=CircuitBreaker(settings.RAZORPAY_CIRCUIT_THRESHOLD, settings.RAZORPAY_CIRCUIT_RESET),
+        webhook_secret=settings.RAZORPAY_WEBHOOK_SECRET,
+    )
+
+
+def reusable_order(fines):
+    """
+    The order already covering exactly ``fines`` at their current amounts,
+    or None. Each fine stores its share of the order, so an amount changed
+    by accrue_fines, a fine added to or dropped from the set, or one of them
+    moved to another order all make the stored order stale.
+    """
+    order_ids = {fine.razorpay_order_id for fine in fines}
+    if len(order_ids) != 1 or '' in order_ids:
+        return None
+    if any(fine.razorpay_order_amount != fine.amount_in_paise for fine in fines):
+        return None
+    order_id = order_ids.pop()
+    if Fine.objects.filter(razorpay_order_id=order_id).count() != len(fines):
+        return None
+    return order_id
+
+
+def store_order(fines, order_id):
+    """
+    Point ``fines`` at a new order and record what it covers, unless a
+    concurrent click stored a usable one first; returns the order id to pay.
+    """
+    with transaction.atomic():
+        current = list(Fine.objects.select_for_update().filter(pk__in=[fine.pk for fine in fines]).order_by('pk'))
+        existing = reusable_order(current)
+        if existing:
+            return existing  # ours lapses unpaid
+        for fine in fines:
+            fine.razorpay_order_id = order_id
+            fine.razorpay_order_amount = fine.amount_in_paise
+        Fine.objects.bulk_update(fines, ['razorpay_order_id', 'razorpay_order_amount'])
+        # The fines only point at their latest order; this keeps what every order covered
+        FineOrderItem.objects.bulk_create(
+            FineOrderItem(razorpay_order_id=order_id, fine=fine, amount=fine.razorpay_order_amount) for fine in fines
+        )
+    return order_id
+
+
+async def order_for_fines(fines, gateway=None):
+    """
+    The id of one Razorpay order paying all of ``fines`` (a member's pending
+    fines, or a single one). The order is created once and stored on the
+    fines, so clicking Pay again reuses it.
+    """
+    fines = sorted(fines, key=lambda fine: fine.pk)
+    existing = await sync_to_async(reusable_order)(fines)
+    if existing:
+        return existing
+
+    gateway = gateway or get_gateway()
+    member_id = fines[0].member_id
+    receipt = f'fine-{fines[0].pk}' if len(fines) == 1 else f'fines-{member_id}-{fines[0].pk}-{len(fines)}'
+    order = await gateway.acreate_order(
+        sum(fine.amount_in_paise for fine in fines),
+        receipt=receipt,
+        # Razorpay caps a note at 256 characters
+        notes={'member_id': str(member_id), 'fine_ids': ','.join(str(fine.pk) for fine in fines)[:256]},
+    )
+    return await sync_to_async(store_order)(fines, order['id'])
+
+
+async def order_for_fine(fine, gateway=None):
+    return await order_for_fines([fine], gateway)
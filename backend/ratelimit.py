@@ -0,0 +1,25 @@
+import time
+
+from django.core.cache import cache
+
+
+def client_ip(request):
+    # REMOTE_ADDR only; X-Forwarded-For can be forged unless a trusted proxy sets it
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def is_rate_limited(scope, identity, limit, window):
+    """
+    Fixed-window counter in the cache: True once ``identity`` has made more
+    than ``limit`` calls to ``scope`` in the current ``window`` seconds.
+    """
+    bucket = int(time.time() // window)
+    key = f'rate:{scope}:{identity}:{bucket}'
+    # add() is a no-op when the key exists, so the window's TTL is set once
+    cache.add(key, 0, timeout=window + 1)
+    try:
+        return cache.incr(key) > limit
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, 1, timeout=window + 1)
+        return False
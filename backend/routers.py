@@ -0,0 +1,103 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Set on a response whose request wrote to the primary; while it lasts the
+# client's reads stay on the primary, so it sees its own writes
+STICKY_COOKIE = 'read_primary'
+
+
+@dataclass
+class RoutingState:
+    request: object = None
+    replica: bool = False  # inside replica_reads()
+    primary: bool = False  # inside primary_reads()
+    wrote: bool = False
+    sticky: bool = False
+    alias: str = None  # the replica picked for this request
+
+
+# Set per request by the database_routing middleware
+current_routing = ContextVar('current_routing', default=None)
+
+
+@contextmanager
+def routing_flag(name):
+    state = current_routing.get()
+    token = None
+    if state is None:
+        # Outside a request, e.g. in a management command
+        state = RoutingState()
+        token = current_routing.set(state)
+    previous = getattr(state, name)
+    setattr(state, name, True)
+    try:
+        yield state
+    finally:
+        setattr(state, name, previous)
+        if token is not None:
+            current_routing.reset(token)
+
+
+def replica_reads():
+    """Let reads in this block, or view when used as a decorator, go to a replica."""
+    return routing_flag('replica')
+
+
+def primary_reads():
+    """Keep reads in this block, or view when used as a decorator, on the primary."""
+    return routing_flag('primary')
+
+
+def pinned(queryset):
+    """
+    ``queryset`` bound to the database routing picks for it now. For results
+    that are read after the view returns, as streamed exports are.
+    """
+    return queryset.using(queryset.db)
+
+
+def pinned_to_primary(state):
+    if state.primary or state.wrote or state.sticky:
+        return True
+    # Reads inside a transaction must see its writes
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return True
+    match = getattr(state.request, 'resolver_match', None)
+    return match is not None and match.view_name in settings.DATABASE_PRIMARY_VIEWS
+
+
+class ReplicaRouter:
+    """
+    Writes go to the primary. Reads go to a replica (settings.DATABASE_REPLICA_ALIASES)
+    only inside replica_reads(), and even then stay on the primary after the
+    client's own writes, inside transactions and in DATABASE_PRIMARY_VIEWS.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = current_routing.get()
+        replicas = settings.DATABASE_REPLICA_ALIASES
+        if not replicas or state is None or not state.replica or pinned_to_primary(state):
+            return DEFAULT_DB_ALIAS
+        if state.alias is None:
+            # One replica per request, so its reads see a single point in time
+            state.alias = random.choice(replicas)
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        state = current_routing.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema from the primary
+        return False if db in settings.DATABASE_REPLICA_ALIASES else None
@@ -0,0 +1,197 @@
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from backend.models import Book
+from backend.utils import chunked
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+@dataclass
+class SearchResults:
+    items: list = field(default_factory=list)
+    page: int = 1
+    page_size: int = 24
+    has_next: bool = False
+
+    @property
+    def has_previous(self):
+        return self.page > 1
+
+    @property
+    def next_page(self):
+        return self.page + 1 if self.has_next else None
+
+    @property
+    def previous_page(self):
+        return self.page - 1 if self.has_previous else None
+
+
+def book_documents(book_ids):
+    """Yield ``(id, title, category, authors)`` rows for the given books."""
+    books = (
+        Book.objects.filter(id__in=book_ids)
+        .select_related('category')
+        .prefetch_related('authors')
+    )
+    for book in books:
+        authors = ' '.join(
+            f'{author.first_name} {author.last_name} {author.email}' for author in book.authors.all()
+        )
+        yield book.id, book.title, book.category.name, authors
+
+
+class BaseSearchBackend:
+
+    def setup(self):
+        pass
+
+    def index_books(self, book_ids):
+        pass
+
+    def index_documents(self, documents):
+        """Index ``(id, title, category, authors)`` rows the caller already has in memory."""
+        pass
+
+    def remove_books(self, book_ids):
+        pass
+
+    def rebuild(self, batch_size=1000):
+        self.setup()
+        self.index_all(batch_size)
+
+    def index_all(self, batch_size=1000):
+        ids = Book.objects.order_by('id').values_list('id', flat=True)
+        for batch in chunked(ids.iterator(chunk_size=batch_size), batch_size):
+            self.index_books(batch)
+
+    def search(self, query, limit, offset=0):
+        """Return up to ``limit`` book ids ranked by relevance."""
+        raise NotImplementedError
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """Unindexed fallback that works on any database."""
+
+    def search(self, query, limit, offset=0):
+        condition = Q()
+        for token in TOKEN_RE.findall(query):
+            condition &= (
+                Q(title__icontains=token)
+                | Q(category__name__icontains=token)
+                | Q(authors__first_name__icontains=token)
+                | Q(authors__last_name__icontains=token)
+            )
+        ids = Book.objects.filter(condition).order_by('id').values_list('id', flat=True).distinct()
+        return list(ids[offset:offset + limit])
+
+
+class SQLiteFTS5SearchBackend(BaseSearchBackend):
+    """
+    Inverted index kept in an FTS5 virtual table whose rowid is the book id.
+    Ranked with bm25, weighting title over author names over category.
+    """
+    table = 'book_search'
+    weights = (10.0, 2.0, 5.0)  # title, category, authors
+    chunk_size = 500
+
+    def _connection(self, write=False):
+        alias = router.db_for_write(Book) if write else router.db_for_read(Book)
+        return connections[alias]
+
+    def setup(self):
+        """
+        Create the index, run after every migrate. An empty index next to
+        existing books (a first deploy) is filled, so search works without a
+        manual rebuild_search_index.
+        """
+        self.create_table()
+        with self._connection(write=True).cursor() as cursor:
+            cursor.execute(f"SELECT 1 FROM {self.table} LIMIT 1")
+            empty = cursor.fetchone() is None
+        if empty and Book.objects.exists():
+            self.index_all()
+
+    def create_table(self):
+        with self._connection(write=True).cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} "
+                f"USING fts5(title, category, authors, tokenize='unicode61 remove_diacritics 2')"
+            )
+
+    def index_books(self, book_ids):
+        for chunk in chunked(book_ids, self.chunk_size):
+            self.index_documents(list(book_documents(chunk)))
+
+    def index_documents(self, documents):
+        connection = self._connection(write=True)
+        for rows in chunked(documents, self.chunk_size):
+            # One transaction per chunk; autocommit would sync after every row
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                self._delete(cursor, [row[0] for row in rows])
+                cursor.executemany(
+                    f"INSERT INTO {self.table}(rowid, title, category, authors) VALUES (%s, %s, %s, %s)",
+                    rows,
+                )
+
+    def remove_books(self, book_ids):
+        for chunk in chunked(book_ids, self.chunk_size):
+            with self._connection(write=True).cursor() as cursor:
+                self._delete(cursor, chunk)
+
+    def _delete(self, cursor, book_ids):
+        placeholders = ', '.join(['%s'] * len(book_ids))
+        cursor.execute(f"DELETE FROM {self.table} WHERE rowid IN ({placeholders})", book_ids)
+
+    def rebuild(self, batch_size=1000):
+        self.create_table()
+        with self._connection(write=True).cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+        self.index_all(batch_size)
+
+    @staticmethod
+    def match_expression(query):
+        # Quote every token so user input can never inject FTS5 syntax,
+        # and prefix-match the last one for search-as-you-type.
+        tokens = TOKEN_RE.findall(query)
+        if not tokens:
+            return None
+        terms = [f'"{token}"' for token in tokens]
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+    def search(self, query, limit, offset=0):
+        expression = self.match_expression(query)
+        if expression is None:
+            return []
+        weights = ', '.join(str(weight) for weight in self.weights)
+        with self._connection().cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s "
+                f"ORDER BY bm25({self.table}, {weights}) LIMIT %s OFFSET %s",
+                [expression, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    backend_path = getattr(settings, 'CATALOG_SEARCH_BACKEND', 'backend.search.DatabaseSearchBackend')
+    return import_string(backend_path)()
+
+
+def search_books(query, page=1, page_size=24):
+    ids = get_search_backend().search(query, limit=page_size + 1, offset=(page - 1) * page_size)
+    books = Book.objects.in_bulk(ids[:page_size])
+    return SearchResults(
+        items=[books[book_id] for book_id in ids[:page_size] if book_id in books],
+        page=page,
+        page_size=page_size,
+        has_next=len(ids) > page_size,
+    )
@@ -0,0 +1,149 @@
+import json
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from backend.models import Fine, FineOrderItem, FinePayment, FinePaymentAllocation, FineStatus, PaymentEvent
+from backend.stats import invalidate_admin_stats, invalidate_member_summary
+
+logger = logging.getLogger(__name__)
+
+# Webhook events that carry a captured payment entity
+SETTLING_EVENTS = {'payment.captured', 'order.paid'}
+
+
+class SettlementError(Exception):
+    pass
+
+
+@dataclass
+class Settlement:
+    payment: FinePayment
+    created: bool
+
+
+def from_paise(amount):
+    return (Decimal(amount) / 100).quantize(Decimal('0.01'))
+
+
+def paid_on(created_at):
+    """The local date of a Razorpay ``created_at`` timestamp."""
+    if not created_at:
+        return date.today()
+    return timezone.localdate(datetime.fromtimestamp(int(created_at), tz=dt_timezone.utc))
+
+
+def settle_payment(payment_id, order_id, amount_in_paise=None, payment_date=None):
+    """
+    Record a captured Razorpay payment, allocate it to the fines its order
+    covers and mark them paid, in one transaction. The browser callback,
+    webhook redeliveries and reconciliation all end up here, so it may run
+    any number of times for the same payment; only the first call writes
+    anything. Fines already paid on another order are left alone and their
+    share is recorded as ``refund_due``.
+    """
+    if not payment_id or not order_id:
+        raise SettlementError('A payment id and an order id are required')
+    existing = FinePayment.objects.filter(razorpay_payment_id=payment_id).first()
+    if existing:
+        return Settlement(existing, False)
+
+    with transaction.atomic():
+        # What the order covered when it was created; the fines may have moved to a newer order since
+        shares = dict(FineOrderItem.objects.filter(razorpay_order_id=order_id).values_list('fine_id', 'amount'))
+        if not shares:
+            raise SettlementError(f'No fine has order {order_id}')
+        # Concurrent settlements of the same fines queue up here
+        fines = list(Fine.objects.select_for_update().filter(pk__in=shares).order_by('pk'))
+        existing = FinePayment.objects.filter(razorpay_payment_id=payment_id).first()
+        if existing:
+            return Settlement(existing, False)
+        amount = amount_in_paise if amount_in_paise is not None else sum(shares.values())
+        pending = [fine for fine in fines if fine.status == FineStatus.PENDING]
+        unallocated = amount - sum(shares[fine.pk] for fine in pending)
+        if unallocated:
+            # Fines paid on another order since this one was created
+            logger.warning('Payment %s for order %s leaves %s unallocated; it needs a refund',
+                           payment_id, order_id, from_paise(unallocated))
+
+        member_id = fines[0].member_id
+        try:
+            with transaction.atomic():
+                payment = FinePayment.objects.create(
+                    member_id=member_id,
+                    payment_date=payment_date or date.today(),
+                    payment_amount=from_paise(amount),
+                    razorpay_payment_id=payment_id,
+                    razorpay_order_id=order_id,
+                    refund_due=from_paise(max(unallocated, 0)),
+                )
+        except IntegrityError:
+            # Recorded by a concurrent delivery on a database without row locks
+            return Settlement(FinePayment.objects.get(razorpay_payment_id=payment_id), False)
+        FinePaymentAllocation.objects.bulk_create(
+            FinePaymentAllocation(payment=payment, fine=fine, amount=from_paise(shares[fine.pk]))
+            for fine in pending
+        )
+        # One UPDATE for all the fines; it skips the signals that expire the cached figures
+        Fine.objects.filter(pk__in=[fine.pk for fine in pending]).update(status=FineStatus.APPROVED)
+        expire_fine_figures(member_id)
+    return Settlement(payment, True)
+
+
+def expire_fine_figures(member_id):
+    def expire():
+        invalidate_member_summary(member_id)
+        invalidate_admin_stats()
+
+    # Again after commit, in case a concurrent request re-cached pre-commit figures
+    expire()
+    transaction.on_commit(expire)
+
+
+def queue_event(event_id, body):
+    """Store a verified webhook body; returns ``(event, created)``, created is False for a redelivery."""
+    payload = json.loads(body)
+    if not isinstance(payload, dict):
+        raise ValueError('Webhook payload must be a JSON object')
+    entity = (payload.get('payload') or {}).get('payment', {}).get('entity') or {}
+    return PaymentEvent.objects.get_or_create(event_id=event_id, defaults={
+        'event': str(payload.get('event', ''))[:64],
+        'payment_id': str(entity.get('id') or '')[:64],
+        'order_id': str(entity.get('order_id') or '')[:64],
+        'payload': payload,
+    })
+
+
+def process_event(event):
+    if event.event in SETTLING_EVENTS:
+        entity = event.payload['payload']['payment']['entity']
+        settle_payment(entity['id'], entity.get('order_id'), entity.get('amount'), paid_on(entity.get('created_at')))
+    # Other events (payment.failed, refunds, ...) are kept for the record only
+
+
+def process_pending_events(limit=100, max_attempts=10, after_id=0):
+    """
+    Settle up to ``limit`` queued events after ``after_id``; returns
+    ``(processed, failed, last_id)``. Failed events stay queued for a later run.
+    """
+    processed = failed = 0
+    last_id = after_id
+    for event in PaymentEvent.objects.pending(max_attempts).filter(id__gt=after_id)[:limit]:
+        last_id = event.id
+        event.attempts += 1
+        try:
+            process_event(event)
+        except (SettlementError, KeyError, TypeError, ValueError) as exc:
+            event.last_error = f'{type(exc).__name__}: {exc}'
+            event.save(update_fields=['attempts', 'last_error'])
+            failed += 1
+            continue
+        event.processed_at = timezone.now()
+        event.last_error = ''
+        event.save(update_fields=['attempts', 'last_error', 'processed_at'])
+        processed += 1
+    return processed, failed, last_id
@@ -0,0 +1,257 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.contrib.auth.models import Group
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save, m2m_changed
+from django.dispatch import receiver
+
+from backend.models import (
+    AdminUser, AuthorUser, Book, BookAuthor, Category, CustomUser, Fine, FinePayment, Loan, MediaBlob, MemberUser,
+    Reservation,
+)
+from backend.accounts import forget_email
+from backend.catalog_cache import invalidate_book_card, invalidate_catalog
+from backend.metrics import install_query_recorder
+from backend.search import get_search_backend
+from backend.stats import invalidate_admin_stats, invalidate_member_summary
+from backend.thumbnails import refresh_thumbnails, spec_for
+
+
+# ---------- Roles ----------
+@receiver(m2m_changed, sender=CustomUser.groups.through)
+def sync_roles_on_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # group.user_set.clear(): remember who is about to lose the group
+        instance._role_user_ids = list(instance.user_set.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        user_ids = [instance.pk]
+    elif action == 'post_clear':
+        user_ids = getattr(instance, '_role_user_ids', [])
+    else:
+        user_ids = list(pk_set or ())
+    if user_ids:
+        CustomUser.objects.sync_roles(user_ids)
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_users(sender, instance, **kwargs):
+    instance._role_user_ids = list(instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def sync_roles_on_group_change(sender, instance, created=False, **kwargs):
+    if created:
+        return
+    user_ids = getattr(instance, '_role_user_ids', None)
+    if user_ids is None:
+        user_ids = list(instance.user_set.values_list('pk', flat=True))
+    if user_ids:
+        CustomUser.objects.sync_roles(user_ids)
+        invalidate_admin_stats()
+
+
+# ---------- Availability counters ----------
+# Saves adjust the counters in Loan.save/Reservation.save; deletes are handled
+# here so that cascades (e.g. deleting a member) release their copies too.
+@receiver(post_delete, sender=Loan)
+def release_loaned_copy(sender, instance, **kwargs):
+    if instance.returned_date is None:
+        Book.objects.adjust_availability(instance.book_id, on_loan=-1)
+
+
+@receiver(post_delete, sender=Reservation)
+def release_reserved_copy(sender, instance, **kwargs):
+    if instance.holds_copy():
+        Book.objects.adjust_availability(instance.book_id, reserved=-1)
+
+
+# ---------- Cached member summaries ----------
+@receiver(post_save, sender=Loan)
+@receiver(post_delete, sender=Loan)
+@receiver(post_save, sender=Fine)
+@receiver(post_delete, sender=Fine)
+@receiver(post_save, sender=FinePayment)
+@receiver(post_delete, sender=FinePayment)
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def expire_member_summary(sender, instance, **kwargs):
+    member_id = instance.member_id
+    # Again after commit, in case a concurrent request re-cached pre-commit figures
+    invalidate_member_summary(member_id)
+    transaction.on_commit(lambda: invalidate_member_summary(member_id))
+
+
+# ---------- Cached admin dashboard statistics ----------
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+@receiver(post_save, sender=Loan)
+@receiver(post_delete, sender=Loan)
+@receiver(post_save, sender=Fine)
+@receiver(post_delete, sender=Fine)
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def expire_admin_stats(sender, **kwargs):
+    invalidate_admin_stats()
+    transaction.on_commit(invalidate_admin_stats)
+
+
+# Deleting a user drops their group memberships without an m2m_changed
+# signal; the admin deletes through its proxy models, which are the sender then
+for model in (CustomUser, AuthorUser, MemberUser, AdminUser):
+    post_delete.connect(expire_admin_stats, sender=model, dispatch_uid=f'expire_admin_stats.{model.__name__}')
+
+
+@receiver(m2m_changed, sender=CustomUser.groups.through)
+def expire_admin_stats_on_membership(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_admin_stats()
+        transaction.on_commit(invalidate_admin_stats)
+
+
+# ---------- Search index ----------
+def reindex_books_on_commit(book_ids):
+    book_ids = list(book_ids)
+    if book_ids:
+        transaction.on_commit(lambda: get_search_backend().index_books(book_ids))
+        # Cached search result pages change with the index
+        transaction.on_commit(invalidate_catalog)
+
+
+@receiver(post_save, sender=Book)
+def index_book(sender, instance, **kwargs):
+    reindex_books_on_commit([instance.pk])
+
+
+@receiver(post_delete, sender=Book)
+def unindex_book(sender, instance, **kwargs):
+    book_id = instance.pk
+    transaction.on_commit(lambda: get_search_backend().remove_books([book_id]))
+
+
+@receiver(post_save, sender=BookAuthor)
+@receiver(post_delete, sender=BookAuthor)
+def index_book_authors(sender, instance, **kwargs):
+    reindex_books_on_commit([instance.book_id])
+
+
+@receiver(post_save, sender=Category)
+def index_category_books(sender, instance, created, **kwargs):
+    if not created:
+        reindex_books_on_commit(Book.objects.filter(category=instance).values_list('id', flat=True))
+
+
+def index_author_books(sender, instance, created, update_fields=None, **kwargs):
+    # Logins save last_login only; skip the lookup unless names may have changed.
+    if update_fields is not None and not {'first_name', 'last_name', 'email'} & set(update_fields):
+        return
+    if not created:
+        reindex_books_on_commit(BookAuthor.objects.filter(author=instance).values_list('book_id', flat=True))
+
+
+# The admin saves users through its proxy models, which are the sender then
+for model in (CustomUser, AuthorUser, MemberUser, AdminUser):
+    post_save.connect(index_author_books, sender=model, dispatch_uid=f'index_author_books.{model.__name__}')
+
+
+# ---------- Images: thumbnails and media reference counts ----------
+# Models with an image field; saving through the admin's proxy user models
+# sends the proxy as sender.
+IMAGE_SENDERS = (Book, CustomUser, AuthorUser, MemberUser, AdminUser)
+
+
+def _thumbnail_source_skipped(sender, update_fields):
+    return update_fields is not None and spec_for(sender).field not in update_fields
+
+
+def remember_thumbnail_source(sender, instance, update_fields=None, **kwargs):
+    if _thumbnail_source_skipped(sender, update_fields):
+        return
+    source = getattr(instance, spec_for(sender).field)
+    # A fresh upload has no stored name yet; field pre_save may also swap the file
+    instance._thumbnail_source = source.name if source and source._committed else None
+
+
+def refresh_thumbnails_on_commit(sender, instance, update_fields=None, **kwargs):
+    if _thumbnail_source_skipped(sender, update_fields):
+        return
+    source = getattr(instance, spec_for(sender).field)
+    if (source.name or None) == getattr(instance, '_thumbnail_source', None) and (instance.thumbnail_hash or not source):
+        return
+    transaction.on_commit(lambda: refresh_thumbnails(instance))
+
+
+def remember_stored_image(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding:
+        instance._stored_image = None
+    elif not _thumbnail_source_skipped(sender, update_fields):
+        # An upload replaces the file in memory, so ask the row what it held
+        field = spec_for(sender).field
+        instance._stored_image = sender._base_manager.filter(pk=instance.pk).values_list(field, flat=True).first()
+
+
+def count_image_references(sender, instance, **kwargs):
+    if not hasattr(instance, '_stored_image'):
+        return
+    previous = instance.__dict__.pop('_stored_image') or ''
+    current = getattr(instance, spec_for(sender).field).name or ''
+    if current != previous:
+        with transaction.atomic():
+            MediaBlob.objects.retain(current)
+            MediaBlob.objects.release(previous)
+
+
+def release_image_reference(sender, instance, **kwargs):
+    MediaBlob.objects.release(getattr(instance, spec_for(sender).field).name or '')
+
+
+for model in IMAGE_SENDERS:
+    pre_save.connect(remember_thumbnail_source, sender=model, dispatch_uid=f'remember_thumbnail_source.{model.__name__}')
+    post_save.connect(refresh_thumbnails_on_commit, sender=model, dispatch_uid=f'refresh_thumbnails.{model.__name__}')
+    pre_save.connect(remember_stored_image, sender=model, dispatch_uid=f'remember_stored_image.{model.__name__}')
+    post_save.connect(count_image_references, sender=model, dispatch_uid=f'count_image_references.{model.__name__}')
+    post_delete.connect(release_image_reference, sender=model, dispatch_uid=f'release_image_reference.{model.__name__}')
+
+
+# ---------- Catalog page cache ----------
+# Connected after the thumbnail receivers, so the version moves on once the
+# new thumbnail hash is stored. Availability counters and bulk imports bypass
+# these signals and invalidate in BookQuerySet and CatalogImporter instead.
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def expire_book_card(sender, instance, **kwargs):
+    invalidate_book_card(instance)
+    transaction.on_commit(lambda: invalidate_book_card(instance))
+    transaction.on_commit(invalidate_catalog)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=BookAuthor)
+@receiver(post_delete, sender=BookAuthor)
+def expire_catalog_pages(sender, **kwargs):
+    transaction.on_commit(invalidate_catalog)
+
+
+# ---------- Email availability cache ----------
+def forget_user_email(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'email' in update_fields:
+        forget_email(instance.email)
+
+
+for model in (CustomUser, AuthorUser, MemberUser, AdminUser):
+    post_save.connect(forget_user_email, sender=model, dispatch_uid=f'forget_user_email.{model.__name__}')
+    post_delete.connect(forget_user_email, sender=model, dispatch_uid=f'forget_deleted_email.{model.__name__}')
+
+
+def setup_search_index(sender, **kwargs):
+    get_search_backend().setup()
+
+
+# ---------- Request metrics ----------
+@receiver(connection_created)
+def record_request_queries(sender, connection, **kwargs):
+    install_query_recorder(connection)
@@ -0,0 +1,116 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Count, DecimalField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from backend.models import (
+    Book, Category, CustomUser, Fine, FineStatus, Loan, Reservation, ReservationStatus, Role,
+)
+
+MEMBER_SUMMARY_KEY = 'member-summary:{}'
+ADMIN_STATS_KEY = 'admin-dashboard-stats'
+
+
+def per_member(queryset, aggregate, default):
+    """Correlated scalar subquery aggregating ``queryset`` for the outer member."""
+    subquery = Subquery(
+        queryset.filter(member=OuterRef('pk')).order_by().values('member').annotate(value=aggregate).values('value')
+    )
+    return Coalesce(subquery, default)
+
+
+def compute_member_summary(member_id):
+    """All dashboard figures for one member in a single query."""
+    summary = (
+        CustomUser.objects.filter(pk=member_id)
+        .annotate(
+            total_book_loans=per_member(Loan.objects.all(), Count('pk'), Value(0)),
+            total_fine=per_member(
+                Fine.objects.filter(status=FineStatus.PENDING),
+                Sum('fine_amount'),
+                Value(Decimal('0.00'), output_field=DecimalField(max_digits=8, decimal_places=2)),
+            ),
+            books_reserved=per_member(Reservation.objects.all(), Count('pk'), Value(0)),
+        )
+        .values('total_book_loans', 'total_fine', 'books_reserved')
+        .first()
+    )
+    return summary or {'total_book_loans': 0, 'total_fine': Decimal('0.00'), 'books_reserved': 0}
+
+
+def member_summary(member_id):
+    key = MEMBER_SUMMARY_KEY.format(member_id)
+    summary = cache.get(key)
+    if summary is None:
+        summary = compute_member_summary(member_id)
+        cache.set(key, summary, settings.MEMBER_SUMMARY_CACHE_TTL)
+    return summary
+
+
+def invalidate_member_summary(*member_ids):
+    cache.delete_many([MEMBER_SUMMARY_KEY.format(member_id) for member_id in member_ids])
+
+
+def totals(queryset, **aggregates):
+    """Lazy single-row aggregate over ``queryset`` (no GROUP BY)."""
+    return queryset.order_by().annotate(_all=Value(1)).values('_all').annotate(**aggregates).values(*aggregates)
+
+
+def fetch_totals(*querysets):
+    """
+    Evaluate several ``totals()`` querysets in one round trip by cross-joining
+    them as derived tables. Every part yields exactly one row, so the result is
+    one row holding all of their columns.
+    """
+    parts, params = [], []
+    for index, queryset in enumerate(querysets):
+        sql, part_params = queryset.query.sql_with_params()
+        parts.append(f'({sql}) AS part{index}')
+        params.extend(part_params)
+    with connections[querysets[0].db].cursor() as cursor:
+        cursor.execute('SELECT * FROM ' + ', '.join(parts), params)
+        columns = [column[0] for column in cursor.description]
+        return dict(zip(columns, cursor.fetchone()))
+
+
+def compute_admin_stats():
+    overdue_before = date.today() - timedelta(days=settings.LIBRARY_LOAN_PERIOD_DAYS)
+    row = fetch_totals(
+        totals(
+            CustomUser.objects.all(),
+            admins_count=Count('pk', filter=Q(role=Role.ADMIN)),
+            authors_count=Count('pk', filter=Q(role=Role.AUTHOR)),
+            members_count=Count('pk', filter=Q(role=Role.MEMBER)),
+        ),
+        totals(Category.objects.all(), category_count=Count('pk')),
+        totals(Book.objects.all(), books_count=Count('pk')),
+        totals(
+            Loan.objects.filter(returned_date__isnull=True),
+            open_loans_count=Count('pk'),
+            overdue_loans_count=Count('pk', filter=Q(loan_date__lt=overdue_before)),
+        ),
+        totals(Fine.objects.filter(status=FineStatus.PENDING), pending_fines_total=Sum('fine_amount')),
+        totals(
+            Reservation.objects.filter(reservation_status=ReservationStatus.PENDING),
+            pending_reservations_count=Count('pk'),
+        ),
+    )
+    # Raw cursor values skip the ORM converters; SUM is NULL on an empty table
+    row['pending_fines_total'] = Decimal(str(row['pending_fines_total'] or 0)).quantize(Decimal('0.01'))
+    return row
+
+
+def admin_stats():
+    stats = cache.get(ADMIN_STATS_KEY)
+    if stats is None:
+        stats = compute_admin_stats()
+        cache.set(ADMIN_STATS_KEY, stats, settings.ADMIN_STATS_CACHE_TTL)
+    return stats
+
+
+def invalidate_admin_stats():
+    cache.delete(ADMIN_STATS_KEY)
@@ -0,0 +1,79 @@
+import hashlib
+import os
+import re
+import uuid
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, storages
+from django.core.files.utils import validate_file_name
+
+# <upload_to>/<first two hex digits>/<sha256><ext>
+BLOB_RE = re.compile(r'(?:^|/)[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})(?:\.[a-z0-9]+)?$')
+
+
+def blob_digest(name):
+    """The content hash encoded in a blob name, or None for any other file (e.g. the default avatars)."""
+    match = BLOB_RE.search(name or '')
+    return match.group('digest') if match else None
+
+
+def blob_name(name, digest):
+    directory = os.path.dirname(name)
+    ext = os.path.splitext(name)[1].lower()
+    return os.path.join(directory, digest[:2], f'{digest}{ext}').replace('\\', '/')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores every file once under the SHA-256 of its content. The upload is
+    hashed while it is streamed to a temporary file in chunks; if a blob with
+    that hash already exists the copy is dropped, otherwise it is renamed into
+    place. Blobs are shared between rows, so they are never deleted when one
+    row lets go of them: MediaBlob keeps the reference counts and the
+    prune_media command removes blobs nobody references.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.generate_filename(name)
+        validate_file_name(name, allow_relative_path=True)
+
+        directory = os.path.dirname(self.path(name))
+        os.makedirs(directory, exist_ok=True)
+        temporary = os.path.join(directory, f'.upload-{uuid.uuid4().hex}')
+        digest = hashlib.sha256()
+        try:
+            # os.open honours the umask, like FileSystemStorage does
+            fd = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o666)
+            with os.fdopen(fd, 'wb') as target:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    target.write(chunk)
+
+            name = blob_name(name, digest.hexdigest())
+            if max_length is not None and len(name) > max_length:
+                raise ValueError(f'Blob name {name!r} is longer than {max_length} characters')
+            path = self.path(name)
+            if os.path.exists(path):
+                return name
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Atomic; a concurrent upload of the same content writes the same bytes
+            os.replace(temporary, path)
+            if self.file_permissions_mode is not None:
+                os.chmod(path, self.file_permissions_mode)
+            return name
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+
+def media_storage():
+    # Resolved lazily so STORAGES can be overridden (e.g. in tests) without touching the models
+    return storages['media']
@@ -0,0 +1,220 @@
+import random
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from django.contrib.auth.models import Group
+from django.db import transaction
+
+from backend.fines import FinePolicy
+from backend.models import (
+    Book, BookAuthor, Category, CustomUser, Fine, FinePayment, FinePaymentAllocation, FineStatus, Gender, Loan,
+    Reservation, ReservationStatus, Role,
+)
+from backend.search import get_search_backend
+
+WORDS = (
+    'river', 'shadow', 'garden', 'empire', 'silent', 'winter', 'glass', 'ocean', 'history', 'machine',
+    'crown', 'forest', 'letters', 'memory', 'stone', 'north', 'city', 'music', 'signal', 'harvest',
+    'atlas', 'bridge', 'candle', 'desert', 'engine', 'feather', 'harbor', 'island', 'lantern', 'mirror',
+)
+FIRST_NAMES = ('Asha', 'Ben', 'Chen', 'Dara', 'Elif', 'Farid', 'Gita', 'Hugo', 'Ines', 'Jon', 'Kavya', 'Leo')
+LAST_NAMES = ('Iyer', 'Khan', 'Lopez', 'Meyer', 'Nair', 'Okafor', 'Patel', 'Rossi', 'Sato', 'Singh', 'Weber')
+
+# How a reservation ended up; approved ones fall back to pending when no copy is free
+RESERVATION_STATUSES = (
+    ReservationStatus.FULFILLED, ReservationStatus.CANCELLED, ReservationStatus.PENDING, ReservationStatus.APPROVED,
+    ReservationStatus.REJECTED,
+)
+RESERVATION_WEIGHTS = (0.35, 0.25, 0.2, 0.1, 0.1)
+
+
+@dataclass(frozen=True)
+class LibraryScale:
+    categories: int
+    authors: int
+    members: int
+    books: int
+    loans: int
+    reservations: int
+
+    @classmethod
+    def for_rows(cls, rows):
+        """
+        Row counts adding up to roughly ``rows`` across all tables. Per book
+        there are about 2 loans, 1.2 author links, 0.5 reservations, 0.25
+        members, and a fine (plus payment and allocation when paid) for
+        loans kept too long.
+        """
+        books = max(rows // 6, 10)
+        return cls(
+            categories=max(books // 500, 5),
+            authors=max(books // 25, 2),
+            members=max(books // 4, 5),
+            books=books,
+            loans=books * 2,
+            reservations=books // 2,
+        )
+
+
+def generate_library(scale, seed=0, as_of=None, prefix='synthetic', batch_size=5000, progress=None):
+    """
+    Fill the library tables with synthetic rows using bulk inserts. The same
+    ``seed`` and ``as_of`` produce the same data. Signals are bypassed, so
+    the availability counters are left for rebuild_availability; the search
+    index is updated as books are added. Returns the rows created per model.
+    """
+    rng = random.Random(seed)
+    as_of = as_of or date.today()
+    policy = FinePolicy.from_settings()
+    counts = {}
+
+    def created(model, n):
+        counts[model.__name__] = counts.get(model.__name__, 0) + n
+        if progress:
+            progress(model.__name__, counts[model.__name__])
+
+    def batches(total):
+        for start in range(0, total, batch_size):
+            yield start, min(start + batch_size, total)
+
+    categories = Category.objects.bulk_create(
+        Category(name=f'{prefix} {WORDS[n % len(WORDS)]} {n}') for n in range(scale.categories)
+    )
+    created(Category, len(categories))
+    category_ids = [category.id for category in categories]
+
+    author_ids = create_users(rng, Role.AUTHOR, scale.authors, prefix, batch_size, created)
+    member_ids = create_users(rng, Role.MEMBER, scale.members, prefix, batch_size, created)
+
+    search = get_search_backend()
+    book_ids, free_copies = [], []
+    for start, end in batches(scale.books):
+        with transaction.atomic():
+            books = Book.objects.bulk_create(
+                Book(
+                    title=' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 4))).capitalize(),
+                    category_id=rng.choice(category_ids),
+                    publication_date=as_of - timedelta(days=rng.randint(0, 365 * 50)),
+                    copies_owned=rng.randint(1, 5),
+                )
+                for _ in range(start, end)
+            )
+            links = BookAuthor.objects.bulk_create(
+                BookAuthor(book=book, author_id=author_id)
+                for book in books
+                for author_id in rng.sample(author_ids, 2 if rng.random() < 0.2 and len(author_ids) > 1 else 1)
+            )
+            search.index_books([book.id for book in books])
+        book_ids.extend(book.id for book in books)
+        free_copies.extend(book.copies_owned for book in books)
+        created(Book, len(books))
+        created(BookAuthor, len(links))
+
+    for start, end in batches(scale.loans):
+        create_loans(rng, end - start, book_ids, free_copies, member_ids, as_of, policy, created)
+
+    pending = set()
+    for start, end in batches(scale.reservations):
+        reservations = []
+        for _ in range(start, end):
+            book = rng.randrange(len(book_ids))
+            member_id = rng.choice(member_ids)
+            status = rng.choices(RESERVATION_STATUSES, RESERVATION_WEIGHTS)[0]
+            if status == ReservationStatus.APPROVED:
+                if free_copies[book]:
+                    free_copies[book] -= 1
+                else:
+                    status = ReservationStatus.PENDING
+            if status == ReservationStatus.PENDING:
+                # At most one pending reservation per member and book
+                if (member_id, book) in pending:
+                    status = ReservationStatus.CANCELLED
+                else:
+                    pending.add((member_id, book))
+            reservations.append(Reservation(
+                book_id=book_ids[book],
+                member_id=member_id,
+                reservation_date=as_of - timedelta(days=rng.randint(0, 365)),
+                reservation_status=status,
+            ))
+        Reservation.objects.bulk_create(reservations)
+        created(Reservation, len(reservations))
+    return counts
+
+
+def create_users(rng, role, total, prefix, batch_size, created):
+    group, _ = Group.objects.get_or_create(name=role)
+    memberships = CustomUser.groups.through
+    ids = []
+    for start in range(0, total, batch_size):
+        with transaction.atomic():
+            users = CustomUser.objects.bulk_create(
+                CustomUser(
+                    email=f'{prefix}-{role.lower()}-{n}@example.com',
+                    first_name=rng.choice(FIRST_NAMES),
+                    last_name=rng.choice(LAST_NAMES),
+                    gender=rng.choice(Gender.values),
+                    role=role,
+                    password='!',
+                )
+                for n in range(start, min(start + batch_size, total))
+            )
+            memberships.objects.bulk_create(memberships(customuser_id=user.id, group_id=group.id) for user in users)
+        ids.extend(user.id for user in users)
+        created(CustomUser, len(users))
+    return ids
+
+
+def create_loans(rng, total, book_ids, free_copies, member_ids, as_of, policy, created):
+    loans = []
+    for _ in range(total):
+        book = rng.randrange(len(book_ids))
+        loan_date = as_of - timedelta(days=rng.randint(0, 730))
+        # Most loans come back within the loan period
+        kept = rng.randint(1, policy.loan_period_days) if rng.random() < 0.8 else rng.randint(1, 45)
+        returned_date = min(loan_date + timedelta(days=kept), as_of)
+        # Recent loans are often still out, while a copy is free
+        if (as_of - loan_date).days < 45 and rng.random() < 0.5 and free_copies[book]:
+            free_copies[book] -= 1
+            returned_date = None
+        loans.append(Loan(
+            book_id=book_ids[book], member_id=rng.choice(member_ids), loan_date=loan_date,
+            returned_date=returned_date,
+        ))
+
+    with transaction.atomic():
+        Loan.objects.bulk_create(loans)
+        fines = []
+        for loan in loans:
+            # The fine accrue_fines would have charged
+            days = policy.overdue_days(loan.loan_date, loan.returned_date, as_of)
+            if not days:
+                continue
+            paid = loan.returned_date is not None and rng.random() < 0.7
+            fines.append(Fine(
+                member_id=loan.member_id,
+                loan=loan,
+                fine_date=min(loan.returned_date or as_of, as_of),
+                fine_amount=policy.amount(days),
+                status=FineStatus.APPROVED if paid else FineStatus.PENDING,
+                accrued=True,
+            ))
+        Fine.objects.bulk_create(fines)
+
+        paid = [fine for fine in fines if fine.status == FineStatus.APPROVED]
+        payments = FinePayment.objects.bulk_create(
+            FinePayment(
+                member_id=fine.member_id,
+                payment_date=min(fine.fine_date + timedelta(days=rng.randint(0, 10)), as_of),
+                payment_amount=fine.fine_amount,
+            )
+            for fine in paid
+        )
+        allocations = FinePaymentAllocation.objects.bulk_create(
+            FinePaymentAllocation(payment=payment, fine=fine, amount=fine.fine_amount)
+            for payment, fine in zip(payments, paid)
+        )
+    created(Loan, len(loans))
+    created(Fine, len(fines))
+    created(FinePayment, len(payments))
+    created(FinePaymentAllocation, len(allocations))
@@ -0,0 +1,81 @@
+import fnmatch
+import logging
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.template.utils import get_app_template_dirs
+
+from backend.metrics import TEMPLATE_RENDER_TIME, current_request
+
+logger = logging.getLogger(__name__)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = current_request.get()
+        if stats is None:
+            return super().render(context, request)
+        # Only the outermost render is timed; render_to_string inside a tag is part of it
+        stats.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_depth -= 1
+            if not stats.template_depth:
+                elapsed = time.perf_counter() - started
+                stats.template_time += elapsed
+                TEMPLATE_RENDER_TIME.observe(elapsed, self.template.origin.template_name or '<string>')
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template engine, timing renders for the request metrics."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+def template_names(engine):
+    """Names of the templates in every directory the engine's loaders search."""
+    names = set()
+    for directory in [*engine.dirs, *get_app_template_dirs('templates')]:
+        root = Path(directory)
+        names.update(path.relative_to(root).as_posix() for path in root.rglob('*') if path.is_file())
+    return sorted(names)
+
+
+def warm_templates(patterns=None):
+    """
+    Compile the templates matching ``patterns`` (settings.TEMPLATE_WARMUP) so
+    that the cached loaders already hold them when the first request arrives.
+    Returns how many were compiled.
+    """
+    patterns = settings.TEMPLATE_WARMUP if patterns is None else patterns
+    if not patterns:
+        return 0
+    started = time.perf_counter()
+    compiled = 0
+    for backend in engines.all():
+        if not isinstance(backend, DjangoTemplates):
+            continue
+        for name in template_names(backend.engine):
+            if not any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+                continue
+            try:
+                backend.engine.get_template(name)
+            except (TemplateSyntaxError, TemplateDoesNotExist) as exc:
+                # Partials of other apps may need libraries that are not installed
+                logger.warning('Template %s not warmed: %s', name, exc)
+                continue
+            compiled += 1
+    logger.info('Warmed %d templates in %.0f ms', compiled, (time.perf_counter() - started) * 1000)
+    return compiled
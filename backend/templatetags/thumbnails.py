@@ -0,0 +1,15 @@
+from django import template
+
+from backend import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def thumbnail_url(obj, width, ext='jpg'):
+    return thumbnails.thumbnail_url(obj, width, ext)
+
+
+@register.simple_tag
+def thumbnail_srcset(obj, ext='jpg'):
+    return thumbnails.thumbnail_srcset(obj, ext)
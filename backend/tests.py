@@ -1,3 +1,566 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import io
+import json
+import re
+import tempfile
+from io import StringIO
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import skipUnless
 
-# Create your tests here.
+import razorpay
+import requests
+from PIL import Image
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.db.models.functions import Lower
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from backend.models import (
+    AuthorUser, Book, BookAuthor, Category, CustomUser, Fine, FineOrderItem, FinePayment, FinePaymentAllocation,
+    FineStatus, JobCheckpoint, Loan, MemberUser, PaymentEvent, Reservation, ReservationStatus, Role,
+)
+from backend import circulation
+from backend.fines import FinePolicy, accrue_range
+from backend.importers import CatalogImporter, read_rows
+from backend.payments import (
+    CircuitBreaker, CircuitOpenError, GatewayError, PaymentGateway, PaymentRejected, get_gateway, reusable_order,
+    store_order,
+)
+from backend.settlement import process_pending_events, settle_payment
+from backend.thumbnails import thumbnail_name, thumbnail_url
+from backend.stats import MEMBER_SUMMARY_KEY, admin_stats, member_summary
+from backend.search import get_search_backend
+from config.database import search_backend
+
+# "SCAN <table>" is a full table scan; "SCAN <table> USING [COVERING] INDEX"
+# is an index walk. A temp B-tree means rows are sorted after fetching them.
+FULL_SCAN_RE = re.compile(r'\bSCAN (?!.*\bUSING\b.*\bINDEX\b)')
+TEMP_BTREE_RE = re.compile(r'\bUSE TEMP B-TREE\b')
+
+
+def key_queries():
+    """The hot filters used by the views, admin and batch jobs."""
+    today = date.today()
+    return {
+        'open loans per book': Loan.objects.filter(book_id=1, returned_date__isnull=True).values('id'),
+        'loans per member': Loan.objects.filter(member_id=1).order_by('-loan_date'),
+        'overdue loans': Loan.objects.filter(returned_date__isnull=True, loan_date__lt=today - timedelta(days=14)),
+        'loans by loan date': Loan.objects.filter(loan_date__gte=today - timedelta(days=30)),
+        'loans by returned date': Loan.objects.filter(returned_date__gte=today - timedelta(days=30)),
+        'pending fines per member': Fine.objects.filter(member_id=1, status=FineStatus.PENDING)
+        .values('member').annotate(total=Sum('fine_amount')),
+        'fines per member': Fine.objects.filter(member_id=1).order_by('-fine_date'),
+        'fines by date': Fine.objects.filter(fine_date__gte=today - timedelta(days=30)),
+        'fines by payment order': Fine.objects.filter(razorpay_order_id='order_1'),
+        'fines per order': FineOrderItem.objects.filter(razorpay_order_id='order_1').values('fine_id', 'amount'),
+        'orders per fine': FineOrderItem.objects.filter(fine_id=1),
+        'allocations per fine': FinePaymentAllocation.objects.filter(fine_id=1),
+        'allocations per payment': FinePaymentAllocation.objects.filter(payment_id=1),
+        'payments per member': FinePayment.objects.filter(member_id=1).order_by('-payment_date'),
+        'payments by date': FinePayment.objects.filter(payment_date__gte=today - timedelta(days=365)),
+        'waitlist per book': Reservation.objects.filter(book_id=1, reservation_status=ReservationStatus.PENDING)
+        .order_by('reservation_date', 'id'),
+        'reservations per member': Reservation.objects.filter(member_id=1).order_by('-reservation_date'),
+        'reservations by status': Reservation.objects.filter(reservation_status=ReservationStatus.PENDING),
+        'email availability': CustomUser.objects.alias(email_lower=Lower('email'))
+        .filter(email_lower='member@example.com').values('id')[:1],
+    }
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN is SQLite syntax')
+class QueryPlanTests(TestCase):
+    """The key queries must be answered from an index, in index order."""
+
+    def test_key_queries_use_indexes(self):
+        for name, queryset in key_queries().items():
+            with self.subTest(name):
+                plan = queryset.explain()
+                self.assertNotRegex(plan, FULL_SCAN_RE, f'{name} scans the whole table')
+                self.assertNotRegex(plan, TEMP_BTREE_RE, f'{name} sorts in a temp B-tree')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'The FTS5 index needs SQLite')
+class SearchIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(
+            email='author@example.com', password=None, first_name='Ada', last_name='Quill', role=Role.AUTHOR,
+        )
+        category = Category.objects.create(name='Poetry')
+        cls.book = Book.objects.create(title='Tides', category=category, publication_date=date(2020, 1, 1),
+                                       copies_owned=1)
+        BookAuthor.objects.create(book=cls.book, author=cls.author)
+
+    def setUp(self):
+        get_search_backend().rebuild()
+
+    def test_author_edit_through_proxy_admin_reindexes(self):
+        author = AuthorUser.objects.get(pk=self.author.pk)
+        author.last_name = 'Marlowe'
+        with self.captureOnCommitCallbacks(execute=True):
+            author.save()
+        self.assertEqual(get_search_backend().search('Marlowe', limit=10), [self.book.id])
+
+    def test_admin_search_keeps_the_ranking(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            # Created first, so the changelist's default -id order would list it last
+            sea = Book.objects.create(title='Sea', category=self.book.category, publication_date=date(2020, 1, 1),
+                                      copies_owned=1)
+            voyage = Book.objects.create(title='The long voyage across the wide grey winter sea',
+                                         category=self.book.category, publication_date=date(2020, 1, 1), copies_owned=1)
+        self.assertEqual(get_search_backend().search('sea', limit=10), [sea.id, voyage.id])
+
+        self.client.force_login(CustomUser.objects.create_superuser(email='admin@example.com', password=None))
+        response = self.client.get(reverse('admin:backend_book_changelist'), {'q': 'sea'})
+        self.assertEqual(list(response.context['cl'].result_list), [sea, voyage])
+        response = self.client.get(reverse('admin:backend_book_changelist'), {'q': 'sea', 'o': '-1'})  # title, descending
+        self.assertEqual(list(response.context['cl'].result_list), [voyage, sea])
+        response = self.client.get(reverse('admin:backend_book_changelist'), {'q': 'nothing-matches'})
+        self.assertEqual(list(response.context['cl'].result_list), [])
+
+    def test_setup_fills_an_empty_index(self):
+        backend = get_search_backend()
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {backend.table}')
+        self.assertEqual(backend.search('Tides', limit=10), [])
+        backend.setup()
+        self.assertEqual(backend.search('Tides', limit=10), [self.book.id])
+
+
+class SearchBackendSettingTests(SimpleTestCase):
+
+    def test_follows_the_database_engine(self):
+        self.assertEqual(search_backend({'ENGINE': 'django.db.backends.sqlite3'}, {}),
+                         'backend.search.SQLiteFTS5SearchBackend')
+        self.assertEqual(search_backend({'ENGINE': 'django.db.backends.postgresql'}, {}),
+                         'backend.search.DatabaseSearchBackend')
+        self.assertEqual(
+            search_backend({'ENGINE': 'django.db.backends.sqlite3'},
+                           {'CATALOG_SEARCH_BACKEND': 'backend.search.DatabaseSearchBackend'}),
+            'backend.search.DatabaseSearchBackend',
+        )
+
+
+class RebuildAvailabilityTests(TestCase):
+
+    def test_recount_promotes_the_waitlist(self):
+        member = CustomUser.objects.create_user(email='m@example.com', password=None, role=Role.MEMBER)
+        category = Category.objects.create(name='Fiction')
+        book = Book.objects.create(title='Dune', category=category, publication_date=date(2020, 1, 1), copies_owned=2)
+        # Counters left at 0 by rows written before they existed
+        Book.objects.filter(pk=book.pk).update(copies_available=0)
+        first = Reservation.objects.create(book=book, member=member, reservation_date=date(2024, 1, 1))
+        other = CustomUser.objects.create_user(email='o@example.com', password=None, role=Role.MEMBER)
+        second = Reservation.objects.create(book=book, member=other, reservation_date=date(2024, 1, 2))
+
+        call_command('rebuild_availability', stdout=StringIO())
+
+        book.refresh_from_db()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual([first.reservation_status, second.reservation_status], [ReservationStatus.APPROVED] * 2)
+        self.assertEqual((book.copies_reserved, book.copies_available), (2, 0))
+
+
+class AdminUserAdminTests(TestCase):
+
+    def test_lists_admins_and_users_without_a_role_once(self):
+        admin_user = CustomUser.objects.create_superuser(email='admin@example.com', password=None)
+        admin_user.groups.add(Group.objects.create(name=Role.ADMIN), Group.objects.create(name='Staff'))
+        bootstrap = CustomUser.objects.create_superuser(email='bootstrap@example.com', password=None)
+        CustomUser.objects.create_user(email='member@example.com', password=None, role=Role.MEMBER)
+        self.client.force_login(admin_user)
+        response = self.client.get(reverse('admin:backend_adminuser_changelist'))
+        self.assertCountEqual(response.context['cl'].queryset, [admin_user, bootstrap])
+
+
+class CirculationTests(TestCase):
+    """The invariants loadtest_reservations checks under concurrency, request by request."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Fiction')
+        cls.book = Book.objects.create(title='Emma', category=category, publication_date=date(2020, 1, 1),
+                                       copies_owned=2)
+        cls.members = [
+            CustomUser.objects.create_user(email=f'member{n}@example.com', password=None, role=Role.MEMBER)
+            for n in range(4)
+        ]
+
+    def assert_counters_match(self):
+        self.book.refresh_from_db()
+        reservations = Reservation.objects.filter(book=self.book)
+        approved = reservations.filter(reservation_status=ReservationStatus.APPROVED).count()
+        on_loan = Loan.objects.filter(book=self.book, returned_date__isnull=True).count()
+        self.assertEqual((self.book.copies_reserved, self.book.copies_on_loan), (approved, on_loan))
+        self.assertEqual(self.book.copies_available, self.book.copies_owned - approved - on_loan)
+        self.assertGreaterEqual(self.book.copies_available, 0)
+
+    def test_no_overbooking_or_duplicates(self):
+        for member in self.members:
+            circulation.reserve_book(member, self.book.id)
+            # A repeated request returns the existing reservation
+            reservation, created = circulation.reserve_book(member, self.book.id)
+            self.assertFalse(created)
+        statuses = list(Reservation.objects.filter(book=self.book).order_by('id')
+                        .values_list('reservation_status', flat=True))
+        self.assertEqual(statuses, [ReservationStatus.APPROVED] * 2 + [ReservationStatus.PENDING] * 2)
+        self.assert_counters_match()
+
+    def test_freed_copies_go_to_the_waitlist(self):
+        first, *_ = [circulation.reserve_book(member, self.book.id)[0] for member in self.members[:3]]
+        circulation.cancel_reservation(first)
+        waiting = Reservation.objects.get(book=self.book, member=self.members[2])
+        self.assertEqual(waiting.reservation_status, ReservationStatus.APPROVED)
+        self.assert_counters_match()
+
+        loan = circulation.checkout(self.members[1], self.book.id)
+        with self.assertRaises(circulation.BookUnavailable):
+            circulation.checkout(self.members[3], self.book.id)
+        circulation.return_loan(loan)
+        self.assert_counters_match()
+        self.assertEqual(self.book.copies_available, 1)
+
+
+class SettlementTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = CustomUser.objects.create_user(email='m@example.com', password=None, role=Role.MEMBER)
+        category = Category.objects.create(name='Fiction')
+        book = Book.objects.create(title='Emma', category=category, publication_date=date(2020, 1, 1), copies_owned=2)
+        cls.fines = [
+            Fine.objects.create(
+                member=cls.member, loan=Loan.objects.create(book=book, member=cls.member, loan_date=date(2024, 1, 1)),
+                fine_date=date(2024, 2, 1), fine_amount=amount,
+            )
+            for amount in (Decimal('10.00'), Decimal('5.00'))
+        ]
+
+    def test_superseded_order_still_settles(self):
+        # Pay one fine, then "Pay all" moves it to a new order before the first payment lands
+        store_order(self.fines[:1], 'order_one')
+        store_order(self.fines, 'order_all')
+
+        settlement = settle_payment('pay_one', 'order_one', 1000)
+        self.assertTrue(settlement.created)
+        first = settlement.payment
+        self.assertEqual(first.refund_due, 0)
+        self.assertEqual(list(first.allocations.values_list('fine_id', 'amount')), [(self.fines[0].pk, Decimal('10.00'))])
+
+        # The newer order covered the fine paid above as well; its share is owed back
+        settlement = settle_payment('pay_all', 'order_all', 1500)
+        self.assertTrue(settlement.created)
+        second = settlement.payment
+        self.assertEqual(second.refund_due, Decimal('10.00'))
+        self.assertEqual(list(second.allocations.values_list('fine_id', flat=True)), [self.fines[1].pk])
+        self.assertEqual(Fine.objects.filter(status=FineStatus.PENDING).count(), 0)
+
+        self.assertFalse(settle_payment('pay_one', 'order_one', 1000).created)
+
+    def test_order_goes_stale_when_an_amount_changes(self):
+        store_order(self.fines, 'order_all')
+        fines = list(Fine.objects.order_by('pk'))
+        self.assertEqual(reusable_order(fines), 'order_all')
+        self.assertIsNone(reusable_order(fines[:1]))
+        fines[1].fine_amount = Decimal('7.50')
+        self.assertIsNone(reusable_order(fines))
+
+    def test_settling_twice_records_one_payment(self):
+        store_order(self.fines, 'order_all')
+        first = settle_payment('pay_all', 'order_all', 1500)
+        again = settle_payment('pay_all', 'order_all', 1500)
+        self.assertEqual((first.created, again.created), (True, False))
+        self.assertEqual(again.payment, first.payment)
+        self.assertEqual(FinePayment.objects.count(), 1)
+        self.assertEqual(FinePaymentAllocation.objects.count(), 2)
+
+    def test_fine_paid_on_another_order_is_owed_back(self):
+        store_order(self.fines[:1], 'order_one')
+        # accrue_fines re-prices the fine, so the next click needs a new order
+        Fine.objects.filter(pk=self.fines[0].pk).update(fine_amount=Decimal('12.00'))
+        store_order([Fine.objects.get(pk=self.fines[0].pk)], 'order_again')
+        settle_payment('pay_one', 'order_one', 1000)
+
+        payment = settle_payment('pay_again', 'order_again', 1200).payment
+        self.assertEqual(payment.refund_due, Decimal('12.00'))
+        self.assertFalse(payment.allocations.exists())
+
+
+class FineAccrualTests(TestCase):
+
+    policy = FinePolicy(loan_period_days=14, rate_per_day=Decimal('5.00'))
+    as_of = date(2024, 3, 1)
+
+    @classmethod
+    def setUpTestData(cls):
+        member = CustomUser.objects.create_user(email='m@example.com', password=None, role=Role.MEMBER)
+        category = Category.objects.create(name='Fiction')
+        book = Book.objects.create(title='Emma', category=category, publication_date=date(2020, 1, 1), copies_owned=3)
+        # Due on 2024-01-15, 2024-01-16 and 2024-01-17
+        cls.loans = [
+            Loan.objects.create(book=book, member=member, loan_date=date(2024, 1, day)) for day in (1, 2, 3)
+        ]
+
+    def accrue(self, as_of=None):
+        return accrue_range(0, self.loans[-1].id, as_of or self.as_of, self.policy)
+
+    def test_rerun_changes_nothing(self):
+        self.assertEqual(self.accrue(), (3, 3, 0))
+        fines = list(Fine.objects.order_by('loan_id').values_list('loan_id', 'fine_amount', 'fine_date'))
+        self.assertEqual(fines[0], (self.loans[0].id, Decimal('230.00'), self.as_of))
+        self.assertEqual(self.accrue(), (3, 0, 0))
+        self.assertEqual(list(Fine.objects.order_by('loan_id').values_list('loan_id', 'fine_amount', 'fine_date')),
+                         fines)
+
+    def test_paid_fines_are_left_alone(self):
+        self.accrue()
+        paid = Fine.objects.get(loan=self.loans[0])
+        Fine.objects.filter(pk=paid.pk).update(status=FineStatus.APPROVED)
+        self.assertEqual(self.accrue(self.as_of + timedelta(days=1)), (3, 0, 2))
+        paid.refresh_from_db()
+        self.assertEqual((paid.fine_amount, paid.fine_date), (Decimal('230.00'), self.as_of))
+
+    def test_resumes_from_checkpoint(self):
+        JobCheckpoint.objects.create(name=f'accrue_fines:{self.as_of}', position=self.loans[0].id)
+        stdout = StringIO()
+        call_command('accrue_fines', as_of=self.as_of, chunk_size=1, stdout=stdout)
+        self.assertIn(f'Resuming after loan id {self.loans[0].id}', stdout.getvalue())
+        self.assertEqual(list(Fine.objects.order_by('loan_id').values_list('loan_id', flat=True)),
+                         [loan.id for loan in self.loans[1:]])
+        self.assertEqual(JobCheckpoint.objects.get(name=f'accrue_fines:{self.as_of}').position, self.loans[-1].id)
+
+
+class AdminStatsTests(TestCase):
+
+    def test_deleting_through_a_proxy_model_expires_the_totals(self):
+        member = CustomUser.objects.create_user(email='m@example.com', password=None, role=Role.MEMBER)
+        cache.clear()
+        self.assertEqual(admin_stats()['members_count'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            MemberUser.objects.get(pk=member.pk).delete()
+        self.assertEqual(admin_stats()['members_count'], 0)
+
+
+class CatalogImportTests(TestCase):
+
+    def test_import_matches_authors_ignoring_case(self):
+        existing = CustomUser.objects.create_user(email='Ann.Carson@Example.com', password=None, role=Role.AUTHOR)
+        rows = StringIO(
+            'title,category,publication_date,copies_owned,authors\n'
+            'Float,Poetry,2016-10-01,2,Ann Carson <ann.carson@example.com>\n'
+            ',Poetry,2016-10-01,1,\n'
+            'Bluets,Essays,2009-09-01,1,Maggie Nelson <maggie@example.com>; ANN.CARSON@example.com\n'
+        )
+        report = CatalogImporter(batch_size=2).run(read_rows(rows))
+
+        self.assertEqual((report.imported, report.skipped), (2, 1))
+        self.assertEqual(report.errors, [(3, 'title is required')])
+        self.assertEqual(CustomUser.objects.count(), 2)
+        new = CustomUser.objects.get(email='maggie@example.com')
+        self.assertEqual((new.first_name, new.last_name, new.role), ('Maggie', 'Nelson', Role.AUTHOR))
+        self.assertEqual(
+            sorted(BookAuthor.objects.values_list('book__title', 'author_id')),
+            [('Bluets', existing.pk), ('Bluets', new.pk), ('Float', existing.pk)],
+        )
+        book = Book.objects.get(title='Float')
+        self.assertEqual((book.category.name, book.copies_available), ('Poetry', 2))
+
+
+@override_settings(RAZORPAY_KEY_ID='rzp_test', RAZORPAY_KEY_SECRET='secret', RAZORPAY_WEBHOOK_SECRET='whsec')
+class PaymentWebhookTests(TestCase):
+
+    def setUp(self):
+        get_gateway.cache_clear()
+        self.addCleanup(get_gateway.cache_clear)
+
+    def deliver(self, payload, event_id='evt_1', secret='whsec'):
+        body = json.dumps(payload).encode()
+        signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        return self.client.post(
+            reverse('razorpay_webhook'), body, content_type='application/json',
+            headers={'X-Razorpay-Signature': signature, 'X-Razorpay-Event-Id': event_id},
+        )
+
+    def captured(self, order_id='order_missing'):
+        return {'event': 'payment.captured', 'payload': {'payment': {'entity': {
+            'id': 'pay_1', 'order_id': order_id, 'amount': 1000, 'created_at': 1704067200,
+        }}}}
+
+    def test_bad_signature_is_rejected(self):
+        response = self.deliver(self.captured(), secret='forged')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PaymentEvent.objects.exists())
+
+    def test_redelivery_is_a_duplicate(self):
+        self.assertEqual(self.deliver(self.captured()).json(), {'status': 'queued'})
+        self.assertEqual(self.deliver(self.captured()).json(), {'status': 'duplicate'})
+        self.assertEqual(PaymentEvent.objects.count(), 1)
+
+    def test_failed_event_stays_queued(self):
+        self.deliver(self.captured())
+        event = PaymentEvent.objects.get()
+        self.assertEqual(process_pending_events(), (0, 1, event.id))
+        event.refresh_from_db()
+        self.assertEqual(event.attempts, 1)
+        self.assertIsNone(event.processed_at)
+        self.assertIn('SettlementError', event.last_error)
+        self.assertEqual(list(PaymentEvent.objects.pending()), [event])
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class GatewayCallTests(SimpleTestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(threshold=2, reset_after=30, clock=self.clock)
+        self.gateway = PaymentGateway('rzp_test', 'secret', retries=2, backoff=0, breaker=self.breaker)
+        self.calls = 0
+
+    def failing(self, **kwargs):
+        self.calls += 1
+        raise requests.ConnectionError('refused')
+
+    def succeeding(self, **kwargs):
+        self.calls += 1
+        return {'id': 'order_1'}
+
+    def test_retries_then_gives_up(self):
+        with self.assertRaises(GatewayError):
+            self.gateway.call(self.failing)
+        self.assertEqual(self.calls, 3)
+        self.assertEqual((self.breaker.failures, self.breaker.state), (1, 'closed'))
+
+    def test_client_errors_are_rejected_without_retrying(self):
+        def rejecting(**kwargs):
+            self.calls += 1
+            raise razorpay.errors.BadRequestError('amount too small')
+
+        with self.assertRaises(PaymentRejected):
+            self.gateway.call(rejecting)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_circuit_opens_half_opens_and_closes(self):
+        for _ in range(2):
+            with self.assertRaises(GatewayError):
+                self.gateway.call(self.failing)
+        self.assertEqual(self.breaker.state, 'open')
+        self.calls = 0
+        with self.assertRaises(CircuitOpenError):
+            self.gateway.call(self.succeeding)
+        self.assertEqual(self.calls, 0)
+
+        self.clock.now = 30
+        self.assertEqual(self.breaker.state, 'half-open')
+        # A failed trial call opens the circuit for another period
+        with self.assertRaises(GatewayError):
+            self.gateway.call(self.failing)
+        self.assertEqual(self.breaker.state, 'open')
+
+        self.clock.now = 60
+        self.assertEqual(self.gateway.call(self.succeeding), {'id': 'order_1'})
+        self.assertEqual((self.breaker.state, self.breaker.failures), ('closed', 0))
+
+    def test_one_trial_call_at_a_time(self):
+        self.breaker.opened_at = 0
+        self.clock.now = 30
+        self.breaker.before_call()
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+
+
+class MemberSummaryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = CustomUser.objects.create_user(email='m@example.com', password=None, role=Role.MEMBER)
+        category = Category.objects.create(name='Fiction')
+        cls.book = Book.objects.create(title='Emma', category=category, publication_date=date(2020, 1, 1),
+                                       copies_owned=3)
+
+    def setUp(self):
+        cache.clear()
+
+    def assert_expired(self):
+        self.assertIsNone(cache.get(MEMBER_SUMMARY_KEY.format(self.member.pk)))
+
+    def test_one_query_then_cached(self):
+        Loan.objects.create(book=self.book, member=self.member, loan_date=date(2024, 1, 1))
+        Reservation.objects.create(book=self.book, member=self.member, reservation_date=date(2024, 1, 1))
+        with self.assertNumQueries(1):
+            summary = member_summary(self.member.pk)
+        self.assertEqual(summary, {'total_book_loans': 1, 'total_fine': Decimal('0.00'), 'books_reserved': 1})
+        with self.assertNumQueries(0):
+            member_summary(self.member.pk)
+
+    def test_expired_by_loan_fine_and_payment_changes(self):
+        member_summary(self.member.pk)
+        loan = Loan.objects.create(book=self.book, member=self.member, loan_date=date(2024, 1, 1))
+        self.assert_expired()
+
+        member_summary(self.member.pk)
+        fine = Fine.objects.create(member=self.member, loan=loan, fine_date=date(2024, 2, 1),
+                                   fine_amount=Decimal('10.00'))
+        self.assertEqual(member_summary(self.member.pk)['total_fine'], Decimal('10.00'))
+
+        payment = FinePayment.objects.create(member=self.member, payment_date=date(2024, 2, 2),
+                                             payment_amount=Decimal('10.00'))
+        self.assert_expired()
+        member_summary(self.member.pk)
+        payment.delete()
+        self.assert_expired()
+
+        member_summary(self.member.pk)
+        fine.delete()
+        self.assertEqual(member_summary(self.member.pk)['total_fine'], Decimal('0.00'))
+
+
+class ThumbnailTests(TestCase):
+
+    def setUp(self):
+        media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def test_upload_gets_thumbnails(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (400, 600), 'teal').save(buffer, 'PNG')
+        upload = buffer.getvalue()
+        book = Book(title='Emma', category=Category.objects.create(name='Fiction'),
+                    publication_date=date(2020, 1, 1), copies_owned=1,
+                    cover_image=SimpleUploadedFile('emma.png', upload))
+        with self.captureOnCommitCallbacks(execute=True):
+            book.save()
+
+        book.refresh_from_db()
+        self.assertEqual(book.thumbnail_hash, hashlib.sha256(upload).hexdigest())
+        for width in (160, 640):
+            for ext in ('webp', 'jpg'):
+                self.assertTrue(default_storage.exists(thumbnail_name(book.thumbnail_hash, width, ext)))
+        with default_storage.open(thumbnail_name(book.thumbnail_hash, 160, 'jpg')) as thumbnail:
+            self.assertEqual(Image.open(thumbnail).size, (160, 240))
+        self.assertEqual(thumbnail_url(book, 300), reverse('thumbnail', args=[book.thumbnail_hash, 320, 'jpg']))
+
+    def test_default_avatar_is_skipped(self):
+        with self.assertNoLogs('backend.thumbnails', 'WARNING'):
+            with self.captureOnCommitCallbacks(execute=True):
+                user = CustomUser.objects.create_user(email='m@example.com', password=None)
+        user.refresh_from_db()
+        self.assertEqual((user.image.name, user.thumbnail_hash), ('profile/male_avatar.png', ''))
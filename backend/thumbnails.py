@@ -0,0 +1,149 @@
+import hashlib
+import io
+import logging
+import re
+from dataclasses import dataclass
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from backend.storage import blob_digest, media_storage
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_ROOT = 'thumbnails'
+
+# Every size is written once per format; browsers that accept WebP get the
+# smaller file through <picture>/srcset and the rest fall back to JPEG.
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80}),
+    'jpg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class ThumbnailError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class ThumbnailSpec:
+    field: str
+    widths: tuple
+    square: bool = False  # crop to a square (avatars) instead of keeping the aspect ratio
+
+
+# Keyed by the concrete model name so the proxy user models share the spec
+SPECS = {
+    'book': ThumbnailSpec('cover_image', (160, 320, 480, 640)),
+    'customuser': ThumbnailSpec('image', (64, 128), square=True),
+}
+
+
+def spec_for(model):
+    return SPECS.get(model._meta.concrete_model._meta.model_name)
+
+
+def content_hash(name, storage, chunk_size=64 * 1024):
+    # Content-addressed uploads carry their hash in the name
+    if blob_digest(name):
+        return blob_digest(name)
+    digest = hashlib.sha256()
+    with storage.open(name, 'rb') as source:
+        for chunk in iter(lambda: source.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def thumbnail_name(digest, width, ext):
+    return f'{THUMBNAIL_ROOT}/{digest[:2]}/{digest}/{width}.{ext}'
+
+
+def generate_thumbnails(name, spec, storage=default_storage, force=False, source_storage=None):
+    """
+    Write every size and format of ``name`` under its content hash and return
+    the hash. Identical files share one set of thumbnails, so a source that
+    has been seen before costs a hash and a few exists() checks.
+    """
+    source_storage = source_storage or media_storage()
+    try:
+        digest = content_hash(name, source_storage)
+        targets = [thumbnail_name(digest, width, ext) for width in spec.widths for ext in FORMATS]
+        if not force and all(storage.exists(target) for target in targets):
+            return digest
+
+        with source_storage.open(name, 'rb') as source:
+            image = Image.open(source)
+            # Let the JPEG decoder scale down by up to 8x instead of decoding every pixel
+            largest = max(spec.widths)
+            image.draft('RGB', (largest, largest) if spec.square else (largest, largest * 4))
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as exc:
+        raise ThumbnailError(f'{name}: {exc}') from exc
+
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        # JPEG has no alpha channel; flatten onto white like the page background
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    else:
+        image = image.convert('RGB')
+
+    # Largest first, each size resampled from the previous one
+    for width in sorted(spec.widths, reverse=True):
+        if spec.square:
+            image = ImageOps.fit(image, (width, width), Image.LANCZOS)
+        else:
+            image.thumbnail((width, width * 4), Image.LANCZOS)  # never upscales
+        for ext, (fmt, _, options) in FORMATS.items():
+            target = thumbnail_name(digest, width, ext)
+            if storage.exists(target):
+                if not force:
+                    continue
+                storage.delete(target)
+            buffer = io.BytesIO()
+            image.save(buffer, fmt, **options)
+            storage.save(target, ContentFile(buffer.getvalue()))
+    return digest
+
+
+def refresh_thumbnails(instance):
+    """Regenerate thumbnails for a saved Book or CustomUser's upload and store the hash on its row."""
+    spec = spec_for(type(instance))
+    source = getattr(instance, spec.field)
+    digest = ''
+    # Only uploads; shared files such as the default avatars are not content-addressed
+    if source and blob_digest(source.name):
+        try:
+            digest = generate_thumbnails(source.name, spec)
+        except ThumbnailError as exc:
+            logger.warning('Could not generate thumbnails for %r: %s', instance, exc)
+    if digest != instance.thumbnail_hash:
+        instance.thumbnail_hash = digest
+        type(instance)._base_manager.filter(pk=instance.pk).update(thumbnail_hash=digest)
+
+
+def thumbnail_widths(obj):
+    spec = spec_for(type(obj))
+    return spec.widths if spec and obj.thumbnail_hash else ()
+
+
+def thumbnail_url(obj, width, ext='jpg'):
+    """URL of the smallest thumbnail at least ``width`` wide, or of the original file if there is none yet."""
+    widths = thumbnail_widths(obj)
+    if not widths:
+        source = getattr(obj, spec_for(type(obj)).field)
+        return source.url if source else ''
+    width = next((w for w in widths if w >= width), widths[-1])
+    return reverse('thumbnail', args=[obj.thumbnail_hash, width, ext])
+
+
+def thumbnail_srcset(obj, ext='jpg'):
+    return ', '.join(
+        f'{reverse("thumbnail", args=[obj.thumbnail_hash, width, ext])} {width}w' for width in thumbnail_widths(obj)
+    )
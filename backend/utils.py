@@ -0,0 +1,18 @@
+import math
+
+
+def chunked(iterable, size):
+    """Yield lists of up to ``size`` items from ``iterable``."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list."""
+    return values[max(math.ceil(len(values) * fraction) - 1, 0)]
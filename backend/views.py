@@ -1,22 +1,72 @@
+import hashlib
+
+import razorpay
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseBadRequest, HttpResponseNotModified, JsonResponse,
+)
 from django.shortcuts import render
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST, require_safe
 
-from backend.models import Category, AdminUser, AuthorUser, MemberUser, Book, CustomUser
+from backend.metrics import render_prometheus
+from backend.payments import get_gateway
+from backend.ratelimit import client_ip
+from backend.routers import replica_reads
+from backend.settlement import queue_event
+from backend.stats import admin_stats
+from backend.thumbnails import DIGEST_RE, FORMATS, thumbnail_name
 
 
 # Create your views here.
 def dashboard_callback(request, context):
-    admins_count = CustomUser.objects.filter(groups__name='Admin').count()
-    authors_count = CustomUser.objects.filter(groups__name='Author').count()
-    members_count = CustomUser.objects.filter(groups__name='Member').count()
-    category_count = Category.objects.count()
-    books_count = Book.objects.count()
-
-    context.update({
-        "admins_count": admins_count,
-        "authors_count": authors_count,
-        "members_count": members_count,
-        "category_count": category_count,
-        "books_count": books_count
-    })
-
-    return context
\ No newline at end of file
+    # Cached snapshot, computed in one round trip on a miss
+    with replica_reads():
+        context.update(admin_stats())
+
+    return context
+
+# Thumbnails are named by content hash, so a URL never changes meaning and
+# browsers and proxies may keep it for good.
+@require_safe
+def thumbnail(request, digest, width, ext):
+    if not DIGEST_RE.match(digest) or ext not in FORMATS:
+        raise Http404
+    etag = f'"{digest}-{width}-{ext}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        name = thumbnail_name(digest, width, ext)
+        try:
+            response = FileResponse(default_storage.open(name, 'rb'), content_type=FORMATS[ext][1])
+        except FileNotFoundError:
+            raise Http404
+    response['ETag'] = etag
+    response['Cache-Control'] = f'public, max-age={settings.THUMBNAIL_CACHE_MAX_AGE}, immutable'
+    return response
+
+# Razorpay webhooks are only verified and queued here; the
+# process_payment_events command settles them, so the gateway gets its
+# answer without waiting on the settlement and a redelivery is a no-op.
+@csrf_exempt
+@require_POST
+def razorpay_webhook(request):
+    try:
+        get_gateway().verify_webhook_signature(request.body, request.headers.get('X-Razorpay-Signature', ''))
+    except razorpay.errors.SignatureVerificationError:
+        return HttpResponseBadRequest('Invalid signature')
+    event_id = request.headers.get('X-Razorpay-Event-Id') or hashlib.sha256(request.body).hexdigest()
+    try:
+        event, created = queue_event(event_id, request.body)
+    except ValueError:
+        return HttpResponseBadRequest('Invalid payload')
+    return JsonResponse({'status': 'queued' if created else 'duplicate'})
+
+
+# Request metrics for a local Prometheus scraper; other clients get a 404
+@require_safe
+def metrics(request):
+    if client_ip(request) not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,46 @@
+"""
+Cache settings read from the environment.
+
+CACHE_BACKEND picks where the cache lives:
+
+    locmem   per process memory (the default); fine for one worker
+    file     a directory shared by every worker on the host
+    redis    a Redis server shared by every worker; needs redis-py (``pip install redis``)
+
+    CACHE_LOCATION      directory (file) or URL (redis)
+    CACHE_MAX_ENTRIES   entries kept before culling (locmem and file)
+"""
+import os
+from importlib.util import find_spec
+
+from django.core.exceptions import ImproperlyConfigured
+
+from config.database import env_int
+
+
+def cache_settings(base_dir, env=os.environ):
+    """The ``default`` entry of CACHES."""
+    backend = env.get('CACHE_BACKEND', 'locmem').lower()
+    options = {'MAX_ENTRIES': env_int(env, 'CACHE_MAX_ENTRIES', 10000)}
+    if backend == 'locmem':
+        return {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'library',
+            'OPTIONS': options,
+        }
+    if backend == 'file':
+        return {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': env.get('CACHE_LOCATION') or base_dir / 'var' / 'cache',
+            'OPTIONS': options,
+        }
+    if backend == 'redis':
+        # Django's RedisCache imports it on first use; fail at startup instead
+        if find_spec('redis') is None:
+            raise ImproperlyConfigured('CACHE_BACKEND=redis needs redis-py: pip install redis')
+        # Redis evicts by its own maxmemory policy
+        return {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': env.get('CACHE_LOCATION', 'redis://127.0.0.1:6379/0'),
+        }
+    raise ImproperlyConfigured(f'CACHE_BACKEND must be locmem, file or redis, not {backend!r}')
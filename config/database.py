@@ -0,0 +1,152 @@
+"""
+Database settings read from the environment.
+
+DATABASE_ENGINE picks ``sqlite`` (the default) or ``postgresql``.
+
+SQLite
+    DATABASE_NAME           file path, defaults to db.sqlite3 in the project
+    SQLITE_TUNING           ``off`` keeps SQLite's stock journal and sync modes
+    SQLITE_JOURNAL_MODE     WAL: readers no longer block the writer
+    SQLITE_SYNCHRONOUS      NORMAL: no fsync per commit in WAL mode, still crash safe
+    SQLITE_BUSY_TIMEOUT     seconds a writer waits for the lock before "database is locked"
+    SQLITE_MMAP_SIZE        bytes of the file read through mmap
+    SQLITE_CACHE_SIZE_KIB   page cache per connection
+
+PostgreSQL
+    DATABASE_NAME, DATABASE_USER, DATABASE_PASSWORD, DATABASE_HOST, DATABASE_PORT
+    DATABASE_CONN_MAX_AGE        seconds to keep a connection between requests
+    DATABASE_CONN_HEALTH_CHECKS  ping a reused connection before handing it out
+    DATABASE_POOL                use a psycopg connection pool instead (psycopg[pool])
+    DATABASE_POOL_MIN_SIZE, DATABASE_POOL_MAX_SIZE, DATABASE_POOL_TIMEOUT
+    DATABASE_CONNECT_TIMEOUT     seconds to wait for the server
+
+Catalog search
+    CATALOG_SEARCH_BACKEND  dotted path of the backend.search class; defaults to
+                            the FTS5 index on SQLite and the unindexed
+                            DatabaseSearchBackend elsewhere
+
+Read replicas
+    DATABASE_REPLICAS       comma separated SQLite files, or PostgreSQL hosts
+                            (host[:port]) sharing the primary's credentials;
+                            they become the aliases replica_1, replica_2, ...
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+TRUE_VALUES = {'1', 'true', 'yes', 'on'}
+
+
+def env_bool(env, name, default):
+    value = env.get(name)
+    return default if value in (None, '') else value.strip().lower() in TRUE_VALUES
+
+
+def env_int(env, name, default):
+    value = env.get(name)
+    try:
+        return default if value in (None, '') else int(value)
+    except ValueError:
+        raise ImproperlyConfigured(f'{name} must be an integer, not {value!r}')
+
+
+def sqlite_options(env=os.environ, tuned=None):
+    """
+    Connection OPTIONS for SQLite. The PRAGMAs go in init_command, which
+    Django runs on every new connection; ``tuned=False`` gives the stock
+    rollback journal and full sync, for comparison.
+    """
+    if tuned is None:
+        tuned = env_bool(env, 'SQLITE_TUNING', True)
+    options = {
+        # Take the write lock when a transaction opens so that
+        # check-then-write sequences (see backend/circulation.py) serialize
+        'transaction_mode': 'IMMEDIATE',
+        # Python's sqlite3 turns this into SQLite's busy timeout
+        'timeout': env_int(env, 'SQLITE_BUSY_TIMEOUT', 20),
+    }
+    if not tuned:
+        # The journal mode is stored in the file, so it has to be undone explicitly
+        options['init_command'] = 'PRAGMA journal_mode=DELETE'
+        return options
+    pragmas = {
+        'journal_mode': env.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': env.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'mmap_size': env_int(env, 'SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+        # Negative sizes are in KiB
+        'cache_size': -env_int(env, 'SQLITE_CACHE_SIZE_KIB', 20000),
+        'temp_store': 'MEMORY',
+    }
+    options['init_command'] = ';'.join(f'PRAGMA {name}={value}' for name, value in pragmas.items())
+    return options
+
+
+def sqlite_replica_options(env=os.environ):
+    options = sqlite_options(env)
+    # Nothing is written through a replica connection
+    del options['transaction_mode']
+    options['init_command'] += ';PRAGMA query_only=ON'
+    return options
+
+
+def postgresql_options(env=os.environ):
+    options = {'connect_timeout': env_int(env, 'DATABASE_CONNECT_TIMEOUT', 5)}
+    if env_bool(env, 'DATABASE_POOL', False):
+        options['pool'] = {
+            'min_size': env_int(env, 'DATABASE_POOL_MIN_SIZE', 2),
+            'max_size': env_int(env, 'DATABASE_POOL_MAX_SIZE', 10),
+            'timeout': env_int(env, 'DATABASE_POOL_TIMEOUT', 10),
+        }
+    return options
+
+
+def database_settings(base_dir, env=os.environ):
+    """The ``default`` entry of DATABASES."""
+    engine = env.get('DATABASE_ENGINE', 'sqlite').lower()
+    if engine == 'sqlite':
+        return {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': env.get('DATABASE_NAME') or base_dir / 'db.sqlite3',
+            'OPTIONS': sqlite_options(env),
+        }
+    if engine in ('postgresql', 'postgres'):
+        options = postgresql_options(env)
+        return {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': env.get('DATABASE_NAME', 'library'),
+            'USER': env.get('DATABASE_USER', ''),
+            'PASSWORD': env.get('DATABASE_PASSWORD', ''),
+            'HOST': env.get('DATABASE_HOST', ''),
+            'PORT': env.get('DATABASE_PORT', ''),
+            # The pool hands connections back itself; Django rejects both at once
+            'CONN_MAX_AGE': 0 if 'pool' in options else env_int(env, 'DATABASE_CONN_MAX_AGE', 60),
+            'CONN_HEALTH_CHECKS': env_bool(env, 'DATABASE_CONN_HEALTH_CHECKS', True),
+            'OPTIONS': options,
+        }
+    raise ImproperlyConfigured(f'DATABASE_ENGINE must be sqlite or postgresql, not {engine!r}')
+
+
+def search_backend(primary, env=os.environ):
+    """CATALOG_SEARCH_BACKEND for the engine of the ``default`` database."""
+    if env.get('CATALOG_SEARCH_BACKEND'):
+        return env['CATALOG_SEARCH_BACKEND']
+    if primary['ENGINE'] == 'django.db.backends.sqlite3':
+        return 'backend.search.SQLiteFTS5SearchBackend'
+    # FTS5 is SQLite only
+    return 'backend.search.DatabaseSearchBackend'
+
+
+def replica_settings(primary, env=os.environ):
+    """DATABASES entries for the read replicas listed in DATABASE_REPLICAS."""
+    locations = [location.strip() for location in env.get('DATABASE_REPLICAS', '').split(',') if location.strip()]
+    replicas = {}
+    for n, location in enumerate(locations, 1):
+        # Tests run against the primary alone
+        replica = {**primary, 'TEST': {'MIRROR': 'default'}}
+        if primary['ENGINE'] == 'django.db.backends.sqlite3':
+            replica.update(NAME=location, OPTIONS=sqlite_replica_options(env))
+        else:
+            host, _, port = location.partition(':')
+            replica.update(HOST=host, PORT=port or primary['PORT'], OPTIONS=dict(primary['OPTIONS']))
+        replicas[f'replica_{n}'] = replica
+    return replicas
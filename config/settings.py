@@ -12,9 +12,18 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from pathlib import Path
 
+from dotenv import load_dotenv
+
+from config.cache import cache_settings
+from config.database import database_settings, env_bool, replica_settings, search_backend
+from config.templates import template_profile, template_settings, template_warmup
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Load environment variables from .env file
+load_dotenv(BASE_DIR / '.env')
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -23,7 +32,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-gh(3%vi4ez*ni3uduk^98x)w$20n_fbupmj*ijb+ikrs+m^lq5'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = env_bool(os.environ, 'DJANGO_DEBUG', True)
 
 ALLOWED_HOSTS = []
 
@@ -32,6 +41,7 @@ ALLOWED_HOSTS = []
 
 INSTALLED_APPS = [
     'unfold',
+    'unfold.contrib.filters',
 
     'django.contrib.admin',
     'django.contrib.auth',
@@ -51,6 +61,9 @@ CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
 MIDDLEWARE = [
+    # First, so its figures cover everything below it
+    'backend.middleware.request_metrics',
+    'backend.middleware.database_routing',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,33 +75,81 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'config.urls'
 
+# development or production (cached loaders, no debug info, warm-up); see config/templates.py
+TEMPLATE_PROFILE = template_profile(DEBUG)
+
 TEMPLATES = [
-    {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [BASE_DIR / "templates"],
-        'APP_DIRS': True,
-        'OPTIONS': {
-            'context_processors': [
-                'django.template.context_processors.request',
-                'django.contrib.auth.context_processors.auth',
-                'django.contrib.messages.context_processors.messages',
-            ],
-        },
-    },
+    template_settings(BASE_DIR, TEMPLATE_PROFILE, [
+        'django.template.context_processors.request',
+        'django.contrib.auth.context_processors.auth',
+        'django.contrib.messages.context_processors.messages',
+    ]),
 ]
 
+# Template name patterns compiled when the WSGI/ASGI application starts
+TEMPLATE_WARMUP = template_warmup(TEMPLATE_PROFILE)
+
 WSGI_APPLICATION = 'config.wsgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Engine, connection reuse and SQLite tuning come from the environment (see config/database.py)
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_settings(BASE_DIR),
 }
+DATABASES.update(replica_settings(DATABASES['default']))
+
+# Catalog, dashboard and report reads may go to the replicas (see backend/routers.py)
+DATABASE_ROUTERS = ['backend.routers.ReplicaRouter']
+DATABASE_REPLICA_ALIASES = [alias for alias in DATABASES if alias != 'default']
+# Seconds a client keeps reading from the primary after its own writes
+DATABASE_REPLICA_STICKY_SECONDS = 10
+# URL names whose reads always stay on the primary
+DATABASE_PRIMARY_VIEWS = []
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# CACHE_BACKEND picks locmem, file or redis; see config/cache.py
+CACHES = {
+    'default': cache_settings(BASE_DIR),
+}
+
+# Seconds an anonymous catalog page (home, books list) stays cached; catalog
+# writes move on to a new version sooner
+CATALOG_PAGE_CACHE_TTL = 300
+
+# Seconds a rendered book card cover stays cached; keyed on the thumbnail hash
+CATALOG_FRAGMENT_CACHE_TTL = 3600
+
+# Seconds a member's dashboard figures stay cached; writes invalidate them sooner
+MEMBER_SUMMARY_CACHE_TTL = 300
+
+# Seconds the admin dashboard statistics stay cached; writes invalidate them sooner
+ADMIN_STATS_CACHE_TTL = 60
+
+# Registration email availability check: seconds an answer stays cached, and
+# calls allowed per client IP per window
+EMAIL_CHECK_CACHE_TTL = 30
+EMAIL_CHECK_RATE_LIMIT = 60
+EMAIL_CHECK_RATE_WINDOW = 60
+
+# Thumbnail URLs embed the content hash, so they can be cached for a year
+THUMBNAIL_CACHE_MAX_AGE = 60 * 60 * 24 * 365
+
+
+# Library policy
+
+# A loan is overdue once it has been open for longer than this
+LIBRARY_LOAN_PERIOD_DAYS = 14
+
+# Overdue fine policy applied by the accrue_fines command
+LIBRARY_FINE_RATE_PER_DAY = '5.00'
+LIBRARY_FINE_GRACE_DAYS = 0
+LIBRARY_FINE_MAX_AMOUNT = None  # e.g. '500.00' to cap a single fine
 
 
 # Password validation
@@ -136,8 +197,22 @@ MEDIA_ROOT = os.path.join(BASE_DIR,'media')
 
 MEDIA_URL = 'media/'
 
+# Uploaded covers and profile images are stored once per distinct content
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    'media': {'BACKEND': 'backend.storage.ContentAddressedStorage'},
+}
+
+# Unreferenced media blobs younger than this are kept by prune_media, so an
+# upload whose row has not been committed yet is never removed under it
+MEDIA_PRUNE_GRACE_HOURS = 24
+
 AUTH_USER_MODEL = 'backend.CustomUser'
 
+# Catalog search (see backend/search.py); FTS5 on SQLite, unindexed elsewhere (see config/database.py)
+CATALOG_SEARCH_BACKEND = search_backend(DATABASES['default'])
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -151,6 +226,47 @@ REST_FRAMEWORK = {
 }
 
 
+# Razorpay (see backend/payments.py). RAZORPAY_API_URL can point at the local
+# stand-in started by the run_payment_stub command.
+RAZORPAY_KEY_ID = os.getenv('RAZORPAY_KEY_ID')
+RAZORPAY_KEY_SECRET = os.getenv('RAZORPAY_KEY_SECRET')
+RAZORPAY_API_URL = os.getenv('RAZORPAY_API_URL', 'https://api.razorpay.com')
+# Signs the webhook deliveries to /payments/razorpay/webhook/
+RAZORPAY_WEBHOOK_SECRET = os.getenv('RAZORPAY_WEBHOOK_SECRET')
+
+# Seconds to wait for a connection and for a response; failed calls are
+# retried this many times with exponential backoff
+RAZORPAY_CONNECT_TIMEOUT = 3.05
+RAZORPAY_READ_TIMEOUT = 10
+RAZORPAY_RETRIES = 2
+RAZORPAY_RETRY_BACKOFF = 0.25
+
+# Pooled connections (and threads) per process for gateway calls
+RAZORPAY_POOL_SIZE = 10
+
+# Stop calling the gateway after this many failures in a row, and try again
+# after this many seconds
+RAZORPAY_CIRCUIT_THRESHOLD = 5
+RAZORPAY_CIRCUIT_RESET = 30
+
+# Request metrics (see backend/metrics.py), served in the Prometheus text
+# format at /metrics to these client addresses only
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+# A request running one SQL statement this many times is logged as an N+1 candidate
+METRICS_DUPLICATE_QUERY_THRESHOLD = 5
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'backend': {'handlers': ['console'], 'level': 'INFO'},
+        'frontend': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
 #For To Enable Popus in Django or else it will block the payment popup
 SECURE_CROSS_ORIGIN_OPENER_POLICY = "same-origin-allow-popups"
 
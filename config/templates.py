@@ -0,0 +1,62 @@
+"""
+Template engine settings read from the environment.
+
+TEMPLATE_PROFILE picks how templates are loaded and rendered:
+
+    development   Django's defaults: template debug info follows DEBUG and
+                  edited templates are picked up by the autoreloader
+    production    explicit cached loaders, no debug info, and every template
+                  matching TEMPLATE_WARMUP compiled when the server starts
+
+It defaults to development when DEBUG is on and production otherwise.
+
+    TEMPLATE_WARMUP     comma separated template name patterns to precompile,
+                        ``off`` to skip; defaults to the site's own templates
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+PROFILES = ('development', 'production')
+
+LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+# The frontend pages, the admin's custom views and the crispy-forms pack
+# RegisterForm renders through
+DEFAULT_WARMUP = ['frontend/*', 'admin/backend/*', 'bootstrap5/*']
+
+
+def template_profile(debug, env=os.environ):
+    profile = env.get('TEMPLATE_PROFILE') or ('development' if debug else 'production')
+    if profile not in PROFILES:
+        raise ImproperlyConfigured(f'TEMPLATE_PROFILE must be development or production, not {profile!r}')
+    return profile
+
+
+def template_settings(base_dir, profile, context_processors):
+    """The TEMPLATES entry for the Django engine under ``profile``."""
+    engine = {
+        'BACKEND': 'backend.template_backends.TimedDjangoTemplates',
+        'DIRS': [base_dir / 'templates'],
+        'OPTIONS': {'context_processors': context_processors},
+    }
+    if profile == 'development':
+        engine['APP_DIRS'] = True
+    else:
+        # Compiled templates are kept for the life of the process
+        engine['APP_DIRS'] = False
+        engine['OPTIONS'].update(loaders=[('django.template.loaders.cached.Loader', LOADERS)], debug=False)
+    return engine
+
+
+def template_warmup(profile, env=os.environ):
+    """Template name patterns to compile at startup."""
+    value = env.get('TEMPLATE_WARMUP')
+    if value is None:
+        return DEFAULT_WARMUP if profile == 'production' else []
+    if value.strip().lower() in ('', 'off', 'false', '0'):
+        return []
+    return [pattern.strip() for pattern in value.split(',') if pattern.strip()]
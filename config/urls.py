@@ -21,7 +21,12 @@ from config import settings
 
 from django.conf.urls.static import static
 
+from backend.views import metrics, razorpay_webhook, thumbnail
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('thumbnails/<str:digest>/<int:width>.<str:ext>', thumbnail, name='thumbnail'),
+    path('metrics', metrics, name='metrics'),
+    path('payments/razorpay/webhook/', razorpay_webhook, name='razorpay_webhook'),
     path('', include('frontend.urls'))
 ]+static (settings.MEDIA_URL,document_root = settings.MEDIA_ROOT)
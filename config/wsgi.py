@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Compile the TEMPLATE_WARMUP templates before the first request (production profile)
+from backend.template_backends import warm_templates  # noqa: E402  needs the app registry
+
+warm_templates()
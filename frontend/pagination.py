@@ -0,0 +1,79 @@
+from dataclasses import dataclass, field
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+# Ranked search results are paged by number; deep pages are not useful
+MAX_PAGE_NUMBER = 50
+
+
+@dataclass
+class KeysetPage:
+    items: list = field(default_factory=list)
+    page_size: int = DEFAULT_PAGE_SIZE
+    next_cursor: int = None
+    prev_cursor: int = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, maximum))
+
+
+def parse_cursor(value):
+    try:
+        cursor = int(value)
+    except (TypeError, ValueError):
+        return None
+    return cursor if cursor >= 0 else None
+
+
+def parse_page_number(value, maximum=MAX_PAGE_NUMBER):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return 1
+    return max(1, min(number, maximum))
+
+
+def keyset_paginate(queryset, after=None, before=None, page_size=DEFAULT_PAGE_SIZE, key='id'):
+    """
+    Slice ``queryset`` by seeking on the indexed ``key`` column instead of
+    using OFFSET, so every page costs the same as the first one.
+
+    ``after`` moves forward from a cursor, ``before`` moves backwards.
+    One extra row is fetched to know whether a further page exists, and a
+    page reached with ``after`` probes for a row before its first one.
+    """
+    if before is not None:
+        rows = list(queryset.filter(**{f'{key}__lt': before}).order_by(f'-{key}')[:page_size + 1])
+        has_more = len(rows) > page_size
+        items = rows[:page_size][::-1]
+        page = KeysetPage(items=items, page_size=page_size)
+        if items:
+            page.next_cursor = getattr(items[-1], key)
+            if has_more:
+                page.prev_cursor = getattr(items[0], key)
+        return page
+
+    forward = queryset if after is None else queryset.filter(**{f'{key}__gt': after})
+    rows = list(forward.order_by(key)[:page_size + 1])
+    items = rows[:page_size]
+    page = KeysetPage(items=items, page_size=page_size)
+    if items:
+        if len(rows) > page_size:
+            page.next_cursor = getattr(items[-1], key)
+        first = getattr(items[0], key)
+        if after is not None and queryset.filter(**{f'{key}__lt': first}).exists():
+            page.prev_cursor = first
+    return page
@@ -1,3 +1,204 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from backend.catalog_cache import cache_anonymous_page
+from backend.models import Book, Category, CustomUser, Fine, Loan, Reservation, Role
+from frontend.pagination import keyset_paginate
+
+
+class MemberPageQueryCountTests(TestCase):
+    """The member pages must not run a query per row (N+1)."""
+
+    rows = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = CustomUser.objects.create_user(
+            email='member@example.com', password='x', first_name='Mem', last_name='Ber', role=Role.MEMBER,
+        )
+        cls.category = Category.objects.create(name='Fiction')
+        cls.next_book = 0
+
+    def setUp(self):
+        self.client.force_login(self.member)
+
+    def add_rows(self, count):
+        for _ in range(count):
+            self.next_book += 1
+            book = Book.objects.create(
+                title=f'Book {self.next_book}', category=self.category, publication_date=date(2020, 1, 1),
+                copies_owned=3,
+            )
+            loan = Loan.objects.create(
+                book=book, member=self.member, loan_date=date.today() - timedelta(days=30),
+                returned_date=date.today(),
+            )
+            Fine.objects.create(member=self.member, loan=loan, fine_date=date.today(), fine_amount=Decimal('10.00'))
+            Reservation.objects.create(book=book, member=self.member, reservation_date=date.today())
+
+    def count_queries(self, url):
+        # The dashboard figures are cached; every request has to compute them
+        cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(captured)
+
+    def assert_constant_queries(self, name):
+        url = reverse(name)
+        self.add_rows(1)
+        one_row = self.count_queries(url)
+        self.add_rows(self.rows - 1)
+        cache.clear()
+        with self.assertNumQueries(one_row):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_loaned_books(self):
+        self.assert_constant_queries('loaned_books')
+
+    def test_fines_view(self):
+        self.assert_constant_queries('fines')
+
+    def test_reservations_view(self):
+        self.assert_constant_queries('reservations')
+
+    def test_member_dashboard(self):
+        self.assert_constant_queries('member_dashboard')
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Fiction')
+        cls.books = [
+            Book.objects.create(title=f'Book {n}', category=category, publication_date=date(2020, 1, 1), copies_owned=1)
+            for n in range(5)
+        ]
+        cls.ids = [book.id for book in cls.books]
+
+    def test_first_page_has_no_previous(self):
+        page = keyset_paginate(Book.objects.all(), page_size=2)
+        self.assertEqual([book.id for book in page.items], self.ids[:2])
+        self.assertIsNone(page.prev_cursor)
+        self.assertEqual(page.next_cursor, self.ids[1])
+
+    def test_previous_only_when_earlier_rows_exist(self):
+        # A cursor below the first id, e.g. after the first book was deleted
+        page = keyset_paginate(Book.objects.all(), after=self.ids[0] - 1, page_size=2)
+        self.assertEqual([book.id for book in page.items], self.ids[:2])
+        self.assertIsNone(page.prev_cursor)
+
+        page = keyset_paginate(Book.objects.all(), after=self.ids[1], page_size=2)
+        self.assertEqual(page.prev_cursor, self.ids[2])
+        self.assertEqual(
+            [book.id for book in keyset_paginate(Book.objects.all(), before=page.prev_cursor, page_size=2).items],
+            self.ids[:2],
+        )
+
+    def test_last_page_has_no_next(self):
+        page = keyset_paginate(Book.objects.all(), after=self.ids[2], page_size=2)
+        self.assertEqual([book.id for book in page.items], self.ids[3:])
+        self.assertIsNone(page.next_cursor)
+
+
+@override_settings(EMAIL_CHECK_RATE_LIMIT=5, EMAIL_CHECK_RATE_WINDOW=3600)
+class EmailCheckTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def check(self, email):
+        response = self.client.get(reverse('email_check'), {'email': email})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_rate_limited_after_the_limit(self):
+        for _ in range(5):
+            self.check('someone@example.com')
+        response = self.client.get(reverse('email_check'), {'email': 'someone@example.com'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '3600')
+
+    def test_invalid_address_skips_the_database(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.check('someone@'), {'valid': False, 'available': False})
+
+    def test_taken_ignores_case(self):
+        CustomUser.objects.create_user(email='Ann@Example.com', password=None)
+        self.assertEqual(self.check(' ANN@example.COM '), {'valid': True, 'available': False})
+        self.assertEqual(self.check('bob@example.com'), {'valid': True, 'available': True})
+
+    def test_answer_is_cached_until_a_user_changes(self):
+        self.assertTrue(self.check('new@example.com')['available'])
+        with self.assertNumQueries(0):
+            self.assertTrue(self.check('new@example.com')['available'])
+        user = CustomUser.objects.create_user(email='New@example.com', password=None)
+        self.assertFalse(self.check('new@example.com')['available'])
+        user.delete()
+        self.assertTrue(self.check('new@example.com')['available'])
+
+
+class CatalogPageCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(
+            title='Emma', category=Category.objects.create(name='Fiction'), publication_date=date(2020, 1, 1),
+            copies_owned=1,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_revalidates_until_a_book_changes(self):
+        url = reverse('books_list')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertIn('Accept', response['Vary'])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        self.book.title = 'Persuasion'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.save()
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertContains(response, 'Persuasion')
+
+    def test_varies_on_accept(self):
+        url = reverse('books_list')
+        html = self.client.get(url)
+        data = self.client.get(url, headers={'Accept': 'application/json'})
+        self.assertNotEqual(html['ETag'], data['ETag'])
+        self.assertEqual(data.json()['results'][0]['title'], 'Emma')
+        self.assertEqual(self.client.get(url)['Content-Type'], html['Content-Type'])
+
+    def test_responses_setting_cookies_are_not_shared(self):
+        calls = []
+
+        @cache_anonymous_page
+        def view(request):
+            calls.append(request)
+            response = HttpResponse('hello')
+            response.set_cookie('seen', '1')
+            return response
+
+        for _ in range(2):
+            request = RequestFactory().get('/catalog/')
+            request.user = AnonymousUser()
+            self.assertEqual(view(request).status_code, 200)
+        self.assertEqual(len(calls), 2)
@@ -1,7 +1,8 @@
 from django.urls import path
 
 from frontend.views import home, member_register, member_login, member_logout, member_dashboard, books_list, \
-    loaned_books, fines_view, pay_fine, payment_success, reservations_view, reserve_book, email_check
+    loaned_books, fines_view, pay_fine, pay_all_fines, payment_success, reservations_view, reserve_book, email_check, \
+    export_history
 
 urlpatterns = [
     path('', home),
@@ -18,9 +19,16 @@ urlpatterns = [
 
     path('loans/', loaned_books, name='loaned_books'),
 
+    path('loans/export/', export_history, {'report': 'loans'}, name='export_loans'),
+
     path('fines/', fines_view, name='fines'),
 
+    path('fines/export/', export_history, {'report': 'fines'}, name='export_fines'),
+
+    path('payments/export/', export_history, {'report': 'payments'}, name='export_payments'),
+
     path('fines/pay/<int:fine_id>/', pay_fine, name='pay_fine'),
+    path('fines/pay-all/', pay_all_fines, name='pay_all_fines'),
 
     path('fines/payment-success/', payment_success, name='payment_success'),
 
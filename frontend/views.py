@@ -1,35 +1,107 @@
-from datetime import date
+import logging
 
+from asgiref.sync import sync_to_async
+from django.contrib import messages
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum
-from django.http import HttpResponseBadRequest, JsonResponse, HttpResponse
-from django.shortcuts import render, redirect, get_object_or_404
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.shortcuts import aget_object_or_404, render, redirect, get_object_or_404
+from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
-
-from backend.models import Loan, Fine, Reservation, Book, FinePayment, CustomUser
+from django.views.decorators.http import require_http_methods
+
+from backend.models import Loan, Fine, FineStatus, Reservation, Book, CustomUser
+from backend import circulation
+from backend.accounts import email_taken, is_valid_email, normalize_email_lookup
+from backend.catalog_cache import cache_anonymous_page
+from backend.exports import REPORTS, parse_report_filters
+from backend.payments import GatewayError, get_gateway, order_for_fines
+from backend.ratelimit import client_ip, is_rate_limited
+from backend.routers import replica_reads
+from backend.search import search_books
+from backend.settlement import SettlementError, from_paise, settle_payment
+from backend.stats import member_summary
+from backend.thumbnails import thumbnail_url
 from frontend.forms import RegisterForm, LoginForm
-
-
-from dotenv import load_dotenv
-import os
-
-# Load environment variables from .env file
-load_dotenv()
+from frontend.pagination import keyset_paginate, parse_cursor, parse_page_size, parse_page_number
 
 import razorpay
 
-RAZORPAY_KEY_ID = os.getenv('RAZORPAY_KEY_ID')
-RAZORPAY_KEY_SECRET = os.getenv('RAZORPAY_KEY_SECRET')
-razorpay_client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
+logger = logging.getLogger(__name__)
 
 # Create your views here.
+# Public catalog pages: anonymous requests are served from the page cache
+@cache_anonymous_page
 def home(request):
     return render(request, "frontend/home.html")
 
+def wants_json(request):
+    return request.GET.get('format') == 'json' or request.headers.get('Accept', '').startswith('application/json')
+
+def book_json(book):
+    return {
+        'id': book.id,
+        'title': book.title,
+        'copies_available': book.copies_available,
+        'cover_image': book.cover_image.url if book.cover_image else None,
+        'cover_thumbnail': thumbnail_url(book, 320) or None,
+    }
+
+@cache_anonymous_page
+@replica_reads()
 def books_list(request):
+    query = request.GET.get('q', '').strip()
+    if query:
+        return books_search(request, query)
+
+    in_stock = request.GET.get('in_stock') == '1'
+    books = Book.objects.in_stock() if in_stock else Book.objects.all()
+
+    page = keyset_paginate(
+        books,
+        after=parse_cursor(request.GET.get('after')),
+        before=parse_cursor(request.GET.get('before')),
+        page_size=parse_page_size(request.GET.get('page_size')),
+    )
+
+    if wants_json(request):
+        return JsonResponse({
+            'results': [book_json(book) for book in page.items],
+            'page_size': page.page_size,
+            'next': page.next_cursor,
+            'previous': page.prev_cursor,
+        })
+
     context = {
-        'books': Book.objects.all()
+        'books': page.items,
+        'page': page,
+        'in_stock': in_stock,
+        'card_cache_ttl': settings.CATALOG_FRAGMENT_CACHE_TTL,
+    }
+    return render(request, "frontend/books.html", context)
+
+def books_search(request, query):
+    results = search_books(
+        query,
+        page=parse_page_number(request.GET.get('page')),
+        page_size=parse_page_size(request.GET.get('page_size')),
+    )
+
+    if wants_json(request):
+        return JsonResponse({
+            'query': query,
+            'results': [book_json(book) for book in results.items],
+            'page_size': results.page_size,
+            'page': results.page,
+            'next': results.next_page,
+            'previous': results.previous_page,
+        })
+
+    context = {
+        'books': results.items,
+        'results': results,
+        'query': query,
+        'card_cache_ttl': settings.CATALOG_FRAGMENT_CACHE_TTL,
     }
     return render(request, "frontend/books.html", context)
 
@@ -53,9 +125,9 @@ def member_login(request):
             email = form.cleaned_data['email']
             password = form.cleaned_data['password']
             user = authenticate(request, email=email, password=password)
-            print(user)
             if user is not None:
                 login(request, user)
+                logger.info('Member %s logged in', user.pk)
                 return redirect('member_dashboard')
     else:
         form = LoginForm()
@@ -71,59 +143,72 @@ def member_logout(request):
 # Dashboard (Optional)
 @login_required
 def member_dashboard(request):
-    user = request.user
-
-    total_book_loans = Loan.objects.filter(member_id=user).count()
-    total_fine = Fine.objects.filter(member=user).aggregate(total=Sum('fine_amount'))['total'] or 0
-    books_reserved = Reservation.objects.filter(member=user).count()
-
-    context = {
-        'total_book_loans': total_book_loans,
-        'total_fine': total_fine,
-        'books_reserved': books_reserved,
-    }
+    context = member_summary(request.user.pk)
 
     return render(request, 'frontend/dashboard.html', context)
 
 # List of Loaned Books
 @login_required
 def loaned_books(request):
-    loans = Loan.objects.filter(member=request.user)
+    loans = Loan.objects.with_related().filter(member=request.user).order_by('-loan_date')
     return render(request, 'frontend/loaned_books.html', {'loans': loans})
 
 # List of Fines
 @login_required
 def fines_view(request):
-    fines = Fine.objects.filter(member=request.user)
-    return render(request, 'frontend/fines.html', {'fines': fines})
+    fines = Fine.objects.with_related().filter(member=request.user).order_by('-fine_date')
+    outstanding = Fine.objects.outstanding(request.user.pk)
+    return render(request, 'frontend/fines.html', {'fines': fines, 'outstanding': outstanding})
 
-# Razorpay Payment View
+# Download loan, fine or payment history as CSV/JSON Lines
 @login_required
-def pay_fine(request, fine_id):
-    fine = Fine.objects.get(id=fine_id)
-
-    if request.method == "POST":
-        # Create an order in Razorpay
-
-        # Razorpay works with paise, so multiply by 100
-        amount_in_paise = int(fine.fine_amount * 100)   # Convert Decimal to int (paise)
-        order = razorpay_client.order.create(dict(
-            amount=amount_in_paise,  # Amount in paise
-            currency='INR',
-            # payment_capture='1'  # 1 means automatic capture
-        ))
+@replica_reads()
+def export_history(request, report):
+    report = REPORTS[report]
+    try:
+        filters, fmt = parse_report_filters(report, request.GET)
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    queryset = report.filter(report.model.objects.filter(member=request.user), **filters)
+    return report.response(queryset, fmt)
 
-        context = {
-            'order_id': order['id'],
-            'amount': fine.fine_amount,
-            'amount_in_paise': amount_in_paise,
-            'fine_id': fine.id,
-            'razorpay_key': RAZORPAY_KEY_ID,
-        }
-
-        return render(request, 'frontend/payment_page.html', context)
+# Razorpay Payment View
+# Async so that a slow gateway does not hold a worker when served over ASGI
+@login_required
+async def pay_fine(request, fine_id):
+    if request.method != 'POST':
+        return redirect('fines')
+    fine = await aget_object_or_404(Fine, id=fine_id, member=await request.auser(), status=FineStatus.PENDING)
+    return await payment_page(request, [fine])
 
-    return redirect('fines')
+# One order for every pending fine of the member
+@login_required
+async def pay_all_fines(request):
+    if request.method != 'POST':
+        return redirect('fines')
+    user = await request.auser()
+    fines = [fine async for fine in Fine.objects.filter(member=user, status=FineStatus.PENDING).order_by('pk')]
+    if not fines:
+        return redirect('fines')
+    return await payment_page(request, fines)
+
+async def payment_page(request, fines):
+    try:
+        order_id = await order_for_fines(fines)
+    except GatewayError:
+        messages.error(request, 'The payment service is not available right now. Please try again in a few minutes.')
+        return redirect('fines')
+
+    amount_in_paise = sum(fine.amount_in_paise for fine in fines)
+    context = {
+        'order_id': order_id,
+        'amount': from_paise(amount_in_paise),
+        'amount_in_paise': amount_in_paise,
+        'fine_count': len(fines),
+        'razorpay_key': settings.RAZORPAY_KEY_ID,
+    }
+    # The layout reads request.user, which loads synchronously
+    return await sync_to_async(render)(request, 'frontend/payment_page.html', context)
 
 # Razorpay Payment Success Callback
 # Razorpay posts from external domain
@@ -135,7 +220,6 @@ def payment_success(request):
             payment_id = request.POST.get('razorpay_payment_id')
             order_id = request.POST.get('razorpay_order_id')
             signature = request.POST.get('razorpay_signature')
-            fine_id = request.POST.get('fine_id')
 
             params_dict = {
                 'razorpay_order_id': order_id,
@@ -144,32 +228,23 @@ def payment_success(request):
             }
 
             # ✅ VERIFY SIGNATURE HERE
-            razorpay_client.utility.verify_payment_signature(params_dict)
-
-            # ✅ Get fine object
-            fine = Fine.objects.get(id=fine_id, member=request.user)
+            get_gateway().verify_payment_signature(params_dict)
 
-            # ✅ Create payment entry
-            FinePayment.objects.create(
-                member=request.user,
-                payment_date=date.today(),
-                payment_amount=fine.fine_amount
-            )
-
-            # ✅ Update fine status
-            fine.status = 'Paid'
-            fine.save()
+            # Records the payment and marks the fine paid in one transaction;
+            # a repeated callback returns the payment recorded the first time
+            settlement = settle_payment(payment_id, order_id)
+            amount = settlement.payment.payment_amount
 
             return JsonResponse({
                 'success': True,
-                'amount': str(fine.fine_amount),
-                'redirect_url': f"/fines/payment-success/?amount={fine.fine_amount}"
+                'amount': str(amount),
+                'redirect_url': f"/fines/payment-success/?amount={amount}"
             })
 
         except razorpay.errors.SignatureVerificationError:
             return JsonResponse({'success': False, 'error': 'Invalid signature'}, status=400)
 
-        except Fine.DoesNotExist:
+        except SettlementError:
             return JsonResponse({'success': False, 'error': 'Fine not found'}, status=404)
 
         # Handle GET request (for when redirected)
@@ -187,29 +262,28 @@ def payment_success(request):
 # View Reservations
 @login_required
 def reservations_view(request):
-    reservations = Reservation.objects.filter(member=request.user)
+    reservations = Reservation.objects.with_related().filter(member=request.user).order_by('-reservation_date')
     return render(request, 'frontend/reservations.html', {'reservations': reservations})
 
 # Book Reservation
 @login_required
 def reserve_book(request, book_id):
     book = get_object_or_404(Book, id=book_id)
-    Reservation.objects.create(
-        book=book,
-        member=request.user,
-        reservation_date=date.today(),
-    )
+    circulation.reserve_book(request.user, book.id)
     return redirect('reservations')
 
+# Registration form: is this email still free? Called as the user types.
+@require_http_methods(['GET', 'POST'])
 def email_check(request):
-
-    if request.method == 'POST' and request.POST.get('search_email') != '':
-        email_response = CustomUser.objects.filter(email__icontains=request.POST.get('search_email'))
-        if email_response:
-            errno_template = "<span style='color: red;'>{} already exists</span>".format(request.POST.get('search_email'))
-
-            return HttpResponse(errno_template)
-
-        else:
-            success_template = "<span style='color: green;'>{} available</span>".format(request.POST.get('search_email'))
-            return HttpResponse(success_template)
\ No newline at end of file
+    if is_rate_limited('email-check', client_ip(request), settings.EMAIL_CHECK_RATE_LIMIT,
+                       settings.EMAIL_CHECK_RATE_WINDOW):
+        response = JsonResponse({'error': 'rate_limited'}, status=429)
+        response['Retry-After'] = str(settings.EMAIL_CHECK_RATE_WINDOW)
+        return response
+
+    params = request.POST if request.method == 'POST' else request.GET
+    email = normalize_email_lookup(params.get('email') or params.get('search_email'))
+    # Half-typed addresses are answered without touching the cache or database
+    if not is_valid_email(email):
+        return JsonResponse({'valid': False, 'available': False})
+    return JsonResponse({'valid': True, 'available': not email_taken(email)})